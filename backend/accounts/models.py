@@ -38,6 +38,7 @@ class CustomUser(AbstractUser):
     phone_number = models.CharField(validators=[phone_regex], max_length=17, blank=True)
     date_of_birth = models.DateField(null=True, blank=True)
     profile_picture = models.ImageField(upload_to='profiles/', null=True, blank=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
     
     # User Type and Status
     user_type = models.CharField(max_length=20, choices=USER_TYPES, default='customer')
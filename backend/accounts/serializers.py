@@ -1,5 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from therestaurant.fastpath import FastField
+from therestaurant.fieldsets import SparseFieldsetMixin
+from therestaurant.images import srcset
 from .models import (
     UserProfile, CustomerProfile, VendorProfile, 
     DeliveryProfile, StaffProfile, UserVerification
@@ -100,29 +103,15 @@ class UserSerializer(serializers.ModelSerializer):
     is_platform_admin = serializers.ReadOnlyField()
     can_manage_restaurants = serializers.ReadOnlyField()
     can_deliver_orders = serializers.ReadOnlyField()
+    profile_picture_srcset = serializers.SerializerMethodField()
     
     password = serializers.CharField(write_only=True, min_length=8, required=False)
     
-    def to_representation(self, instance):
-        """Override to add cache-busting timestamp and full URL to profile_picture"""
-        from datetime import datetime
-        data = super().to_representation(instance)
-        if data.get('profile_picture'):
-            # Build absolute URI for the profile picture
-            request = self.context.get('request')
-            if request:
-                data['profile_picture'] = request.build_absolute_uri(data['profile_picture'])
-            # Add timestamp to prevent browser caching
-            timestamp = int(instance.updated_at.timestamp() * 1000) if hasattr(instance, 'updated_at') and instance.updated_at else int(datetime.now().timestamp() * 1000)
-            separator = '&' if '?' in data['profile_picture'] else '?'
-            data['profile_picture'] = f"{data['profile_picture']}{separator}v={timestamp}"
-        return data
-
     class Meta:
         model = User
         fields = [
             'id', 'username', 'email', 'first_name', 'last_name',
-            'phone_number', 'date_of_birth', 'profile_picture',
+            'phone_number', 'date_of_birth', 'profile_picture', 'profile_picture_srcset',
             'user_type', 'account_status', 'dietary_preferences',
             'loyalty_points', 'preferred_payment_methods', 'delivery_addresses',
             'email_verified', 'phone_verified', 'identity_verified',
@@ -141,6 +130,9 @@ class UserSerializer(serializers.ModelSerializer):
             'background_check_passed', 'loyalty_points'
         ]
 
+    def get_profile_picture_srcset(self, obj):
+        return srcset(self.context.get('request'), obj.profile_picture, obj.profile_picture_variants)
+
     def create(self, validated_data):
         password = validated_data.pop('password')
         user = User.objects.create_user(**validated_data)
@@ -161,10 +153,56 @@ class UserSerializer(serializers.ModelSerializer):
 class PublicUserSerializer(serializers.ModelSerializer):
     """Serializer for public user information (used in social features)"""
     profile = UserProfileSerializer(read_only=True)
+    profile_picture_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = User
-        fields = ['id', 'username', 'first_name', 'last_name', 'profile_picture', 'user_type', 'profile']
+        fields = [
+            'id', 'username', 'first_name', 'last_name', 'profile_picture', 'profile_picture_srcset',
+            'user_type', 'profile',
+        ]
+        fast_fields = {
+            'profile_picture_srcset': FastField(
+                'profile_picture', 'profile_picture_variants',
+                render=lambda context, image, variants: srcset(context.get('request'), image, variants),
+            ),
+        }
+
+    def get_profile_picture_srcset(self, obj):
+        return srcset(self.context.get('request'), obj.profile_picture, obj.profile_picture_variants)
+
+def display_name(first_name, last_name, username):
+    return f'{first_name} {last_name}'.strip() or username
+
+
+class UserSummarySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Name and picture only, for users embedded in public catalog responses"""
+    display_name = serializers.SerializerMethodField()
+    profile_picture_srcset = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'display_name', 'profile_picture', 'profile_picture_srcset']
+        field_dependencies = {
+            'display_name': ['first_name', 'last_name', 'username'],
+            'profile_picture_srcset': ['profile_picture', 'profile_picture_variants'],
+        }
+        fast_fields = {
+            'display_name': FastField(
+                'first_name', 'last_name', 'username',
+                render=lambda context, first_name, last_name, username: display_name(first_name, last_name, username),
+            ),
+            'profile_picture_srcset': FastField(
+                'profile_picture', 'profile_picture_variants',
+                render=lambda context, image, variants: srcset(context.get('request'), image, variants),
+            ),
+        }
+
+    def get_display_name(self, obj):
+        return display_name(obj.first_name, obj.last_name, obj.username)
+
+    def get_profile_picture_srcset(self, obj):
+        return srcset(self.context.get('request'), obj.profile_picture, obj.profile_picture_variants)
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     """Simplified serializer for user registration"""
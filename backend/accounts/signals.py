@@ -1,5 +1,6 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from therestaurant import images
 from .models import (
     CustomUser, UserProfile, CustomerProfile, VendorProfile, 
     DeliveryProfile, StaffProfile, UserVerification
@@ -67,4 +68,6 @@ def save_user_profiles(sender, instance, **kwargs):
             user=instance,
             employee_id=f"EMP_{instance.id}_{instance.username}",
             position='staff' if instance.user_type == 'restaurant_staff' else instance.user_type.split('_')[1]
-        )
\ No newline at end of file
+        )
+
+images.track(CustomUser, 'profile_picture', 'profile_picture_variants')
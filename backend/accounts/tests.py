@@ -1,3 +1,176 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.test import APIClient
+from therestaurant.storage import CACHE_CONTROL, ContentAddressedFileSystemStorage, serve_media
+
+User = get_user_model()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class MeConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='ama', email='ama@example.com', password='secret-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_unchanged_profile_returns_304(self):
+        response = self.client.get('/api/accounts/users/me/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/accounts/users/me/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.client.patch('/api/accounts/users/me/', {'first_name': 'Ama'}, format='json')
+        response = self.client.get('/api/accounts/users/me/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['first_name'], 'Ama')
+
+    def test_patch_with_if_match(self):
+        response = self.client.get('/api/accounts/users/me/')
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        response = self.client.patch('/api/accounts/users/me/', {'last_name': 'Mensah'}, format='json',
+                                     HTTP_IF_UNMODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+        etag = self.client.get('/api/accounts/users/me/')['ETag']
+        response = self.client.patch('/api/accounts/users/me/', {'first_name': 'Ama'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['first_name'], 'Ama')
+
+        # That write changed the row, so the old ETag no longer matches
+        response = self.client.patch('/api/accounts/users/me/', {'first_name': 'Efua'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        etag = self.client.get('/api/accounts/users/me/')['ETag']
+        response = self.client.patch('/api/accounts/users/me/', {'first_name': 'Efua'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_is_per_user(self):
+        etag = self.client.get('/api/accounts/users/me/')['ETag']
+        other = User.objects.create_user(username='kofi', email='kofi@example.com', password='secret-pass-123')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get('/api/accounts/users/me/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class _S3StandIn(BaseHTTPRequestHandler):
+    """Just enough of the S3 object API (path-style HEAD/GET/PUT/DELETE), kept in ``server.objects``"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=b'', headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def object_headers(self, stored):
+        body, headers = stored
+        return [('ETag', '"%s"' % hashlib.md5(body).hexdigest()), ('Last-Modified', 'Sat, 17 Oct 2026 00:00:00 GMT')] + [
+            (name, value) for name, value in headers.items() if name in ('Content-Type', 'Cache-Control')
+        ]
+
+    def do_PUT(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.objects[self.path] = (body, dict(self.headers))
+        self.reply(200, headers=[('ETag', '"%s"' % hashlib.md5(body).hexdigest())])
+
+    def do_HEAD(self):
+        stored = self.server.objects.get(self.path)
+        if stored is None:
+            return self.reply(404)
+        self.send_response(200)
+        for name, value in self.object_headers(stored):
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(stored[0])))
+        self.end_headers()
+
+    def do_GET(self):
+        stored = self.server.objects.get(self.path)
+        if stored is None:
+            return self.reply(404, b'<Error><Code>NoSuchKey</Code></Error>', [('Content-Type', 'application/xml')])
+        self.reply(200, stored[0], self.object_headers(stored))
+
+    def do_DELETE(self):
+        self.server.objects.pop(self.path, None)
+        self.reply(204)
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.media_root = media_root
+        self.storage = ContentAddressedFileSystemStorage(location=media_root, base_url='/media/')
+
+    def test_uploads_are_named_and_deduplicated_by_content(self):
+        name = self.storage.save('profiles/ama.JPG', ContentFile(b'same bytes'))
+        self.assertEqual(name, f'profiles/{hashlib.sha256(b"same bytes").hexdigest()}.jpg')
+        self.assertEqual(self.storage.save('profiles/kofi.jpg', ContentFile(b'same bytes')), name)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'profiles')), [name.split('/')[1]])
+        self.assertNotEqual(self.storage.save('profiles/ama.jpg', ContentFile(b'other bytes')), name)
+        # Derivatives keep the name they are given
+        self.assertEqual(self.storage.save('derivatives/profiles/x/160w.webp', ContentFile(b'x')), 'derivatives/profiles/x/160w.webp')
+
+    def test_media_view_marks_content_addressed_files_immutable(self):
+        name = self.storage.save('profiles/ama.jpg', ContentFile(b'picture'))
+        os.makedirs(os.path.join(self.media_root, 'legacy'))
+        with open(os.path.join(self.media_root, 'legacy', 'old.jpg'), 'wb') as legacy:
+            legacy.write(b'old')
+        request = RequestFactory().get('/media/')
+        response = serve_media(request, name, document_root=self.media_root)
+        self.assertEqual(response['Cache-Control'], CACHE_CONTROL)
+        self.assertNotIn('Cache-Control', serve_media(request, 'legacy/old.jpg', document_root=self.media_root))
+
+    def test_s3_backend(self):
+        from botocore.config import Config
+        from therestaurant.storage import ContentAddressedS3Storage
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _S3StandIn)
+        server.objects = {}
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        endpoint = 'http://127.0.0.1:%d' % server.server_address[1]
+        storage = ContentAddressedS3Storage(
+            bucket_name='media', endpoint_url=endpoint, access_key='minio', secret_key='minio-secret',
+            region_name='us-east-1', addressing_style='path', querystring_auth=False,
+            client_config=Config(request_checksum_calculation='when_required', retries={'max_attempts': 1}),
+        )
+
+        name = storage.save('menu_items/jollof.png', ContentFile(b'png bytes'))
+        self.assertEqual(storage.save('menu_items/copy.png', ContentFile(b'png bytes')), name)
+        self.assertEqual(list(server.objects), [f'/media/{name}'])
+        body, headers = server.objects[f'/media/{name}']
+        self.assertEqual((body, headers['Cache-Control'], headers['Content-Type']), (b'png bytes', CACHE_CONTROL, 'image/png'))
+        self.assertEqual(storage.url(name), f'{endpoint}/media/{name}')
+        with storage.open(name) as stored:
+            self.assertEqual(stored.read(), b'png bytes')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ProfilePictureTests(TestCase):
+    def test_profile_picture_url_has_no_cache_buster(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        user = User.objects.create_user(username='ama', email='ama@example.com', password='secret-pass-123')
+        client = APIClient()
+        client.force_authenticate(user)
+        with override_settings(MEDIA_ROOT=media_root):
+            user.profile_picture.save('me.jpg', ContentFile(b'not really a jpeg'))
+            picture = client.get('/api/accounts/users/me/').data['profile_picture']
+        self.assertEqual(picture, f'http://testserver/media/{user.profile_picture.name}')
+        self.assertNotIn('?', picture)
@@ -10,6 +10,7 @@ from django.conf import settings
 from django.utils.crypto import get_random_string
 from django.utils import timezone
 from datetime import timedelta
+from therestaurant.conditional import conditional_response
 from .models import (
     UserProfile, CustomerProfile, VendorProfile, 
     DeliveryProfile, StaffProfile, UserVerification
@@ -21,6 +22,28 @@ from .serializers import (
 
 User = get_user_model()
 
+# Everything the ``me`` payload is built from that carries a timestamp
+PROFILE_STATE_FIELDS = (
+    'updated_at', 'last_login', 'profile__updated_at', 'customer_profile__updated_at',
+    'vendor_profile__updated_at', 'delivery_profile__updated_at', 'staff_profile__updated_at',
+    'verification__updated_at',
+)
+
+
+def profile_state(request, *args, **kwargs):
+    """(ETag parts, Last-Modified) of the current user's profile payload.
+
+    Computed for PUT/PATCH too, so ``If-Match``/``If-Unmodified-Since`` are
+    checked against the current row (412 when it changed since the GET).
+    """
+    if not request.user.is_authenticated:
+        return None
+    row = User.objects.filter(pk=request.user.pk).values_list(*PROFILE_STATE_FIELDS).first()
+    if row is None:
+        return None
+    timestamps = [value for value in row if value is not None]
+    return (request.user.pk,) + row, max(timestamps) if timestamps else None
+
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -49,6 +72,7 @@ class UserViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
     @action(detail=False, methods=['get', 'put', 'patch'])
+    @conditional_response(profile_state)
     def me(self, request):
         """Get or update current user's profile"""
         if request.method == 'GET':
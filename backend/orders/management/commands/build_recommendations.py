@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from orders.recommendations import BATCH_ORDERS, update_recommendations
+
+
+class Command(BaseCommand):
+    help = "Add orders placed since the last run to the item co-occurrence counts and refresh related items"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-orders', type=int, default=BATCH_ORDERS, help="Orders read per batch")
+
+    def handle(self, *args, **options):
+        run = update_recommendations(batch_orders=options['batch_orders'])
+        if run is None:
+            self.stdout.write(self.style.SUCCESS("No new orders."))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {run.order_lines} lines of {run.orders} orders (up to order {run.last_order_id}); "
+            f"re-scored {run.items_scored} items."
+        ))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:36
+
+from django.db import migrations, models
+
+
+def start_from_last_run(apps, schema_editor):
+    RecommendationRun = apps.get_model('orders', 'RecommendationRun')
+    RecommendationProgress = apps.get_model('orders', 'RecommendationProgress')
+    last_order_id = RecommendationRun.objects.order_by('-pk').values_list('last_order_id', flat=True).first() or 0
+    RecommendationProgress.objects.create(pk=1, last_order_id=last_order_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_item_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_order_id', models.BigIntegerField(default=0)),
+                ('pending_items', models.JSONField(blank=True, default=list)),
+            ],
+        ),
+        migrations.RunPython(start_from_last_run, migrations.RunPython.noop),
+    ]
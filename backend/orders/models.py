@@ -37,6 +37,10 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Order history: one user's orders, newest first
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+        ]
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
@@ -87,3 +91,60 @@ class CartItem(models.Model):
 
     def __str__(self):
         return f"{self.quantity}x {self.menu_item.name} in {self.cart.user.username}'s cart"
+
+class MenuItemPairCount(models.Model):
+    """
+    The order co-occurrence matrix: how many orders contained both
+    ``menu_item`` and ``other``, stored in both directions. The diagonal
+    (``other == menu_item``) counts the orders containing the item.
+    Maintained by orders.recommendations.
+    """
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='+')
+    other = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['menu_item', 'other']
+
+    def __str__(self):
+        return f"{self.menu_item_id} + {self.other_id}: {self.count}"
+
+class RelatedMenuItem(models.Model):
+    """One of the ``TOP_K`` items most often ordered with ``menu_item``"""
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='related_items')
+    related = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='related_to')
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ['menu_item', 'related']
+
+    def __str__(self):
+        return f"{self.menu_item_id} -> {self.related_id} ({self.score:.3f})"
+
+class RecommendationProgress(models.Model):
+    """
+    The one row recording how far the co-occurrence counts have read, and the
+    items whose counts changed but are not re-scored yet. Updates lock it for
+    every batch, so overlapping runs never read the same orders twice.
+    """
+    last_order_id = models.BigIntegerField(default=0)
+    pending_items = models.JSONField(default=list, blank=True)
+
+    @classmethod
+    def load(cls):
+        return cls.objects.get_or_create(pk=1)[0]
+
+    def __str__(self):
+        return f"Recommendations up to order {self.last_order_id}"
+
+class RecommendationRun(models.Model):
+    """One co-occurrence update: the orders it read and the items it re-scored"""
+    last_order_id = models.BigIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+    order_lines = models.PositiveIntegerField(default=0)
+    items_scored = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Recommendation run {self.pk} up to order {self.last_order_id}"
@@ -0,0 +1,215 @@
+"""
+"Customers also ordered" recommendations from order co-occurrence.
+
+``update_recommendations`` (``manage.py build_recommendations``, run from
+cron or a scheduler) reads only the order lines of orders placed since the
+previous run, ``BATCH_ORDERS`` orders at a time:
+
+1. ``cooccurrence`` expands the distinct items of every order into all
+   their pairs with NumPy and sums them into a sparse (COO) delta of the
+   co-occurrence matrix, one ``np.unique`` over encoded pair keys.
+2. The delta is added to MenuItemPairCount with ``INSERT ... ON CONFLICT DO
+   UPDATE`` upserts. In the same transaction RecommendationProgress (one
+   row, locked with ``select_for_update`` for the batch) advances its
+   ``last_order_id`` and records the items whose counts changed as pending.
+   An interrupted run therefore resumes where it stopped, and overlapping
+   runs take turns instead of counting the same orders twice.
+3. Pending items and their partners are re-scored with the cosine
+   similarity of their order vectors,
+   ``count(a, b) / sqrt(count(a) * count(b))``; the best ``TOP_K`` partners
+   seen together at least ``MIN_COUNT`` times become RelatedMenuItem rows.
+
+Orders are read once they are ``SETTLE_SECONDS`` old, so lines still being
+written are not missed; cancelled orders are skipped. Orders with more than
+``MAX_ORDER_ITEMS`` distinct items (catering, test orders) say little about
+what goes together and are skipped too.
+
+``related_items`` serves the result: the available items recommended for
+one or more items, best first.
+"""
+import datetime
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import F, Max, Sum
+from django.utils import timezone
+
+from restaurants.models import MenuItem
+
+from .models import MenuItemPairCount, Order, OrderItem, RecommendationProgress, RecommendationRun, RelatedMenuItem
+
+BATCH_ORDERS = 20000
+MAX_ORDER_ITEMS = 50
+MIN_COUNT = 2
+TOP_K = 20
+SETTLE_SECONDS = 60
+# Rows per upsert statement and items per re-scoring query
+WRITE_BATCH = 500
+
+
+def cooccurrence(order_ids, item_ids):
+    """
+    Sparse co-occurrence counts of order lines ``(order_ids[i], item_ids[i])``:
+    ``(items, others, counts)`` arrays with one entry per ordered pair of
+    items (diagonal included) found together in at least one order.
+    """
+    order_ids = np.asarray(order_ids, dtype=np.int64)
+    item_ids = np.asarray(item_ids, dtype=np.int64)
+    empty = np.zeros(0, dtype=np.int64)
+    if not len(order_ids):
+        return empty, empty, empty
+
+    # Distinct (order, item) lines, grouped by order
+    ids, items = np.unique(item_ids, return_inverse=True)
+    sort = np.lexsort((items, order_ids))
+    orders, items = order_ids[sort], items[sort]
+    distinct = np.r_[True, (orders[1:] != orders[:-1]) | (items[1:] != items[:-1])]
+    orders, items = orders[distinct], items[distinct]
+    starts = np.flatnonzero(np.r_[True, orders[1:] != orders[:-1]])
+    sizes = np.diff(np.r_[starts, len(orders)])
+    kept = sizes <= MAX_ORDER_ITEMS
+    starts, sizes = starts[kept], sizes[kept]
+    if not len(sizes):
+        return empty, empty, empty
+
+    # Every (first, second) position pair of every order, n * n per order
+    squares = sizes * sizes
+    owner = np.repeat(np.arange(len(sizes)), squares)
+    position = np.arange(squares.sum()) - np.repeat(np.cumsum(squares) - squares, squares)
+    size = sizes[owner]
+    first = items[starts[owner] + position // size]
+    second = items[starts[owner] + position % size]
+
+    keys, counts = np.unique(first * len(ids) + second, return_counts=True)
+    return ids[keys // len(ids)], ids[keys % len(ids)], counts
+
+
+def add_pair_counts(items, others, counts):
+    """Add a co-occurrence delta to MenuItemPairCount"""
+    opts = MenuItemPairCount._meta
+    quote = connection.ops.quote_name
+    table = quote(opts.db_table)
+    item_column, other_column, count_column = (
+        quote(opts.get_field(name).column) for name in ('menu_item', 'other', 'count')
+    )
+    rows = list(zip(items.tolist(), others.tolist(), counts.tolist()))
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), WRITE_BATCH):
+            batch = rows[start:start + WRITE_BATCH]
+            placeholders = ', '.join(['(%s, %s, %s)'] * len(batch))
+            cursor.execute(
+                f"INSERT INTO {table} ({item_column}, {other_column}, {count_column}) VALUES {placeholders} "
+                f"ON CONFLICT ({item_column}, {other_column}) "
+                f"DO UPDATE SET {count_column} = {table}.{count_column} + excluded.{count_column}",
+                [value for row in batch for value in row],
+            )
+
+
+def _chunks(values, size=WRITE_BATCH):
+    values = sorted(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def rescore(item_ids):
+    """Rebuild the RelatedMenuItem rows of ``item_ids`` from the pair counts"""
+    for chunk in _chunks(item_ids):
+        pairs = np.array(
+            MenuItemPairCount.objects.filter(menu_item__in=chunk).values_list('menu_item', 'other', 'count'),
+            dtype=np.int64,
+        ).reshape(-1, 3)
+        items, others, counts = pairs.T
+        diagonal = items == others
+        frequency = dict(MenuItemPairCount.objects.filter(
+            menu_item__in=set(others.tolist()), other=F('menu_item'),
+        ).values_list('menu_item', 'count'))
+
+        kept = ~diagonal & (counts >= MIN_COUNT)
+        items, others, counts = items[kept], others[kept], counts[kept]
+        item_frequency = np.array([frequency.get(i, 0) for i in items.tolist()], dtype=np.float64)
+        other_frequency = np.array([frequency.get(i, 0) for i in others.tolist()], dtype=np.float64)
+        scores = counts / np.sqrt(np.maximum(item_frequency * other_frequency, 1.0))
+
+        # Best first within each item; keep the first TOP_K of every group
+        order = np.lexsort((others, -scores, items))
+        items, others, scores = items[order], others[order], scores[order]
+        starts = np.flatnonzero(np.r_[True, items[1:] != items[:-1]]) if len(items) else np.zeros(0, dtype=np.int64)
+        rank = np.arange(len(items)) - np.repeat(starts, np.diff(np.r_[starts, len(items)]))
+        top = rank < TOP_K
+
+        with transaction.atomic():
+            RelatedMenuItem.objects.filter(menu_item__in=chunk).delete()
+            RelatedMenuItem.objects.bulk_create([
+                RelatedMenuItem(menu_item_id=item, related_id=other, score=score)
+                for item, other, score in zip(items[top].tolist(), others[top].tolist(), scores[top].tolist())
+            ])
+
+
+def update_recommendations(batch_orders=BATCH_ORDERS, now=None):
+    """Fold orders placed since the last run into the pair counts and re-score; returns the run, or None"""
+    progress = RecommendationProgress.load()
+    settled = (now or timezone.now()) - datetime.timedelta(seconds=SETTLE_SECONDS)
+    newest = Order.objects.filter(
+        pk__gt=progress.last_order_id, created_at__lte=settled,
+    ).aggregate(newest=Max('pk'))['newest'] or 0
+    if not newest and not progress.pending_items:
+        return None
+
+    run = RecommendationRun.objects.create(last_order_id=progress.last_order_id)
+    while True:
+        with transaction.atomic():
+            # Each batch starts where the last committed one ended, read
+            # under the row lock, so overlapping runs take turns
+            progress = RecommendationProgress.objects.select_for_update().get(pk=progress.pk)
+            if progress.last_order_id >= newest:
+                break
+            orders = Order.objects.filter(pk__gt=progress.last_order_id, pk__lte=newest).order_by('pk')
+            batch_end = orders.values_list('pk', flat=True)[batch_orders - 1:batch_orders].first() or newest
+            lines = np.array(
+                OrderItem.objects
+                .filter(order__gt=progress.last_order_id, order__lte=batch_end)
+                .exclude(order__status='cancelled')
+                .values_list('order', 'menu_item'),
+                dtype=np.int64,
+            ).reshape(-1, 2)
+            items, others, counts = cooccurrence(lines[:, 0], lines[:, 1])
+            add_pair_counts(items, others, counts)
+            progress.last_order_id = batch_end
+            progress.pending_items = sorted(set(progress.pending_items).union(np.unique(items).tolist()))
+            progress.save(update_fields=['last_order_id', 'pending_items'])
+            run.orders += len(np.unique(lines[:, 0]))
+            run.order_lines += len(lines)
+            run.last_order_id = batch_end
+            run.save(update_fields=['orders', 'order_lines', 'last_order_id'])
+
+    # Items stay pending until re-scored, so a run interrupted before this
+    # point is finished by the next one
+    with transaction.atomic():
+        progress = RecommendationProgress.objects.select_for_update().get(pk=progress.pk)
+        # A changed item frequency moves the scores of all its partners too
+        dirty = set(progress.pending_items)
+        for chunk in _chunks(progress.pending_items):
+            dirty.update(MenuItemPairCount.objects.filter(menu_item__in=chunk).values_list('other', flat=True))
+        rescore(dirty)
+        progress.pending_items = []
+        progress.save(update_fields=['pending_items'])
+
+    run.items_scored = len(dirty)
+    run.finished_at = timezone.now()
+    run.save(update_fields=['items_scored', 'finished_at'])
+    return run
+
+
+def related_items(menu_item_ids, queryset=None):
+    """
+    Available items recommended with any of ``menu_item_ids`` (and not one
+    of them), best first, annotated with their summed ``related_score``.
+    """
+    queryset = MenuItem.objects.filter(is_available=True) if queryset is None else queryset
+    return (
+        queryset
+        .filter(related_to__menu_item__in=menu_item_ids)
+        .exclude(pk__in=menu_item_ids)
+        .annotate(related_score=Sum('related_to__score'))
+        .order_by('-related_score', 'pk')
+    )
@@ -1,12 +1,14 @@
 from rest_framework import serializers
 from .models import Order, OrderItem, OrderTracking, Cart, CartItem
+from .recommendations import related_items
 from restaurants.serializers import MenuItemSerializer, RestaurantListSerializer
+from therestaurant.fieldsets import SparseFieldsetMixin
 from django.contrib.auth import get_user_model
 import uuid
 
 User = get_user_model()
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     menu_item = MenuItemSerializer(read_only=True)
     menu_item_id = serializers.IntegerField(write_only=True)
 
@@ -18,13 +20,13 @@ class OrderItemSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'total_price']
 
-class OrderTrackingSerializer(serializers.ModelSerializer):
+class OrderTrackingSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = OrderTracking
         fields = ['id', 'status', 'message', 'timestamp']
         read_only_fields = ['id', 'timestamp']
 
-class OrderListSerializer(serializers.ModelSerializer):
+class OrderListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     restaurant = RestaurantListSerializer(read_only=True)
     items_count = serializers.SerializerMethodField()
     
@@ -34,11 +36,16 @@ class OrderListSerializer(serializers.ModelSerializer):
             'id', 'order_number', 'restaurant', 'status', 'total_amount',
             'items_count', 'estimated_delivery_time', 'created_at'
         ]
+        field_dependencies = {'items_count': []}
+        expandable_fields = {
+            'items': ('orders.serializers.OrderItemSerializer', {'many': True, 'read_only': True}),
+            'tracking': ('orders.serializers.OrderTrackingSerializer', {'many': True, 'read_only': True}),
+        }
 
     def get_items_count(self, obj):
         return obj.items.count()
 
-class OrderDetailSerializer(serializers.ModelSerializer):
+class OrderDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     restaurant = RestaurantListSerializer(read_only=True)
     items = OrderItemSerializer(many=True, read_only=True)
     tracking = OrderTrackingSerializer(many=True, read_only=True)
@@ -110,7 +117,7 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         
         return order
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     menu_item = MenuItemSerializer(read_only=True)
     menu_item_id = serializers.IntegerField(write_only=True)
     item_total = serializers.SerializerMethodField()
@@ -122,23 +129,29 @@ class CartItemSerializer(serializers.ModelSerializer):
             'customizations', 'item_total', 'added_at'
         ]
         read_only_fields = ['id', 'added_at']
+        field_dependencies = {'item_total': ['quantity', 'menu_item__price']}
 
     def get_item_total(self, obj):
         return obj.quantity * obj.menu_item.price
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     restaurant = RestaurantListSerializer(read_only=True)
     total_items = serializers.SerializerMethodField()
     cart_total = serializers.SerializerMethodField()
+    recommended_items = serializers.SerializerMethodField()
+
+    # Recommendations shown with a cart
+    RECOMMENDED_ITEMS = 5
 
     class Meta:
         model = Cart
         fields = [
             'id', 'restaurant', 'items', 'total_items', 
-            'cart_total', 'created_at', 'updated_at'
+            'cart_total', 'recommended_items', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        field_dependencies = {'total_items': [], 'cart_total': [], 'recommended_items': []}
 
     def get_total_items(self, obj):
         return sum(item.quantity for item in obj.items.all())
@@ -146,6 +159,14 @@ class CartSerializer(serializers.ModelSerializer):
     def get_cart_total(self, obj):
         return sum(item.quantity * item.menu_item.price for item in obj.items.all())
 
+    def get_recommended_items(self, obj):
+        """Items often ordered with what is in the cart (see orders.recommendations)"""
+        item_ids = [item.menu_item_id for item in obj.items.all()]
+        if not item_ids:
+            return []
+        recommended = related_items(item_ids).select_related('restaurant')[:self.RECOMMENDED_ITEMS]
+        return MenuItemSerializer(recommended, many=True, context=self.context).data
+
 class AddToCartSerializer(serializers.Serializer):
     menu_item_id = serializers.IntegerField()
     quantity = serializers.IntegerField(min_value=1, default=1)
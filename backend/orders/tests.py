@@ -1,3 +1,154 @@
-from django.test import TestCase
+import datetime
+import math
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from restaurants.models import Restaurant, MenuCategory, MenuItem
+from .models import Order, OrderItem, Cart, CartItem, MenuItemPairCount, RecommendationProgress, RelatedMenuItem
+
+User = get_user_model()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='ama', email='ama@example.com', password='secret-pass-123')
+        self.client.force_authenticate(self.user)
+        self.restaurant = Restaurant.objects.create(
+            name='Jollof Palace', description='Rice', cuisine_type='Ghanaian', address='Accra',
+            phone_number='0240000000', email='hello@example.com',
+        )
+        category = MenuCategory.objects.create(restaurant=self.restaurant, name='Mains')
+        self.item = MenuItem.objects.create(
+            restaurant=self.restaurant, category=category, name='Jollof Rice', description='Rice', price='25.00',
+        )
+        self.order = Order.objects.create(
+            user=self.user, restaurant=self.restaurant, order_number='ORD-1',
+            total_amount='30.00', delivery_address='Accra',
+        )
+        OrderItem.objects.create(order=self.order, menu_item=self.item, quantity=2, unit_price=Decimal('25.00'))
+
+    def test_order_list_trims_embedded_restaurant(self):
+        response = self.client.get('/api/orders/orders/?fields=order_number,restaurant.name,restaurant.image')
+        self.assertEqual(response.data['results'][0], {
+            'order_number': 'ORD-1',
+            'restaurant': {'name': 'Jollof Palace', 'image': response.data['results'][0]['restaurant']['image']},
+        })
+
+    def test_order_list_expands_items_with_one_prefetch(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/orders/orders/?fields=order_number,items.quantity,items.menu_item.name&expand=items')
+        self.assertEqual(response.data['results'][0], {
+            'order_number': 'ORD-1', 'items': [{'quantity': 2, 'menu_item': {'name': 'Jollof Rice'}}],
+        })
+
+    def test_cart_honours_fields(self):
+        cart = Cart.objects.create(user=self.user, restaurant=self.restaurant)
+        CartItem.objects.create(cart=cart, menu_item=self.item, quantity=3)
+        response = self.client.get('/api/orders/cart/current/?fields=cart_total,items.item_total')
+        self.assertEqual(response.data, {'cart_total': 75, 'items': [{'item_total': 75}]})
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class RecommendationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='ama', email='ama@example.com', password='secret-pass-123')
+        self.restaurant = Restaurant.objects.create(
+            name='Jollof Palace', description='Rice', cuisine_type='Ghanaian', address='Accra',
+            phone_number='0240000000', email='hello@example.com',
+        )
+        category = MenuCategory.objects.create(restaurant=self.restaurant, name='Mains')
+        self.jollof, self.chicken, self.plantain, self.sobolo = [
+            MenuItem.objects.create(restaurant=self.restaurant, category=category, name=name, description=name, price='10.00')
+            for name in ('Jollof Rice', 'Grilled Chicken', 'Kelewele', 'Sobolo')
+        ]
+        for items in [
+            (self.jollof, self.chicken), (self.jollof, self.chicken, self.chicken), (self.jollof, self.chicken),
+            (self.jollof, self.plantain), (self.jollof, self.plantain), (self.jollof, self.sobolo),
+        ]:
+            self.order(*items)
+        self.order(self.jollof, self.sobolo, status='cancelled')
+
+    def order(self, *items, status='delivered'):
+        order = Order.objects.create(
+            user=self.user, restaurant=self.restaurant, order_number=f'ORD-{Order.objects.count() + 1}',
+            total_amount='30.00', delivery_address='Accra', status=status,
+        )
+        for item in items:
+            OrderItem.objects.create(order=order, menu_item=item, quantity=1, unit_price=Decimal('10.00'))
+        return order
+
+    def update(self, **kwargs):
+        from .recommendations import update_recommendations
+        return update_recommendations(now=timezone.now() + datetime.timedelta(minutes=5), **kwargs)
+
+    def related(self, item):
+        return list(RelatedMenuItem.objects.filter(menu_item=item).order_by('-score').values_list('related__name', 'score'))
+
+    def test_cooccurrence_counts_distinct_items_per_order(self):
+        from .recommendations import cooccurrence
+        items, others, counts = cooccurrence([1, 1, 1, 2, 2], [7, 9, 7, 9, 8])
+        self.assertEqual(
+            sorted(zip(items.tolist(), others.tolist(), counts.tolist())),
+            [(7, 7, 1), (7, 9, 1), (8, 8, 1), (8, 9, 1), (9, 7, 1), (9, 8, 1), (9, 9, 2)],
+        )
+
+    def test_update_scores_pairs_and_resumes_after_last_order(self):
+        run = self.update()
+        self.assertEqual((run.orders, run.order_lines), (6, 13))
+        related = self.related(self.jollof)
+        self.assertEqual([name for name, _ in related], ['Grilled Chicken', 'Kelewele'])
+        self.assertAlmostEqual(related[0][1], 3 / math.sqrt(6 * 3))
+        self.assertEqual([name for name, _ in self.related(self.chicken)], ['Jollof Rice'])
+
+        self.assertIsNone(self.update())
+        self.order(self.jollof, self.sobolo)
+        run = self.update()
+        self.assertEqual(run.orders, 1)
+        self.assertEqual([name for name, _ in self.related(self.jollof)], ['Grilled Chicken', 'Kelewele', 'Sobolo'])
+        # Jollof is now in 7 orders, which moves its partners' scores too
+        self.assertAlmostEqual(dict(self.related(self.plantain))['Jollof Rice'], 2 / math.sqrt(2 * 7))
+
+    def test_batches_add_up_to_one_pass(self):
+        self.update(batch_orders=2)
+        batched = set(MenuItemPairCount.objects.values_list('menu_item', 'other', 'count'))
+        MenuItemPairCount.objects.all().delete()
+        RecommendationProgress.objects.update(last_order_id=0)
+        self.update()
+        self.assertEqual(set(MenuItemPairCount.objects.values_list('menu_item', 'other', 'count')), batched)
+
+    def test_interrupted_run_is_rescored_by_the_next(self):
+        with mock.patch('orders.recommendations.rescore', side_effect=RuntimeError('killed')):
+            with self.assertRaises(RuntimeError):
+                self.update(batch_orders=2)
+        self.assertEqual(self.related(self.jollof), [])
+        self.assertEqual(RecommendationProgress.load().pending_items, sorted(
+            item.pk for item in (self.jollof, self.chicken, self.plantain, self.sobolo)
+        ))
+
+        run = self.update()
+        self.assertEqual((run.orders, run.items_scored), (0, 4))
+        self.assertEqual([name for name, _ in self.related(self.jollof)], ['Grilled Chicken', 'Kelewele'])
+        self.assertEqual(RecommendationProgress.load().pending_items, [])
+        self.assertIsNone(self.update())
+
+    def test_related_action_and_cart(self):
+        self.update()
+        response = self.client.get(f'/api/menu-items/{self.jollof.slug}/related/')
+        self.assertEqual([item['name'] for item in response.data], ['Grilled Chicken', 'Kelewele'])
+        response = self.client.get(f'/api/menu-items/{self.jollof.slug}/related/', {'limit': 1})
+        self.assertEqual([item['name'] for item in response.data], ['Grilled Chicken'])
+
+        self.client.force_authenticate(self.user)
+        cart = Cart.objects.create(user=self.user, restaurant=self.restaurant)
+        CartItem.objects.create(cart=cart, menu_item=self.jollof)
+        CartItem.objects.create(cart=cart, menu_item=self.plantain)
+        response = self.client.get('/api/orders/cart/current/')
+        self.assertEqual([item['name'] for item in response.data['recommended_items']], ['Grilled Chicken'])
@@ -3,6 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
+from therestaurant.fieldsets import SparseFieldsetViewMixin
 from .models import (
     Order, 
     OrderItem, 
@@ -22,7 +23,7 @@ from .serializers import (
     OrderTrackingSerializer
 )
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['status', 'restaurant']
@@ -134,7 +135,7 @@ class CartViewSet(viewsets.GenericViewSet):
     def current(self, request):
         """Get current user's cart"""
         cart = self.get_cart()
-        serializer = CartSerializer(cart)
+        serializer = CartSerializer(cart, context={'request': request})
         return Response(serializer.data)
 
     @action(detail=False, methods=['post'])
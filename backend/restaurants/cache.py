@@ -0,0 +1,141 @@
+"""
+Versioned response cache for the read-only catalog endpoints.
+
+Anonymous GET responses are stored under a key that embeds a version
+number: the global catalog version for listings (restaurant list,
+popular cuisines, meal periods, ...) and the restaurant's own version for
+its detail and menu. Writes never delete cached responses; the signals in
+restaurants.signals call ``bump_versions`` after the transaction commits,
+so every later request computes a new key and the stale entries simply
+age out. A restaurant bump also bumps the global version, since listings
+show per-restaurant counts and ratings.
+
+Responses are cached as ``response.data`` before rendering, so one entry
+serves every renderer. Cache outages are logged and bypassed.
+"""
+import hashlib
+import logging
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_TIMEOUT = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def restaurant_version_key(restaurant_id):
+    return f'catalog:restaurant:{restaurant_id}:version'
+
+
+def restaurant_slug_key(slug):
+    return f'catalog:slug:{slug}'
+
+
+def _current_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def _increment(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Never read yet: anything cached under it predates this write
+        if not cache.add(key, 2, timeout=None):
+            cache.incr(key)
+
+
+def bump_versions(*restaurant_ids):
+    """Invalidate the global catalog and the given restaurants' cached responses"""
+    try:
+        _increment(CATALOG_VERSION_KEY)
+        for restaurant_id in {pk for pk in restaurant_ids if pk is not None}:
+            _increment(restaurant_version_key(restaurant_id))
+    except Exception:
+        logger.exception("Could not bump catalog cache versions")
+
+
+def bump_versions_on_commit(*restaurant_ids):
+    transaction.on_commit(lambda: bump_versions(*restaurant_ids))
+
+
+def forget_slug(slug):
+    try:
+        cache.delete(restaurant_slug_key(slug))
+    except Exception:
+        logger.exception("Could not drop cached restaurant slug")
+
+
+def _restaurant_id_for_slug(slug):
+    from .models import Restaurant
+
+    key = restaurant_slug_key(slug)
+    restaurant_id = cache.get(key)
+    if restaurant_id is None:
+        restaurant_id = Restaurant.objects.filter(slug=slug).values_list('pk', flat=True).first()
+        if restaurant_id is not None:
+            cache.set(key, restaurant_id, timeout=None)
+    return restaurant_id
+
+
+def _response_key(request, version_key, version):
+    # Absolute URI: pagination links and image URLs in the payload carry the host
+    digest = hashlib.md5(request.build_absolute_uri().encode(), usedforsecurity=False).hexdigest()
+    return f'catalog:response:{version_key}:{version}:{digest}'
+
+
+def cache_catalog_response(per_restaurant=False, uncached_params=()):
+    """
+    Cache a viewset method's successful anonymous GET responses.
+
+    With ``per_restaurant`` the entry follows the version of the restaurant
+    named by the ``slug`` URL kwarg instead of the global catalog version.
+    Requests carrying any of ``uncached_params`` (answers that change with
+    the clock rather than with writes) always go to the view.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if (
+                request.method != 'GET'
+                or request.user.is_authenticated
+                or any(param in request.query_params for param in uncached_params)
+            ):
+                return view_method(self, request, *args, **kwargs)
+
+            key = cached = None
+            try:
+                version_key = CATALOG_VERSION_KEY
+                if per_restaurant:
+                    restaurant_id = _restaurant_id_for_slug(kwargs.get(self.lookup_url_kwarg or self.lookup_field))
+                    version_key = restaurant_version_key(restaurant_id) if restaurant_id else None
+                if version_key:
+                    # Read the version before the data so a concurrent write can only
+                    # ever leave stale data under a version that is already retired.
+                    key = _response_key(request, version_key, _current_version(version_key))
+                    cached = cache.get(key)
+            except Exception:
+                logger.exception("Catalog cache unavailable")
+                key = None
+
+            if cached is not None:
+                return Response(cached)
+            response = view_method(self, request, *args, **kwargs)
+            if key and response.status_code == status.HTTP_200_OK:
+                try:
+                    cache.set(key, response.data, timeout=RESPONSE_TIMEOUT)
+                except Exception:
+                    logger.exception("Could not store catalog response")
+            return response
+        return wrapper
+    return decorator
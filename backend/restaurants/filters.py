@@ -0,0 +1,86 @@
+import django_filters
+from django.core.exceptions import ObjectDoesNotExist
+
+from .models import Restaurant, MenuItem
+
+
+class RestaurantFilter(django_filters.FilterSet):
+    """
+    List filters for restaurants.
+
+    ``features`` and ``features_any`` take comma-separated names
+    (``?features=wifi,parking``) and are resolved on the RestaurantFeature
+    index: ``features`` requires all of them, ``features_any`` at least one.
+
+    ``open_now`` and ``open_at`` (an ISO 8601 datetime; naive values are in
+    the site time zone) use the compiled opening-hours intervals.
+    """
+    features = django_filters.CharFilter(method='filter_all_features', label='Has all features (comma-separated)')
+    features_any = django_filters.CharFilter(method='filter_any_features', label='Has any feature (comma-separated)')
+    open_now = django_filters.BooleanFilter(method='filter_open_now', label='Open right now')
+    open_at = django_filters.IsoDateTimeFilter(method='filter_open_at', label='Open at this time')
+
+    class Meta:
+        model = Restaurant
+        fields = ['cuisine_type', 'price_range']
+
+    @staticmethod
+    def split(value):
+        return [name for name in value.split(',') if name.strip()]
+
+    def filter_all_features(self, queryset, name, value):
+        return queryset.with_all_features(self.split(value))
+
+    def filter_any_features(self, queryset, name, value):
+        return queryset.with_any_features(self.split(value))
+
+    def filter_open_now(self, queryset, name, value):
+        return queryset.open_at() if value else queryset.closed_at()
+
+    def filter_open_at(self, queryset, name, value):
+        return queryset.open_at(value)
+
+
+class MenuItemFilter(django_filters.FilterSet):
+    """
+    List filters for menu items.
+
+    ``exclude_allergens`` and ``exclude_ingredients`` drop items listing any
+    of the comma-separated names; ``ingredients`` keeps items listing all of
+    them. ``ingredient`` is looser: each comma-separated word only has to
+    start a word of one of the item's ingredients (``?ingredient=tomato``
+    finds "cherry tomatoes" too). ``avoid_my_allergens`` excludes the
+    allergens in the signed-in user's profile. All of them run on the
+    MenuItemTerm index.
+    """
+    exclude_allergens = django_filters.CharFilter(method='filter_exclude_allergens', label='Free of allergens (comma-separated)')
+    exclude_ingredients = django_filters.CharFilter(method='filter_exclude_ingredients', label='Without ingredients (comma-separated)')
+    ingredients = django_filters.CharFilter(method='filter_ingredients', label='Has all ingredients (comma-separated)')
+    ingredient = django_filters.CharFilter(method='filter_ingredient', label='Has ingredients mentioning (comma-separated)')
+    avoid_my_allergens = django_filters.BooleanFilter(method='filter_avoid_my_allergens', label='Free of my profile allergens')
+
+    class Meta:
+        model = MenuItem
+        fields = ['restaurant', 'category', 'is_vegetarian', 'is_vegan', 'is_gluten_free', 'spice_level']
+
+    def filter_exclude_allergens(self, queryset, name, value):
+        return queryset.without_allergens(RestaurantFilter.split(value))
+
+    def filter_exclude_ingredients(self, queryset, name, value):
+        return queryset.without_ingredients(RestaurantFilter.split(value))
+
+    def filter_ingredients(self, queryset, name, value):
+        return queryset.with_ingredients(RestaurantFilter.split(value))
+
+    def filter_ingredient(self, queryset, name, value):
+        return queryset.mentioning_ingredients(RestaurantFilter.split(value))
+
+    def filter_avoid_my_allergens(self, queryset, name, value):
+        user = getattr(self.request, 'user', None)
+        if not value or not (user and user.is_authenticated):
+            return queryset
+        try:
+            allergens = user.profile.allergens
+        except ObjectDoesNotExist:
+            return queryset
+        return queryset.without_allergens(allergens)
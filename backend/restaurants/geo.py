@@ -0,0 +1,144 @@
+"""
+Distance search over restaurant coordinates.
+
+Every restaurant with a latitude/longitude stores its geohash at
+``GEOHASH_PRECISION`` (cells of roughly 150 m) in an indexed column. A
+radius query is answered in two steps:
+
+1. ``covering_cells`` picks the finest geohash precision whose cells cover
+   the query's bounding box in at most ``MAX_CELLS`` cells, and
+   ``within_cells`` turns those cells into index range scans on the geohash
+   column. This is a coarse prefilter: it may return rows up to a cell
+   outside the circle, never fewer.
+2. ``haversine_km`` computes the exact great-circle distance of all
+   candidates in one vectorized NumPy pass, and ``nearest`` drops anything
+   outside the radius.
+"""
+import math
+
+import numpy as np
+from django.db.models import Q
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_PRECISION = 7
+MAX_CELLS = 16
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Standard base32 geohash of a point"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(height, width) of a geohash cell in degrees"""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(south, north, west, east) in degrees; west > east when crossing the antimeridian"""
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(latitude - delta_lat, -90.0), min(latitude + delta_lat, 90.0)
+    widest = max(abs(south), abs(north))
+    if widest >= 90.0:
+        return south, north, -180.0, 180.0
+    delta_lng = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(widest))))
+    if delta_lng >= 180.0:
+        return south, north, -180.0, 180.0
+    west = (longitude - delta_lng + 180.0) % 360.0 - 180.0
+    east = (longitude + delta_lng + 180.0) % 360.0 - 180.0
+    return south, north, west, east
+
+
+def _cell_starts(low, high, size, origin):
+    first = origin + math.floor((low - origin) / size) * size
+    count = math.floor((high - origin) / size) - math.floor((low - origin) / size) + 1
+    return [first + size * i for i in range(int(count))]
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """The geohash cells, as few and as fine as possible, covering the radius"""
+    south, north, west, east = bounding_box(latitude, longitude, radius_km)
+    spans = [(west, east)] if west <= east else [(west, 180.0), (-180.0, east)]
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = _cell_starts(south, min(north, 90.0 - height / 2), height, -90.0)
+        columns = [
+            start for low, high in spans
+            for start in _cell_starts(low, min(high, 180.0 - width / 2), width, -180.0)
+        ]
+        if len(rows) * len(columns) <= MAX_CELLS or precision == 1:
+            return sorted({
+                encode_geohash(row + height / 2, column + width / 2, precision)
+                for row in rows for column in columns
+            })
+
+
+def _prefix_upper_bound(prefix):
+    """Smallest string greater than every geohash starting with ``prefix``"""
+    stripped = prefix.rstrip(_BASE32[-1])
+    if not stripped:
+        return None
+    return stripped[:-1] + _BASE32[_BASE32.index(stripped[-1]) + 1]
+
+
+def within_cells(cells, field='geohash'):
+    """Q matching rows whose geohash falls in any of ``cells``, as index range scans"""
+    condition = Q()
+    for cell in cells:
+        bounds = {f'{field}__gte': cell}
+        upper = _prefix_upper_bound(cell)
+        if upper:
+            bounds[f'{field}__lt'] = upper
+        condition |= Q(**bounds)
+    return condition
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Great-circle distances from one point to arrays of points, in km"""
+    lat1, lng1 = np.radians(latitude), np.radians(longitude)
+    lat2 = np.radians(np.asarray(latitudes, dtype=float))
+    lng2 = np.radians(np.asarray(longitudes, dtype=float))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest(queryset, latitude, longitude, radius_km, order_by_distance=True):
+    """
+    Return ``[(pk, distance_km), ...]`` for rows of ``queryset`` within the radius.
+
+    Rows come nearest first, or in the queryset's own order when
+    ``order_by_distance`` is false.
+    """
+    candidates = queryset.filter(within_cells(covering_cells(latitude, longitude, radius_km)))
+    rows = list(candidates.values_list('pk', 'latitude', 'longitude'))
+    if not rows:
+        return []
+
+    pks, latitudes, longitudes = zip(*rows)
+    distances = haversine_km(latitude, longitude, latitudes, longitudes)
+    inside = np.flatnonzero(distances <= radius_km)
+    if order_by_distance:
+        inside = inside[np.argsort(distances[inside], kind='stable')]
+    return [(pks[i], float(distances[i])) for i in inside]
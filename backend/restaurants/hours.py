@@ -0,0 +1,88 @@
+"""
+Opening hours compiled to minute-of-week intervals.
+
+``Restaurant.opening_hours`` is stored in two shapes:
+
+- the admin form: ``{'mon': {'open': '11:00', 'close': '22:00', 'closed': False}, ...}``
+- sample data and older API clients: ``{'monday': '11:00-22:00', 'tuesday': 'closed', ...}``
+  (several ranges may be given as ``'11:00-14:00, 17:00-22:00'``)
+
+``compile_opening_hours`` turns either into sorted, merged ``(start, end)``
+half-open intervals in minutes since Monday 00:00, which restaurants.signals
+stores as RestaurantOpeningInterval rows. A close time at or before the open
+time runs past midnight into the next day, and Sunday night spans wrap
+around to Monday morning. Entries that cannot be parsed are ignored.
+"""
+import re
+
+from django.utils import timezone
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+DAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+_RANGE_RE = re.compile(r'^\s*(\d{1,2})(?::(\d{2}))?\s*-\s*(\d{1,2})(?::(\d{2}))?\s*$')
+
+
+def _minutes(hours, minutes):
+    hours, minutes = int(hours), int(minutes or 0)
+    if hours > 24 or minutes > 59 or (hours == 24 and minutes):
+        raise ValueError
+    return hours * 60 + minutes
+
+
+def _day_ranges(value):
+    """(open, close) minute pairs for one day's entry in either format"""
+    if isinstance(value, dict):
+        if value.get('closed') or not (value.get('open') and value.get('close')):
+            return []
+        value = f"{value['open']}-{value['close']}"
+    if not isinstance(value, str):
+        return []
+    ranges = []
+    for part in value.split(','):
+        match = _RANGE_RE.match(part)
+        if not match:
+            continue
+        try:
+            ranges.append((_minutes(*match.group(1, 2)), _minutes(*match.group(3, 4))))
+        except ValueError:
+            continue
+    return ranges
+
+
+def compile_opening_hours(opening_hours):
+    """Merged minute-of-week intervals for an ``opening_hours`` JSON value"""
+    if not isinstance(opening_hours, dict):
+        return []
+
+    spans = []
+    for key, value in opening_hours.items():
+        day = str(key).strip().lower()[:3]
+        if day not in DAYS:
+            continue
+        offset = DAYS.index(day) * MINUTES_PER_DAY
+        for opens, closes in _day_ranges(value):
+            if closes <= opens:
+                closes += MINUTES_PER_DAY
+            start, end = offset + opens, offset + closes
+            if end > MINUTES_PER_WEEK:
+                spans.append((start, MINUTES_PER_WEEK))
+                spans.append((0, end - MINUTES_PER_WEEK))
+            else:
+                spans.append((start, end))
+
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def minute_of_week(moment=None):
+    """Minutes since Monday 00:00 of ``moment`` (default now) in the current time zone"""
+    moment = timezone.localtime(moment) if moment is None or timezone.is_aware(moment) else moment
+    return moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
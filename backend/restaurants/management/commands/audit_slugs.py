@@ -14,8 +14,7 @@ class Command(BaseCommand):
         if duplicate_restaurant:
             self.stdout.write(self.style.ERROR("Duplicate Restaurant slugs detected:"))
             for s, ids in duplicate_restaurant.items():
-                self.stdout.write(f"  {s}: {ids}
-")
+                self.stdout.write(f"  {s}: {ids}")
         else:
             self.stdout.write(self.style.SUCCESS("No duplicate Restaurant slugs."))
 
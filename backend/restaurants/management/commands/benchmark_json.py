@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from restaurants.models import Restaurant, MenuCategory, MenuItem
+from restaurants.serializers import MenuCategorySerializer
+from therestaurant.renderers import ORJSONRenderer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare stdlib and orjson encoding of a large restaurant menu payload"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--items', type=int, default=200, help="Items per category (default 200)")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per renderer; the best is reported")
+
+    def handle(self, *args, **options):
+        # The menu is created in a transaction that is rolled back afterwards
+        try:
+            with transaction.atomic():
+                self.run(options['categories'], options['items'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, categories, items, repeat):
+        restaurant = Restaurant.objects.create(
+            name='JSON Benchmark', description='Benchmark restaurant', cuisine_type='Ghanaian',
+            address='Accra', phone_number='0240000000', email='bench@example.com',
+        )
+        menu = MenuCategory.objects.bulk_create(
+            MenuCategory(restaurant=restaurant, name=f'Category {i}', display_order=i) for i in range(categories)
+        )
+        MenuItem.objects.bulk_create(
+            MenuItem(
+                restaurant=restaurant, category=category, name=f'Jollof {i}', slug=f'json-benchmark-{category.pk}-{i}',
+                description='Smoky party jollof with chicken', price='25.50',
+                ingredients=['rice', 'tomato', 'pepper'], nutritional_info={'calories': 650},
+            )
+            for category in menu for i in range(items)
+        )
+        request = Request(APIRequestFactory().get('/'))
+        data = MenuCategorySerializer(
+            restaurant.categories.prefetch_related('items__restaurant'), many=True, context={'request': request}
+        ).data
+
+        stdlib = self.best(repeat, lambda: JSONRenderer().render(data))
+        fast = self.best(repeat, lambda: ORJSONRenderer().render(data))
+        size = len(ORJSONRenderer().render(data))
+        self.stdout.write(
+            f"Menu of {categories * items} items ({size / 1024:.0f} KiB): JSONRenderer {stdlib * 1000:.1f}ms, "
+            f"ORJSONRenderer {fast * 1000:.1f}ms ({stdlib / fast:.1f}x)"
+        )
+
+    def best(self, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from restaurants.models import Restaurant, MenuCategory, MenuItem
+from restaurants.serializers import RestaurantListSerializer, MenuItemSerializer
+from therestaurant.fastpath import compile_serializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare ModelSerializer and compiled fast-path serialization of restaurant and menu item lists"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help="Rows per model (default 10000)")
+        parser.add_argument('--repeat', type=int, default=3, help="Timed runs per serializer; the best is reported")
+
+    def handle(self, *args, **options):
+        # Rows are created in a transaction that is rolled back afterwards
+        try:
+            with transaction.atomic():
+                self.run(options['rows'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, rows, repeat):
+        restaurants = Restaurant.objects.bulk_create(
+            Restaurant(
+                name=f'Benchmark {i}', slug=f'benchmark-serializers-{i}', description='Benchmark restaurant',
+                cuisine_type='Ghanaian', address='Accra', phone_number='0240000000', email='bench@example.com',
+                features=['wifi', 'parking'], opening_hours={'monday': '11:00-22:00'},
+            )
+            for i in range(rows)
+        )
+        category = MenuCategory.objects.create(restaurant=restaurants[0], name='Benchmark')
+        MenuItem.objects.bulk_create(
+            MenuItem(
+                restaurant=restaurants[i % len(restaurants)], category=category, name=f'Jollof {i}',
+                slug=f'benchmark-jollof-{i}', description='Rice', price='25.00', ingredients=['rice', 'tomato'],
+            )
+            for i in range(rows)
+        )
+        request = Request(APIRequestFactory().get('/'))
+
+        benchmarks = [
+            (RestaurantListSerializer, Restaurant.objects.filter(slug__startswith='benchmark-serializers-').with_listing_stats()),
+            (MenuItemSerializer, MenuItem.objects.filter(category=category).select_related('restaurant')),
+        ]
+        for serializer_class, queryset in benchmarks:
+            context = {'request': request}
+            # .all(): a fresh queryset per run, so both sides pay for the query
+            model_serializer = self.best(
+                repeat, lambda: serializer_class(queryset.all(), many=True, context=context).data
+            )
+
+            def fast():
+                compiled = compile_serializer(serializer_class(context=context))
+                return compiled.render_many(compiled.values(queryset))
+            fast_path = self.best(repeat, fast)
+
+            self.stdout.write(
+                f"{serializer_class.__name__} x {rows}: ModelSerializer {model_serializer:.3f}s, "
+                f"fast path {fast_path:.3f}s ({model_serializer / fast_path:.1f}x)"
+            )
+
+    def best(self, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
@@ -0,0 +1,56 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from therestaurant import images
+
+# Originals read into memory at a time
+BATCH_SIZE = 50
+
+
+class Command(BaseCommand):
+    help = "Render the resized WebP/JPEG copies of every uploaded image that has none for its current file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Rebuild up-to-date derivatives too")
+        parser.add_argument(
+            '--workers', type=int, default=0,
+            help="Processes resizing images in parallel (default: one per CPU; 1 resizes in this process)",
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] == 1:
+            built = self.build_all(map, options['all'])
+        else:
+            with ProcessPoolExecutor(max_workers=options['workers'] or None) as pool:
+                built = self.build_all(pool.map, options['all'])
+        self.stdout.write(self.style.SUCCESS(f"Built derivatives of {built} images."))
+
+    def build_all(self, render_map, rebuild):
+        return sum(
+            self.build(model, field, variants_field, render_map, rebuild)
+            for model, field, variants_field in images.TRACKED
+        )
+
+    def build(self, model, field, variants_field, render_map, rebuild):
+        rows = model._default_manager.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''}).order_by('pk')
+        pending = [
+            (pk, source) for pk, source, variants in rows.values_list('pk', field, variants_field).iterator()
+            if rebuild or (variants or {}).get('source') != source
+        ]
+        storage = model._meta.get_field(field).storage
+        built = 0
+        for start in range(0, len(pending), BATCH_SIZE):
+            batch, contents = [], []
+            for pk, source in pending[start:start + BATCH_SIZE]:
+                try:
+                    with storage.open(source, 'rb') as image_file:
+                        contents.append(image_file.read())
+                except OSError:
+                    self.stderr.write(f"{model._meta.label} {pk}: cannot read {source}")
+                    continue
+                batch.append((pk, source))
+            sources = [source for _, source in batch]
+            for (pk, source), rendered in zip(batch, render_map(images.safe_render, sources, contents)):
+                if images.store_derivatives(model, pk, field, variants_field, source, rendered) is not None:
+                    built += 1
+        return built
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from restaurants.models import Restaurant
+from restaurants.snapshots import build_snapshot
+
+
+class Command(BaseCommand):
+    help = "Render the menu snapshot of every restaurant whose snapshot is missing or outdated"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Rebuild current snapshots too")
+
+    def handle(self, *args, **options):
+        restaurants = Restaurant.objects.order_by('pk')
+        if not options['all']:
+            restaurants = restaurants.filter(
+                Q(menu_snapshot__isnull=True) | ~Q(menu_snapshot__version=F('menu_version'))
+            )
+        built = 0
+        for restaurant_id in restaurants.values_list('pk', flat=True).iterator():
+            if build_snapshot(restaurant_id) is not None:
+                built += 1
+        self.stdout.write(self.style.SUCCESS(f"Built {built} menu snapshots."))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from restaurants.models import CuisineRollup
+
+
+class Command(BaseCommand):
+    help = "Recompute every CuisineRollup row from the restaurant table"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            cuisines = CuisineRollup.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rollups for {cuisines} cuisines."))
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from restaurants.models import Restaurant, CuisineRollup
+
+
+class Command(BaseCommand):
+    help = "Recompute Restaurant counters and review rating from the child tables, fixing drift in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Restaurants locked and checked per transaction")
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without writing")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        checked = fixed = 0
+        last_pk = 0
+
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    Restaurant.objects
+                    .filter(pk__gt=last_pk)
+                    .order_by('pk')
+                    .select_for_update()
+                    .with_live_stats()[:batch_size]
+                )
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+                checked += len(batch)
+
+                drifted = [restaurant for restaurant in batch if self.reconcile(restaurant)]
+                fixed += len(drifted)
+                for restaurant in drifted:
+                    self.stdout.write(
+                        f"  {restaurant.slug}: categories={restaurant.categories_count} "
+                        f"items={restaurant.menu_items_count} reviews={restaurant.reviews_count} "
+                        f"rating={restaurant.rating}"
+                    )
+                if drifted and not dry_run:
+                    Restaurant.objects.bulk_update(
+                        drifted, list(Restaurant.STATS_FIELDS) + ['rating'], batch_size=batch_size
+                    )
+                    # bulk_update skips signals; ratings feed the cuisine rollups
+                    CuisineRollup.refresh(*(r.cuisine_type for r in drifted if r.is_active))
+
+        verb = "Found" if dry_run else "Fixed"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} restaurants. {verb} {fixed} with drifted stats."))
+
+    def reconcile(self, restaurant):
+        """Copy live values onto the instance; return True if anything changed"""
+        live = {
+            'categories_count': restaurant.live_categories_count,
+            'menu_items_count': restaurant.live_menu_items_count,
+            'reviews_count': restaurant.live_reviews_count,
+            'rating_sum': restaurant.live_rating_sum,
+        }
+        if live['reviews_count']:
+            live['rating'] = Restaurant.average_rating(live['rating_sum'], live['reviews_count'])
+
+        changed = False
+        for field, value in live.items():
+            if getattr(restaurant, field) != value:
+                setattr(restaurant, field, value)
+                changed = True
+        return changed
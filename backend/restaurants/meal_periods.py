@@ -0,0 +1,84 @@
+"""
+Menu items grouped by the meal period of their category.
+
+``meal_period_items`` fetches the first ``limit`` available items of every
+period in one query: items are numbered per period with a ``ROW_NUMBER()``
+window and filtered on that number, so each period costs at most
+``limit + 1`` rows however large the catalog is. The extra row tells
+whether the period has more; the next page of a single period is asked for
+with ``period`` and the id of the last item seen.
+
+Periods run at fixed local times (see ``MEAL_PERIODS``); ``active_periods``
+picks the ones being served at a given time of day. All-day items are
+always active.
+"""
+import datetime
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils.dateparse import parse_datetime, parse_time
+
+
+def _minutes(hours, minutes=0):
+    return hours * 60 + minutes
+
+
+# period: (name, emoji, time label, start minute, end minute); None spans the whole day
+MEAL_PERIODS = {
+    'breakfast': ('Breakfast', '🌅', '7:00 AM - 11:00 AM', _minutes(7), _minutes(11)),
+    'brunch': ('Brunch', '🥞', '10:00 AM - 2:00 PM', _minutes(10), _minutes(14)),
+    'lunch': ('Lunch', '🌤️', '11:30 AM - 3:00 PM', _minutes(11, 30), _minutes(15)),
+    'supper': ('Supper', '🌆', '5:00 PM - 7:00 PM', _minutes(17), _minutes(19)),
+    'dinner': ('Dinner', '🌙', '6:00 PM - 10:00 PM', _minutes(18), _minutes(22)),
+    'all_day': ('All Day', '⭐', 'Available All Day', None, None),
+}
+
+
+def parse_local_time(value):
+    """Wall-clock time of ``HH:MM[:SS]`` or an ISO datetime (in its own offset), or None"""
+    value = (value or '').strip().replace(' ', '+')  # an unescaped '+' in a query string arrives as a space
+    try:
+        parsed = parse_time(value) or parse_datetime(value)
+    except ValueError:
+        return None
+    return parsed.time() if isinstance(parsed, datetime.datetime) else parsed
+
+
+def active_periods(local_time):
+    """Periods served at ``local_time``, in display order"""
+    minute = _minutes(local_time.hour, local_time.minute)
+    return [
+        period for period, (*_, start, end) in MEAL_PERIODS.items()
+        if start is None or start <= minute < end
+    ]
+
+
+def meal_period_items(queryset, periods, limit, compiled=None, after=None):
+    """
+    ``{period: (rows, has_more)}`` for the first ``limit`` items of ``queryset``
+    in each of ``periods`` (after item id ``after``), oldest first.
+
+    Rows are ``compiled.values()`` rows when a CompiledSerializer is given,
+    model instances otherwise.
+    """
+    queryset = queryset.filter(category__meal_period__in=periods)
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    ranked = (
+        queryset
+        .annotate(
+            meal_period=F('category__meal_period'),
+            period_rank=Window(RowNumber(), partition_by=[F('category__meal_period')], order_by=F('id').asc()),
+        )
+        .filter(period_rank__lte=limit + 1)
+        .order_by('id')
+    )
+    if compiled is not None:
+        rows = compiled.values(ranked, extra=('meal_period',))
+    else:
+        rows = ranked.select_related('restaurant')
+
+    grouped = {period: [] for period in periods}
+    for row in rows:
+        grouped[row['meal_period'] if compiled is not None else row.meal_period].append(row)
+    return {period: (rows[:limit], len(rows) > limit) for period, rows in grouped.items()}
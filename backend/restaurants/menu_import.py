@@ -0,0 +1,247 @@
+"""
+Bulk menu import.
+
+``POST /api/restaurants/{slug}/menu/import/`` takes a menu as one of
+
+- CSV (``text/csv``): a header row, then one item per row. List columns
+  (``ingredients``, ``allergens``) separate entries with ``;`` and
+  ``nutritional_info`` holds a JSON object.
+- JSON lines (``application/x-ndjson``): one item object per line.
+- JSON (``application/json``): a list of item objects, or
+  ``{"categories": [{"name", "meal_period", "description", "items": [...]}]}``.
+- A multipart upload of any of these in a ``file`` field, told apart by
+  its extension.
+
+Item rows carry the ``category`` name they belong to; see
+MenuImportRowSerializer for the other columns. CSV and JSON lines are read
+from the request stream as they are parsed, so memory is bounded by
+``BATCH_SIZE`` rather than the size of the menu; a JSON document is parsed
+whole.
+
+Rows are validated ``BATCH_SIZE`` at a time and written with
+``bulk_create`` inside one transaction: categories missing from the
+restaurant are created, existing ones (matched by name) are reused and left
+as they are. An import is all or nothing: if any row is invalid nothing is
+written and the report lists every invalid row (numbered from 1).
+
+``bulk_create`` sends no signals, so items' MenuItemTerm rows are written
+alongside them, and the restaurant counters, menu snapshot, response cache
+and suggestion index are updated through
+``restaurants.signals.menu_rows_bulk_saved``.
+"""
+import codecs
+import csv
+import json
+
+from django.db import transaction
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from therestaurant.renderers import orjson
+
+from .models import MenuCategory, MenuItem, MenuItemTerm
+from .serializers import MenuImportRowSerializer
+from .signals import menu_rows_bulk_saved
+from .slugs import SlugAllocator
+
+BATCH_SIZE = 500
+MAX_ROWS = 10000
+
+CATEGORY_COLUMNS = ('category', 'meal_period', 'category_description')
+LIST_COLUMNS = ('ingredients', 'allergens')
+LIST_SEPARATOR = ';'
+
+
+class BadRow:
+    """A row that could not be decoded; reported with the validation errors"""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def _loads(content):
+    return orjson.loads(content) if orjson else json.loads(content)
+
+
+def csv_rows(stream, encoding='utf-8'):
+    """Item dicts from CSV lines, decoded as they are read"""
+    lines = codecs.iterdecode(stream, 'utf-8-sig' if codecs.lookup(encoding).name == 'utf-8' else encoding)
+    reader = csv.reader(lines)
+    header = [name.strip().lower() for name in next(reader, [])]
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        # Empty cells fall back to the column default
+        row = {name: value.strip() for name, value in zip(header, values) if value.strip()}
+        for name in LIST_COLUMNS:
+            if name in row:
+                row[name] = [part.strip() for part in row[name].split(LIST_SEPARATOR) if part.strip()]
+        if 'nutritional_info' in row:
+            try:
+                row['nutritional_info'] = json.loads(row['nutritional_info'])
+            except ValueError:
+                yield BadRow('nutritional_info is not valid JSON')
+                continue
+        yield row
+
+
+def json_lines_rows(stream):
+    """Item dicts from JSON lines, decoded as they are read"""
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield _loads(line)
+        except ValueError as exc:
+            yield BadRow(f'JSON parse error - {exc}')
+
+
+def json_rows(data):
+    """Item dicts from a parsed JSON menu: a list of items, or nested categories"""
+    if isinstance(data, list):
+        yield from data
+        return
+    if not isinstance(data, dict) or not isinstance(data.get('categories'), list):
+        raise ParseError('Expected a list of items or an object with a "categories" list')
+    for category in data['categories']:
+        if not isinstance(category, dict):
+            yield BadRow('Expected a category object')
+            continue
+        defaults = {
+            'category': category.get('name'),
+            'meal_period': category.get('meal_period'),
+            'category_description': category.get('description'),
+        }
+        defaults = {key: value for key, value in defaults.items() if value is not None}
+        for item in category.get('items') or []:
+            yield {**defaults, **item} if isinstance(item, dict) else item
+
+
+class MenuCSVParser(BaseParser):
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        return csv_rows(stream, encoding)
+
+
+class MenuJSONLinesParser(BaseParser):
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return json_lines_rows(stream)
+
+
+def uploaded_rows(upload):
+    """Item dicts from an uploaded menu file"""
+    name = upload.name.lower()
+    if name.endswith('.csv'):
+        return csv_rows(upload)
+    if name.endswith(('.ndjson', '.jsonl')):
+        return json_lines_rows(upload)
+    if name.endswith('.json'):
+        try:
+            return json_rows(_loads(upload.read()))
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+    raise ParseError('Menu files must be .csv, .json, .ndjson or .jsonl')
+
+
+class _Rollback(Exception):
+    pass
+
+
+class MenuImport:
+    def __init__(self, restaurant):
+        self.restaurant = restaurant
+        self.categories = {category.name: category for category in restaurant.categories.all()}
+        self.next_display_order = max((c.display_order for c in self.categories.values()), default=0) + 1
+        self.errors = []
+        self.rows = 0
+        self.created_categories = 0
+        self.created_items = []
+        self.slugs = SlugAllocator(MenuItem)
+
+    def run(self, rows):
+        batch = []
+        for row in rows:
+            self.rows += 1
+            if self.rows > MAX_ROWS:
+                self.errors.append({'row': self.rows, 'errors': {'non_field_errors': [
+                    f'Imports are limited to {MAX_ROWS} items'
+                ]}})
+                break
+            if isinstance(row, BadRow):
+                self.errors.append({'row': self.rows, 'errors': {'non_field_errors': [row.message]}})
+                continue
+            batch.append((self.rows, row))
+            if len(batch) == BATCH_SIZE:
+                self.import_batch(batch)
+                batch = []
+        if batch:
+            self.import_batch(batch)
+
+    def import_batch(self, batch):
+        serializer = MenuImportRowSerializer(data=[row for _, row in batch], many=True)
+        if not serializer.is_valid():
+            self.errors.extend(
+                {'row': number, 'errors': errors} for (number, _), errors in zip(batch, serializer.errors) if errors
+            )
+            return
+        if self.errors:
+            return  # nothing will be kept; only validate the rest
+
+        new_categories = []
+        for data in serializer.validated_data:
+            if data['category'] not in self.categories:
+                category = MenuCategory(
+                    restaurant=self.restaurant, name=data['category'],
+                    description=data.get('category_description', ''),
+                    meal_period=data.get('meal_period', 'all_day'),
+                    display_order=self.next_display_order,
+                )
+                self.categories[category.name] = category
+                self.next_display_order += 1
+                new_categories.append(category)
+        MenuCategory.objects.bulk_create(new_categories)
+        self.created_categories += len(new_categories)
+
+        items = self.slugs.assign([
+            MenuItem(
+                restaurant=self.restaurant, category=self.categories[data['category']],
+                **{field: value for field, value in data.items() if field not in CATEGORY_COLUMNS},
+            )
+            for data in serializer.validated_data
+        ])
+        self.created_items.extend(MenuItem.objects.bulk_create(items))
+        MenuItemTerm.objects.bulk_create([row for item in items for row in MenuItemTerm.rows_for(item)])
+
+    def finish(self):
+        if self.created_categories or self.created_items:
+            menu_rows_bulk_saved({self.restaurant.pk: {
+                'categories_count': self.created_categories,
+                'menu_items_count': sum(1 for item in self.created_items if item.is_available),
+            }}, self.created_items)
+
+    def report(self):
+        return {
+            'rows': self.rows,
+            'created': {
+                'categories': 0 if self.errors else self.created_categories,
+                'items': 0 if self.errors else len(self.created_items),
+            },
+            'errors': self.errors,
+        }
+
+
+def import_menu(restaurant, rows, dry_run=False):
+    """Import item ``rows`` into ``restaurant``'s menu; returns the report"""
+    menu_import = MenuImport(restaurant)
+    try:
+        with transaction.atomic():
+            menu_import.run(rows)
+            if menu_import.errors or dry_run:
+                raise _Rollback
+            menu_import.finish()
+    except _Rollback:
+        pass
+    return menu_import.report()
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:28
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_stats(apps, schema_editor):
+    Restaurant = apps.get_model('restaurants', 'Restaurant')
+    MenuCategory = apps.get_model('restaurants', 'MenuCategory')
+    MenuItem = apps.get_model('restaurants', 'MenuItem')
+    RestaurantReview = apps.get_model('restaurants', 'RestaurantReview')
+
+    def grouped(queryset, aggregate):
+        rows = queryset.order_by().values('restaurant').annotate(total=aggregate)
+        return {row['restaurant']: row['total'] for row in rows}
+
+    categories = grouped(MenuCategory.objects.all(), Count('pk'))
+    items = grouped(MenuItem.objects.filter(is_available=True), Count('pk'))
+    reviews = grouped(RestaurantReview.objects.all(), Count('pk'))
+    rating_sums = grouped(RestaurantReview.objects.all(), Sum('rating'))
+
+    restaurants = list(Restaurant.objects.only('pk', 'rating'))
+    for restaurant in restaurants:
+        restaurant.categories_count = categories.get(restaurant.pk, 0)
+        restaurant.menu_items_count = items.get(restaurant.pk, 0)
+        restaurant.reviews_count = reviews.get(restaurant.pk, 0)
+        restaurant.rating_sum = rating_sums.get(restaurant.pk, 0)
+        if restaurant.reviews_count:
+            restaurant.rating = (Decimal(restaurant.rating_sum) / restaurant.reviews_count).quantize(Decimal('0.01'))
+    Restaurant.objects.bulk_update(
+        restaurants,
+        ['categories_count', 'menu_items_count', 'reviews_count', 'rating_sum', 'rating'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0008_restaurant_owner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='categories_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='menu_items_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Available menu items'),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='rating_sum',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='reviews_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+# Kept literal rather than imported from restaurants.search so the migration
+# stays fixed if that module changes.
+RESTAURANT_TABLE = 'restaurants_restaurant'
+FTS_TABLE = 'restaurants_restaurant_fts'
+SEARCH_FIELDS = ('name', 'cuisine_type', 'description', 'address')
+PG_DOCUMENT_SQL = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(cuisine_type, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C') || "
+    "setweight(to_tsvector('english', coalesce(address, '')), 'D')"
+)
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    columns = ', '.join(SEARCH_FIELDS)
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(f"ALTER TABLE {RESTAURANT_TABLE} ADD COLUMN search_document tsvector")
+        schema_editor.execute(f"UPDATE {RESTAURANT_TABLE} SET search_document = {PG_DOCUMENT_SQL}")
+        schema_editor.execute(
+            f"CREATE INDEX restaurants_restaurant_search_gin ON {RESTAURANT_TABLE} USING GIN (search_document)"
+        )
+    elif connection.vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({columns}, tokenize='unicode61 remove_diacritics 2')"
+            )
+        except OperationalError:
+            # SQLite built without FTS5: search falls back to icontains.
+            return
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, {columns}) SELECT id, {columns} FROM {RESTAURANT_TABLE}"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS restaurants_restaurant_search_gin")
+        schema_editor.execute(f"ALTER TABLE {RESTAURANT_TABLE} DROP COLUMN IF EXISTS search_document")
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0009_restaurant_stats_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
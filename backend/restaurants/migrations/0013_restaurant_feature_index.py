@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_features(apps, schema_editor):
+    Restaurant = apps.get_model('restaurants', 'Restaurant')
+    RestaurantFeature = apps.get_model('restaurants', 'RestaurantFeature')
+    rows = []
+    for restaurant_id, features in Restaurant.objects.values_list('pk', 'features').iterator():
+        names = {
+            name.strip().lower()[:50] for name in features or ()
+            if isinstance(name, str) and name.strip()
+        }
+        rows.extend(RestaurantFeature(restaurant_id=restaurant_id, name=name) for name in sorted(names))
+    RestaurantFeature.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0012_restaurant_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantFeature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feature_rows', to='restaurants.restaurant')),
+            ],
+            options={
+                'unique_together': {('name', 'restaurant')},
+            },
+        ),
+        migrations.RunPython(backfill_features, migrations.RunPython.noop),
+    ]
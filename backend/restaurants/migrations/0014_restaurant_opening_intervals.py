@@ -0,0 +1,100 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:44
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# A copy of restaurants.hours as of this migration, so later changes to that
+# module cannot change what it does.
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+DAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+_RANGE_RE = re.compile(r'^\s*(\d{1,2})(?::(\d{2}))?\s*-\s*(\d{1,2})(?::(\d{2}))?\s*$')
+
+
+def _minutes(hours, minutes):
+    hours, minutes = int(hours), int(minutes or 0)
+    if hours > 24 or minutes > 59 or (hours == 24 and minutes):
+        raise ValueError
+    return hours * 60 + minutes
+
+
+def _day_ranges(value):
+    if isinstance(value, dict):
+        if value.get('closed') or not (value.get('open') and value.get('close')):
+            return []
+        value = f"{value['open']}-{value['close']}"
+    if not isinstance(value, str):
+        return []
+    ranges = []
+    for part in value.split(','):
+        match = _RANGE_RE.match(part)
+        if not match:
+            continue
+        try:
+            ranges.append((_minutes(*match.group(1, 2)), _minutes(*match.group(3, 4))))
+        except ValueError:
+            continue
+    return ranges
+
+
+def compile_opening_hours(opening_hours):
+    if not isinstance(opening_hours, dict):
+        return []
+    spans = []
+    for key, value in opening_hours.items():
+        day = str(key).strip().lower()[:3]
+        if day not in DAYS:
+            continue
+        offset = DAYS.index(day) * MINUTES_PER_DAY
+        for opens, closes in _day_ranges(value):
+            if closes <= opens:
+                closes += MINUTES_PER_DAY
+            start, end = offset + opens, offset + closes
+            if end > MINUTES_PER_WEEK:
+                spans.append((start, MINUTES_PER_WEEK))
+                spans.append((0, end - MINUTES_PER_WEEK))
+            else:
+                spans.append((start, end))
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def compile_existing_hours(apps, schema_editor):
+    Restaurant = apps.get_model('restaurants', 'Restaurant')
+    RestaurantOpeningInterval = apps.get_model('restaurants', 'RestaurantOpeningInterval')
+    rows = [
+        RestaurantOpeningInterval(restaurant_id=restaurant_id, start_minute=start, end_minute=end)
+        for restaurant_id, opening_hours in Restaurant.objects.values_list('pk', 'opening_hours').iterator()
+        for start, end in compile_opening_hours(opening_hours)
+    ]
+    RestaurantOpeningInterval.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0013_restaurant_feature_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantOpeningInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_minute', models.PositiveIntegerField()),
+                ('end_minute', models.PositiveIntegerField()),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opening_intervals', to='restaurants.restaurant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['start_minute', 'end_minute'], name='opening_interval_range_idx')],
+            },
+        ),
+        migrations.RunPython(compile_existing_hours, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:47
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Avg, Count
+
+TOP_N = 10
+
+
+def build_rollups(apps, schema_editor):
+    Restaurant = apps.get_model('restaurants', 'Restaurant')
+    CuisineRollup = apps.get_model('restaurants', 'CuisineRollup')
+    active = Restaurant.objects.filter(is_active=True)
+    stats = active.order_by().values('cuisine_type').annotate(count=Count('pk'), average=Avg('rating'))
+    CuisineRollup.objects.bulk_create([
+        CuisineRollup(
+            cuisine_type=row['cuisine_type'],
+            restaurant_count=row['count'],
+            avg_rating=Decimal(row['average'] or 0).quantize(Decimal('0.01')),
+            top_restaurant_ids=list(
+                active.filter(cuisine_type=row['cuisine_type'])
+                .order_by('-rating', 'name', 'id')
+                .values_list('pk', flat=True)[:TOP_N]
+            ),
+        )
+        for row in stats
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0014_restaurant_opening_intervals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CuisineRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cuisine_type', models.CharField(max_length=100, unique=True)),
+                ('restaurant_count', models.IntegerField(default=0)),
+                ('avg_rating', models.DecimalField(decimal_places=2, default=0, max_digits=3)),
+                ('top_restaurant_ids', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-restaurant_count', '-avg_rating'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['cuisine_type', '-rating', 'name', 'id'], name='restaurant_cuisine_rating_idx'),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0015_cuisine_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menucategory',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
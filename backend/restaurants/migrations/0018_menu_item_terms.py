@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def normalize_terms(values):
+    names = set()
+    for value in values or ():
+        if isinstance(value, dict):
+            value = value.get('name')
+        if isinstance(value, str):
+            name = ' '.join(value.replace('_', ' ').lower().split())[:100]
+            if name:
+                names.add(name)
+    return names
+
+
+def backfill_terms(apps, schema_editor):
+    MenuItem = apps.get_model('restaurants', 'MenuItem')
+    MenuItemTerm = apps.get_model('restaurants', 'MenuItemTerm')
+    rows = []
+    for item_id, allergens, ingredients in MenuItem.objects.values_list('pk', 'allergens', 'ingredients').iterator():
+        for kind, values in (('allergen', allergens), ('ingredient', ingredients)):
+            rows.extend(
+                MenuItemTerm(menu_item_id=item_id, kind=kind, name=name) for name in sorted(normalize_terms(values))
+            )
+    MenuItemTerm.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0017_menu_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuItemTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('allergen', 'Allergen'), ('ingredient', 'Ingredient')], max_length=10)),
+                ('name', models.CharField(max_length=100)),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='restaurants.menuitem')),
+            ],
+            options={
+                'unique_together': {('kind', 'name', 'menu_item')},
+            },
+        ),
+        migrations.RunPython(backfill_terms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:41
+
+from django.db import migrations, models
+
+
+def backfill_ingredient_words(apps, schema_editor):
+    MenuItemTerm = apps.get_model('restaurants', 'MenuItemTerm')
+    rows = []
+    for item_id, name in MenuItemTerm.objects.filter(kind='ingredient').values_list('menu_item_id', 'name').iterator():
+        rows.extend(MenuItemTerm(menu_item_id=item_id, kind='word', name=word) for word in set(name.split()))
+    MenuItemTerm.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+
+
+def remove_ingredient_words(apps, schema_editor):
+    apps.get_model('restaurants', 'MenuItemTerm').objects.filter(kind='word').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0019_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='menuitemterm',
+            name='kind',
+            field=models.CharField(choices=[('allergen', 'Allergen'), ('ingredient', 'Ingredient'), ('word', 'Ingredient word')], max_length=10),
+        ),
+        migrations.RunPython(backfill_ingredient_words, remove_ingredient_words),
+    ]
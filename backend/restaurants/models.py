@@ -1,20 +1,114 @@
-from django.db import models
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import Avg, Count, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.utils.text import slugify
 
+from .geo import encode_geohash
+from .hours import minute_of_week
+from .slugs import SLUG_BASE_LENGTH, UniqueSlugMixin
+
 User = get_user_model()
 
-class Restaurant(models.Model):
+
+def _related_aggregate(model, aggregate, default=0, output_field=None, **filters):
+    """Correlated aggregate over ``model`` rows pointing at the outer restaurant."""
+    rows = (
+        model.objects
+        .filter(restaurant=OuterRef('pk'), **filters)
+        .order_by()
+        .values('restaurant')
+        .annotate(total=aggregate)
+        .values('total')
+    )
+    subquery = Subquery(rows, output_field=output_field or models.IntegerField())
+    return subquery if default is None else Coalesce(subquery, default)
+
+
+class RestaurantQuerySet(models.QuerySet):
+    def with_listing_stats(self):
+        """Join the owner so listings need no per-row lookups; counts are stored columns"""
+        return self.select_related('owner')
+
+    def with_live_stats(self):
+        """Annotate counters recomputed from the child tables (used to detect drift)"""
+        return self.annotate(
+            live_categories_count=_related_aggregate(MenuCategory, Count('pk')),
+            live_menu_items_count=_related_aggregate(MenuItem, Count('pk'), is_available=True),
+            live_reviews_count=_related_aggregate(RestaurantReview, Count('pk')),
+            live_rating_sum=_related_aggregate(RestaurantReview, Sum('rating')),
+        )
+
+    def with_content_state(self):
+        """
+        Annotate what a restaurant's detail and menu payloads are built from:
+        the newest ``updated_at`` and row count of its categories, items and
+        reviews. Used for ETag/Last-Modified; deletes and moves of those rows
+        touch ``Restaurant.updated_at`` (see restaurants.signals).
+        """
+        latest = {'default': None, 'output_field': models.DateTimeField()}
+        return self.annotate(
+            categories_updated_at=_related_aggregate(MenuCategory, Max('updated_at'), **latest),
+            categories_total=_related_aggregate(MenuCategory, Count('pk')),
+            items_updated_at=_related_aggregate(MenuItem, Max('updated_at'), **latest),
+            items_total=_related_aggregate(MenuItem, Count('pk')),
+            reviews_updated_at=_related_aggregate(RestaurantReview, Max('updated_at'), **latest),
+        )
+
+    def with_all_features(self, names):
+        """Restaurants offering every one of ``names``, resolved on the feature index"""
+        names = normalize_features(names)
+        if not names:
+            return self
+        matching = (
+            RestaurantFeature.objects
+            .filter(name__in=names)
+            .values('restaurant')
+            .annotate(matched=Count('pk'))
+            .filter(matched=len(names))
+            .values('restaurant')
+        )
+        return self.filter(pk__in=matching)
+
+    def with_any_features(self, names):
+        """Restaurants offering at least one of ``names``"""
+        names = normalize_features(names)
+        if not names:
+            return self
+        return self.filter(pk__in=RestaurantFeature.objects.filter(name__in=names).values('restaurant'))
+
+    def open_at(self, moment=None):
+        """Restaurants whose compiled opening hours cover ``moment`` (default now)"""
+        return self.filter(pk__in=RestaurantOpeningInterval.restaurants_open_at(moment))
+
+    def closed_at(self, moment=None):
+        return self.exclude(pk__in=RestaurantOpeningInterval.restaurants_open_at(moment))
+
+
+def normalize_features(names):
+    """Distinct, trimmed, lower-cased feature names from a JSON list or query values"""
+    return {name.strip().lower()[:50] for name in names or () if isinstance(name, str) and name.strip()}
+
+
+class Restaurant(UniqueSlugMixin, models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='owned_restaurants', limit_choices_to={'user_type__in': ['vendor', 'platform_admin']}, null=True, blank=True)
     name = models.CharField(max_length=200)
     slug = models.SlugField(max_length=255, unique=True, blank=True)
     description = models.TextField()
     cuisine_type = models.CharField(max_length=100)
     address = models.TextField()
+    latitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)])
+    longitude = models.FloatField(null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)])
+    # Grid cell of (latitude, longitude) for nearby search; see restaurants.geo
+    geohash = models.CharField(max_length=12, blank=True, editable=False, db_index=True)
     phone_number = models.CharField(max_length=15)
     email = models.EmailField()
     website = models.URLField(blank=True)
     image = models.ImageField(upload_to='restaurants/', blank=True)
+    # {'source': image name, 'widths': [...]} of its derivatives (therestaurant.images)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
     price_range = models.CharField(max_length=20, choices=[
         ('$', 'Budget'),
@@ -28,26 +122,119 @@ class Restaurant(models.Model):
     delivery_time = models.CharField(max_length=50, default="30-45 min", help_text="Estimated delivery time")
     min_order = models.DecimalField(max_digits=8, decimal_places=2, default=15.00, help_text="Minimum order amount in GHC")
     is_active = models.BooleanField(default=True)
+    # Denormalized counters maintained by restaurants.signals; see reconcile_restaurant_stats
+    categories_count = models.IntegerField(default=0, editable=False)
+    menu_items_count = models.IntegerField(default=0, editable=False, help_text="Available menu items")
+    reviews_count = models.IntegerField(default=0, editable=False)
+    rating_sum = models.IntegerField(default=0, editable=False)
+    # Bumped on every menu change; see restaurants.snapshots
+    menu_version = models.IntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    STATS_FIELDS = ('categories_count', 'menu_items_count', 'reviews_count', 'rating_sum')
+    # Only ever changed with F() updates, so save() never writes them back
+    COUNTER_FIELDS = STATS_FIELDS + ('menu_version',)
+
+    objects = RestaurantQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Default listing order; also the keyset pagination sort key
+            models.Index(fields=['-rating', 'name', 'id'], name='restaurant_rating_name_idx'),
+            # Per-cuisine leaderboard refresh in CuisineRollup.refresh
+            models.Index(fields=['cuisine_type', '-rating', 'name', 'id'], name='restaurant_cuisine_rating_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+    CONTENT_STATE_FIELDS = (
+        'pk', 'updated_at', 'reviews_count', 'rating_sum',
+        'categories_updated_at', 'categories_total', 'items_updated_at', 'items_total', 'reviews_updated_at',
+    )
+
+    @classmethod
+    def content_state(cls, slug):
+        """(ETag parts, Last-Modified) of an active restaurant's detail and menu, or None"""
+        row = (
+            cls.objects.filter(slug=slug, is_active=True)
+            .with_content_state()
+            .values_list(*cls.CONTENT_STATE_FIELDS)
+            .first()
+        )
+        if row is None:
+            return None
+        timestamps = [value for value in (row[1], row[4], row[6], row[8]) if value is not None]
+        return row, max(timestamps)
+
+    @staticmethod
+    def average_rating(rating_sum, reviews_count):
+        """Review average rounded to the precision of the rating column"""
+        if not reviews_count:
+            return Decimal('0.00')
+        return (Decimal(rating_sum) / reviews_count).quantize(Decimal('0.01'))
+
     def save(self, *args, **kwargs):
-        if not self.slug and self.name:
-            raw_base = slugify(self.name) or "restaurant"
-            # Ensure base length leaves room for numeric suffixes
-            base = raw_base[:240]
-            candidate = base
-            i = 1
-            while Restaurant.objects.filter(slug=candidate).exclude(pk=self.pk).exists():
-                i += 1
-                suffix = f"-{i}"
-                candidate = f"{base[:240-len(suffix)]}{suffix}"
-            self.slug = candidate
+        # Counters are only ever changed with F() updates; never write back
+        # a possibly stale in-memory copy when saving an existing row.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS
+            ]
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = encode_geohash(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
         super().save(*args, **kwargs)
 
+    def slug_base(self):
+        if not self.name:
+            return ''
+        return (slugify(self.name) or "restaurant")[:SLUG_BASE_LENGTH]
+
+class RestaurantFeature(models.Model):
+    """
+    One row per entry of ``Restaurant.features``, kept in sync by
+    restaurants.signals so feature filters use an index instead of
+    scanning the JSON list of every row.
+    """
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='feature_rows')
+    name = models.CharField(max_length=50)
+
+    class Meta:
+        unique_together = ['name', 'restaurant']
+
+    def __str__(self):
+        return f"{self.restaurant_id} - {self.name}"
+
+class RestaurantOpeningInterval(models.Model):
+    """
+    ``Restaurant.opening_hours`` compiled to half-open minute-of-week ranges
+    (Monday 00:00 = 0) by restaurants.hours; kept in sync by restaurants.signals.
+    """
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='opening_intervals')
+    start_minute = models.PositiveIntegerField()
+    end_minute = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_minute', 'end_minute'], name='opening_interval_range_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.restaurant_id}: {self.start_minute}-{self.end_minute}"
+
+    @classmethod
+    def restaurants_open_at(cls, moment=None):
+        """Subquery of restaurant ids open at ``moment``, one index range scan"""
+        minute = minute_of_week(moment)
+        return cls.objects.filter(start_minute__lte=minute, end_minute__gt=minute).values('restaurant')
+
 class MenuCategory(models.Model):
     MEAL_PERIOD_CHOICES = [
         ('breakfast', 'Breakfast'),
@@ -61,8 +248,11 @@ class MenuCategory(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='menu_categories/', blank=True)
+    # {'source': image name, 'widths': [...]} of its derivatives (therestaurant.images)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     meal_period = models.CharField(max_length=20, choices=MEAL_PERIOD_CHOICES, default='all_day')
     display_order = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['display_order']
@@ -71,7 +261,73 @@ class MenuCategory(models.Model):
     def __str__(self):
         return f"{self.restaurant.name} - {self.name}"
 
-class MenuItem(models.Model):
+    def save(self, *args, **kwargs):
+        # Keep the restaurant counter update in the same transaction as the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+def normalize_terms(values):
+    """
+    Distinct, lower-cased allergen or ingredient names from a JSON list or
+    query values. Entries may be strings or ``{'name': ...}`` objects;
+    underscores and runs of whitespace become single spaces.
+    """
+    names = set()
+    for value in values or ():
+        if isinstance(value, dict):
+            value = value.get('name')
+        if isinstance(value, str):
+            name = ' '.join(value.replace('_', ' ').lower().split())[:100]
+            if name:
+                names.add(name)
+    return names
+
+
+class MenuItemQuerySet(models.QuerySet):
+    def _term_items(self, kind, names):
+        return MenuItemTerm.objects.filter(kind=kind, name__in=names).values('menu_item')
+
+    def without_terms(self, kind, names):
+        """Items listing none of ``names`` as ``kind``: an anti-join on the term index"""
+        names = normalize_terms(names)
+        if not names:
+            return self
+        return self.exclude(pk__in=self._term_items(kind, names))
+
+    def with_all_terms(self, kind, names):
+        """Items listing every one of ``names`` as ``kind``"""
+        names = normalize_terms(names)
+        if not names:
+            return self
+        matching = (
+            self._term_items(kind, names)
+            .annotate(matched=Count('pk'))
+            .filter(matched=len(names))
+            .values('menu_item')
+        )
+        return self.filter(pk__in=matching)
+
+    def without_allergens(self, names):
+        return self.without_terms(MenuItemTerm.ALLERGEN, names)
+
+    def without_ingredients(self, names):
+        return self.without_terms(MenuItemTerm.INGREDIENT, names)
+
+    def with_ingredients(self, names):
+        return self.with_all_terms(MenuItemTerm.INGREDIENT, names)
+
+    def mentioning_ingredients(self, words):
+        """
+        Items with, for each of ``words``, an ingredient having a word that
+        starts with it: ``sauce`` finds "peanut sauce", ``tom`` "tomato".
+        """
+        queryset = self
+        for word in sorted({word for term in normalize_terms(words) for word in term.split()}):
+            queryset = queryset.filter(pk__in=MenuItemTerm.ingredients_mentioning(word).values('menu_item'))
+        return queryset
+
+
+class MenuItem(UniqueSlugMixin, models.Model):
     restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='menu_items')
     category = models.ForeignKey(MenuCategory, on_delete=models.CASCADE, related_name='items')
     name = models.CharField(max_length=200)
@@ -79,6 +335,8 @@ class MenuItem(models.Model):
     description = models.TextField()
     price = models.DecimalField(max_digits=8, decimal_places=2)
     image = models.ImageField(upload_to='menu_items/', blank=True)
+    # {'source': image name, 'widths': [...]} of its derivatives (therestaurant.images)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     # ingredients: list of objects {name, quantity, unit, notes}
     ingredients = models.JSONField(default=list, help_text="List of ingredients as objects: [{name, quantity, unit, notes}]")
     allergens = models.JSONField(default=list)
@@ -92,25 +350,73 @@ class MenuItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = MenuItemQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.restaurant.name} - {self.name}"
 
+    def slug_base(self):
+        if not self.name:
+            return ''
+        base_parts = []
+        if self.restaurant_id and hasattr(self, 'restaurant') and self.restaurant and self.restaurant.name:
+            base_parts.append(self.restaurant.name)
+        base_parts.append(self.name)
+        return (slugify("-".join(base_parts)) or "menu-item")[:SLUG_BASE_LENGTH]
+
     def save(self, *args, **kwargs):
-        if not self.slug and self.name:
-            base_parts = []
-            if self.restaurant_id and hasattr(self, 'restaurant') and self.restaurant and self.restaurant.name:
-                base_parts.append(self.restaurant.name)
-            base_parts.append(self.name)
-            raw_base = slugify("-".join(base_parts)) or "menu-item"
-            base = raw_base[:240]
-            candidate = base
-            i = 1
-            while MenuItem.objects.filter(slug=candidate).exclude(pk=self.pk).exists():
-                i += 1
-                suffix = f"-{i}"
-                candidate = f"{base[:240-len(suffix)]}{suffix}"
-            self.slug = candidate
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+class MenuItemTerm(models.Model):
+    """
+    One row per normalized entry of ``MenuItem.allergens`` or
+    ``MenuItem.ingredients``, and per distinct word of those ingredients,
+    kept in sync by restaurants.signals so allergen and ingredient filters
+    are index lookups rather than scans of every item's JSON.
+    """
+    ALLERGEN = 'allergen'
+    INGREDIENT = 'ingredient'
+    INGREDIENT_WORD = 'word'
+    KIND_CHOICES = [(ALLERGEN, 'Allergen'), (INGREDIENT, 'Ingredient'), (INGREDIENT_WORD, 'Ingredient word')]
+    # MenuItem JSON field each kind is read from
+    FIELDS = {ALLERGEN: 'allergens', INGREDIENT: 'ingredients', INGREDIENT_WORD: 'ingredients'}
+
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='terms')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        unique_together = ['kind', 'name', 'menu_item']
+
+    def __str__(self):
+        return f"{self.menu_item_id} - {self.kind}: {self.name}"
+
+    @classmethod
+    def names(cls, kind, values):
+        """The names ``values`` (a MenuItem JSON list) are indexed under as ``kind``"""
+        names = normalize_terms(values)
+        if kind == cls.INGREDIENT_WORD:
+            return {word for name in names for word in name.split()}
+        return names
+
+    @classmethod
+    def ingredients_mentioning(cls, word):
+        """Ingredient word rows starting with the normalized single ``word``"""
+        # The range lets every backend walk the (kind, name) index, whatever
+        # its LIKE collation; startswith keeps the match exact
+        return cls.objects.filter(
+            kind=cls.INGREDIENT_WORD, name__gte=word, name__lt=word + '\U0010ffff', name__startswith=word,
+        )
+
+    @classmethod
+    def rows_for(cls, item, kinds=None):
+        """Unsaved rows mirroring ``item``'s JSON lists (all kinds, or just ``kinds``)"""
+        return [
+            cls(menu_item=item, kind=kind, name=name)
+            for kind in kinds or cls.FIELDS
+            for name in sorted(cls.names(kind, getattr(item, cls.FIELDS[kind])))
+        ]
 
 class RestaurantReview(models.Model):
     restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='reviews')
@@ -123,6 +429,79 @@ class RestaurantReview(models.Model):
 
     class Meta:
         unique_together = ['restaurant', 'user']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='review_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.restaurant.name} ({self.rating}/5)"
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class CuisineRollup(models.Model):
+    """
+    Per-cuisine aggregates over active restaurants: how many there are, their
+    average rating and the ids of the best rated, in leaderboard order.
+
+    Rows are refreshed one cuisine at a time by restaurants.signals whenever
+    a restaurant's ``is_active``, ``cuisine_type`` or ``rating`` changes, so
+    the popular cuisines list and leaderboards never aggregate the
+    restaurant table on read. ``rebuild_cuisine_rollups`` recomputes them all.
+    """
+    TOP_N = 10
+
+    cuisine_type = models.CharField(max_length=100, unique=True)
+    restaurant_count = models.IntegerField(default=0)
+    avg_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    top_restaurant_ids = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-restaurant_count', '-avg_rating']
+
+    def __str__(self):
+        return f"{self.cuisine_type} ({self.restaurant_count})"
+
+    @classmethod
+    def refresh(cls, *cuisines):
+        """Recompute the rollups of the given cuisines from their active restaurants"""
+        for cuisine in {cuisine for cuisine in cuisines if cuisine is not None}:
+            active = Restaurant.objects.filter(is_active=True, cuisine_type=cuisine)
+            stats = active.aggregate(count=Count('pk'), average=Avg('rating'))
+            if not stats['count']:
+                cls.objects.filter(cuisine_type=cuisine).delete()
+                continue
+            top = list(active.order_by('-rating', 'name', 'id').values_list('pk', flat=True)[:cls.TOP_N])
+            cls.objects.update_or_create(cuisine_type=cuisine, defaults={
+                'restaurant_count': stats['count'],
+                'avg_rating': Decimal(stats['average'] or 0).quantize(Decimal('0.01')),
+                'top_restaurant_ids': top,
+            })
+
+    @classmethod
+    def rebuild(cls):
+        """Refresh every cuisine and drop rollups for cuisines with no restaurants left"""
+        cuisines = set(Restaurant.objects.values_list('cuisine_type', flat=True).distinct())
+        cls.objects.exclude(cuisine_type__in=cuisines).delete()
+        cls.refresh(*cuisines)
+        return len(cuisines)
+
+
+class MenuSnapshot(models.Model):
+    """
+    A restaurant's full menu pre-rendered to JSON bytes, as served by the
+    ``menu`` action. ``version`` is the ``Restaurant.menu_version`` the
+    bytes were rendered from; the snapshot is current while they match.
+    Built by restaurants.snapshots.
+    """
+    restaurant = models.OneToOneField(Restaurant, on_delete=models.CASCADE, primary_key=True, related_name='menu_snapshot')
+    version = models.IntegerField()
+    content = models.BinaryField()
+    built_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.restaurant_id} v{self.version}"
+
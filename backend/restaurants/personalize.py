@@ -0,0 +1,387 @@
+"""
+Personalized restaurant ranking for the home feed (``/api/restaurants/for-you/``).
+
+Every active restaurant is a row of one float32 feature matrix held by each
+process:
+
+- one-hot cuisine (normalized like menu terms, so "West  African" and
+  "west african" share a column),
+- the share of its available menu items that are vegetarian, vegan and
+  gluten-free,
+- the share of its available menu items listing each allergen,
+- one-hot price range,
+- its rating over 5.
+
+A user's preferences become a weight vector over the same columns:
+favorite cuisines and the cuisines and price ranges of their recent orders
+add weight, ``dietary_preferences`` reward the matching shares and profile
+allergens subtract theirs. Ranking is then a single matrix-vector product,
+plus a small boost for restaurants the user ordered from before, and an
+``argpartition`` for the top rows.
+
+The matrix is built lazily and kept current like the search suggestion
+index: restaurants changed in this process are marked dirty from the model
+signals once the write commits, every ``SYNC_INTERVAL`` seconds restaurants
+and menu items whose ``updated_at`` moved past the watermark are marked
+too, and only dirty rows are recomputed. A cuisine or allergen never seen
+before widens the matrix, which takes a full rebuild; one also happens every
+``REBUILD_INTERVAL`` seconds to drop rows deleted elsewhere.
+
+User preferences are cached for ``USER_CACHE_TIMEOUT`` seconds and dropped
+when the profile, the user or one of their orders is saved.
+"""
+import itertools
+import logging
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Q
+
+from accounts.models import UserProfile
+from orders.models import Order
+
+from .models import MenuItem, MenuItemTerm, Restaurant, normalize_terms
+
+logger = logging.getLogger(__name__)
+
+SYNC_INTERVAL = 30
+REBUILD_INTERVAL = 60 * 60
+USER_CACHE_TIMEOUT = 15 * 60
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# Orders read for a user's history, newest first
+HISTORY_ORDERS = 200
+# Restaurants refreshed per query
+REFRESH_BATCH = 500
+
+WEIGHTS = {
+    'favorite_cuisine': 1.0,
+    'ordered_cuisine': 1.0,   # times the share of orders from that cuisine
+    'dietary': 1.5,           # times the share of matching menu items
+    'allergen': 2.0,          # subtracted, times the share of items with it
+    'price': 0.5,             # times the share of orders in that price range
+    'rating': 1.0,            # times rating / 5
+    'reorder': 0.5,           # times log(1 + orders from the restaurant)
+}
+
+DIETARY_FLAGS = {'vegetarian': 'is_vegetarian', 'vegan': 'is_vegan', 'gluten free': 'is_gluten_free'}
+PRICE_RANGES = ('$', '$$', '$$$', '$$$$')
+
+
+def normalize_cuisine(value):
+    return next(iter(normalize_terms([value])), '')
+
+
+def _chunks(values, size=REFRESH_BATCH):
+    values = sorted(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class RestaurantVectors:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        self.built = False
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.active = np.zeros(0, dtype=bool)
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.positions = {}          # restaurant id -> row
+        self.cuisine_columns = {}    # normalized cuisine -> column
+        self.allergen_columns = {}   # allergen -> column
+        self.dietary_columns = {}    # dietary preference -> column
+        self.price_columns = {}      # price range -> column
+        self.rating_column = 0
+        self.dirty = set()
+        self.watermark = None
+        self.built_at = 0.0
+        self.synced_at = 0.0
+
+    # -- loading --------------------------------------------------------
+
+    def _load(self, restaurant_ids=None):
+        """
+        ``(restaurants, item_stats, allergen_counts)`` for ``restaurant_ids``,
+        or for every active restaurant
+        """
+        restaurants = Restaurant.objects.all()
+        items = MenuItem.objects.filter(is_available=True)
+        if restaurant_ids is None:
+            restaurants = restaurants.filter(is_active=True)
+            items = items.filter(restaurant__is_active=True)
+            allergen_counts = list(
+                MenuItemTerm.objects
+                .filter(kind=MenuItemTerm.ALLERGEN, menu_item__is_available=True, menu_item__restaurant__is_active=True)
+                .values('menu_item__restaurant_id', 'name').annotate(count=Count('pk'))
+                .values_list('menu_item__restaurant_id', 'name', 'count')
+            )
+        else:
+            restaurants = restaurants.filter(pk__in=restaurant_ids)
+            items = items.filter(restaurant__in=restaurant_ids)
+            # Looked up by menu item and counted here: filtering on kind
+            # makes SQLite walk every allergen row through the kind index
+            counts = Counter(
+                (restaurant_id, name)
+                for restaurant_id, kind, name in MenuItemTerm.objects
+                .filter(menu_item__in=list(items.values_list('pk', flat=True)))
+                .values_list('menu_item__restaurant_id', 'kind', 'name')
+                if kind == MenuItemTerm.ALLERGEN
+            )
+            allergen_counts = [(restaurant_id, name, count) for (restaurant_id, name), count in counts.items()]
+
+        restaurant_rows = list(restaurants.values_list(
+            'id', 'cuisine_type', 'price_range', 'rating', 'is_active',
+        ))
+        item_stats = {
+            row[0]: row[1:]
+            for row in items.values('restaurant_id').annotate(
+                total=Count('pk'),
+                **{flag: Count('pk', filter=Q(**{flag: True})) for flag in DIETARY_FLAGS.values()},
+            ).values_list('restaurant_id', 'total', *DIETARY_FLAGS.values())
+        }
+        return restaurant_rows, item_stats, allergen_counts
+
+    def _advance(self, updated_at):
+        if updated_at is not None and (self.watermark is None or updated_at > self.watermark):
+            self.watermark = updated_at
+
+    def _fill(self, restaurant_rows, item_stats, allergen_counts):
+        """Recompute the matrix rows of loaded restaurants, which must already have one"""
+        matrix = self.matrix
+        for restaurant_id, cuisine, price_range, rating, _ in restaurant_rows:
+            row = self.positions[restaurant_id]
+            matrix[row] = 0
+            matrix[row, self.cuisine_columns[normalize_cuisine(cuisine)]] = 1
+            if price_range in self.price_columns:
+                matrix[row, self.price_columns[price_range]] = 1
+            matrix[row, self.rating_column] = float(rating or 0) / 5
+            total, *dietary = item_stats.get(restaurant_id, (0,) * (len(DIETARY_FLAGS) + 1))
+            if total:
+                for column, count in zip(self.dietary_columns.values(), dietary):
+                    matrix[row, column] = count / total
+        for restaurant_id, name, count in allergen_counts:
+            row = self.positions[restaurant_id]
+            matrix[row, self.allergen_columns[name]] = count / item_stats[restaurant_id][0]
+
+    def build(self):
+        with self._lock:
+            self.clear()
+            # Taken first: rows written while loading are pulled again by the next sync
+            for model in (Restaurant, MenuItem):
+                self._advance(model.objects.aggregate(latest=Max('updated_at'))['latest'])
+            restaurant_rows, item_stats, allergen_counts = self._load()
+            cuisines = sorted({normalize_cuisine(row[1]) for row in restaurant_rows})
+            allergens = sorted({name for _, name, _ in allergen_counts})
+
+            columns = itertools.count()
+            self.cuisine_columns = {name: next(columns) for name in cuisines}
+            self.allergen_columns = {name: next(columns) for name in allergens}
+            self.dietary_columns = {name: next(columns) for name in DIETARY_FLAGS}
+            self.price_columns = {name: next(columns) for name in PRICE_RANGES}
+            self.rating_column = next(columns)
+
+            self.ids = np.array([row[0] for row in restaurant_rows], dtype=np.int64)
+            self.active = np.ones(len(self.ids), dtype=bool)
+            self.positions = {restaurant_id: row for row, restaurant_id in enumerate(self.ids.tolist())}
+            self.matrix = np.zeros((len(self.ids), self.rating_column + 1), dtype=np.float32)
+            self._fill(restaurant_rows, item_stats, allergen_counts)
+            self.built = True
+            self.built_at = self.synced_at = time.monotonic()
+
+    def refresh(self, restaurant_ids):
+        """Recompute the rows of ``restaurant_ids``; False if a full rebuild is needed instead"""
+        with self._lock:
+            restaurant_rows, item_stats, allergen_counts = self._load(restaurant_ids)
+            found = {row[0] for row in restaurant_rows}
+            for restaurant_id in set(restaurant_ids) - found:
+                if restaurant_id in self.positions:
+                    self.active[self.positions[restaurant_id]] = False
+
+            active_rows = [row for row in restaurant_rows if row[4]]
+            for row in restaurant_rows:
+                if not row[4] and row[0] in self.positions:
+                    self.active[self.positions[row[0]]] = False
+            if (any(normalize_cuisine(row[1]) not in self.cuisine_columns for row in active_rows)
+                    or any(name not in self.allergen_columns for _, name, _ in allergen_counts)):
+                return False
+
+            added = [row[0] for row in active_rows if row[0] not in self.positions]
+            if added:
+                start = len(self.ids)
+                self.ids = np.concatenate([self.ids, np.array(added, dtype=np.int64)])
+                self.active = np.concatenate([self.active, np.zeros(len(added), dtype=bool)])
+                self.matrix = np.vstack([self.matrix, np.zeros((len(added), self.matrix.shape[1]), dtype=np.float32)])
+                self.positions.update((restaurant_id, start + i) for i, restaurant_id in enumerate(added))
+            active_ids = {row[0] for row in active_rows}
+            self._fill(active_rows, item_stats, [row for row in allergen_counts if row[0] in active_ids])
+            self.active[[self.positions[restaurant_id] for restaurant_id in active_ids]] = True
+            return True
+
+    def sync(self):
+        """Mark restaurants changed since the watermark (by any process) dirty"""
+        with self._lock:
+            since = self.watermark
+            restaurants = Restaurant.objects.values_list('id', 'updated_at')
+            items = MenuItem.objects.values_list('restaurant_id', 'updated_at')
+            if since is not None:
+                restaurants = restaurants.filter(updated_at__gte=since)
+                items = items.filter(updated_at__gte=since)
+            for rows in (restaurants, items):
+                for restaurant_id, updated_at in rows:
+                    self.dirty.add(restaurant_id)
+                    self._advance(updated_at)
+            self.synced_at = time.monotonic()
+
+    def ensure_fresh(self):
+        with self._lock:
+            now = time.monotonic()
+            if not self.built or now - self.built_at > REBUILD_INTERVAL:
+                self.build()
+                return
+            if now - self.synced_at > SYNC_INTERVAL:
+                self.sync()
+            if self.dirty:
+                dirty, self.dirty = self.dirty, set()
+                for chunk in _chunks(dirty):
+                    if not self.refresh(chunk):
+                        self.build()
+                        return
+
+    def mark_dirty(self, restaurant_ids):
+        if self.built:
+            with self._lock:
+                self.dirty.update(restaurant_ids)
+
+    # -- ranking --------------------------------------------------------
+
+    def weights(self, preferences):
+        """The weight vector of ``preferences`` (see ``user_preferences``) over the matrix columns"""
+        weights = np.zeros(self.matrix.shape[1], dtype=np.float32)
+        for cuisine, weight in preferences.get('cuisines', {}).items():
+            if cuisine in self.cuisine_columns:
+                weights[self.cuisine_columns[cuisine]] += weight
+        for name in preferences.get('dietary', ()):
+            if name in self.dietary_columns:
+                weights[self.dietary_columns[name]] += WEIGHTS['dietary']
+        for name in preferences.get('allergens', ()):
+            if name in self.allergen_columns:
+                weights[self.allergen_columns[name]] -= WEIGHTS['allergen']
+        for price_range, share in preferences.get('prices', {}).items():
+            if price_range in self.price_columns:
+                weights[self.price_columns[price_range]] += WEIGHTS['price'] * share
+        weights[self.rating_column] = WEIGHTS['rating']
+        return weights
+
+    def rank(self, preferences, limit=DEFAULT_LIMIT):
+        """``[(restaurant id, score)]`` of the ``limit`` best active restaurants, best first"""
+        self.ensure_fresh()
+        with self._lock:
+            scores = self.matrix @ self.weights(preferences)
+            ordered = [
+                (self.positions[restaurant_id], count)
+                for restaurant_id, count in preferences.get('restaurants', {}).items()
+                if restaurant_id in self.positions
+            ]
+            if ordered:
+                rows, counts = np.array(ordered, dtype=np.int64).T
+                scores[rows] += WEIGHTS['reorder'] * np.log1p(counts).astype(np.float32)
+            scores[~self.active] = -np.inf
+
+            limit = min(limit, int(self.active.sum()))
+            if limit <= 0:
+                return []
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            top = top[np.lexsort((self.ids[top], -scores[top]))]
+            return list(zip(self.ids[top].tolist(), scores[top].tolist()))
+
+
+restaurant_vectors = RestaurantVectors()
+
+
+def user_cache_key(user_id):
+    return f'personalize:user:{user_id}'
+
+
+def user_preferences(user):
+    """
+    What ranks restaurants for ``user``: ``{'cuisines': {cuisine: weight},
+    'dietary': [...], 'allergens': [...], 'prices': {price range: share},
+    'restaurants': {restaurant id: orders}}``, cached per user
+    """
+    if not user.is_authenticated:
+        return {}
+    key = user_cache_key(user.pk)
+    try:
+        preferences = cache.get(key)
+    except Exception:
+        logger.exception("Ranking preferences cache unavailable")
+        preferences = None
+    if preferences is not None:
+        return preferences
+
+    profile = UserProfile.objects.filter(user=user).values('favorite_cuisines', 'allergens').first() or {}
+    recent = Order.objects.filter(user=user).exclude(status='cancelled').order_by('-created_at', '-id')
+    history = list(
+        Order.objects.filter(pk__in=recent.values('pk')[:HISTORY_ORDERS])
+        .values('restaurant_id', 'restaurant__cuisine_type', 'restaurant__price_range')
+        .annotate(count=Count('pk')).order_by()
+        .values_list('restaurant_id', 'restaurant__cuisine_type', 'restaurant__price_range', 'count')
+    )
+    orders = sum(count for *_, count in history)
+
+    cuisines = dict.fromkeys(
+        filter(None, map(normalize_cuisine, profile.get('favorite_cuisines') or ())),
+        WEIGHTS['favorite_cuisine'],
+    )
+    prices = {}
+    restaurants = {}
+    for restaurant_id, cuisine, price_range, count in history:
+        cuisine = normalize_cuisine(cuisine)
+        cuisines[cuisine] = cuisines.get(cuisine, 0) + WEIGHTS['ordered_cuisine'] * count / orders
+        prices[price_range] = prices.get(price_range, 0) + count / orders
+        restaurants[restaurant_id] = restaurants.get(restaurant_id, 0) + count
+
+    preferences = {
+        'cuisines': cuisines,
+        'dietary': sorted(normalize_terms(
+            value.replace('-', ' ') if isinstance(value, str) else value for value in user.dietary_preferences or ()
+        )),
+        'allergens': sorted(normalize_terms(profile.get('allergens'))),
+        'prices': prices,
+        'restaurants': restaurants,
+    }
+    try:
+        cache.set(key, preferences, USER_CACHE_TIMEOUT)
+    except Exception:
+        logger.exception("Could not store ranking preferences")
+    return preferences
+
+
+def recommend(user, limit=DEFAULT_LIMIT):
+    """``[(restaurant id, score)]`` for ``user``; anonymous users get restaurants by rating"""
+    return restaurant_vectors.rank(user_preferences(user), limit)
+
+
+# Signal receivers in restaurants.signals call these, after the write commits.
+
+def on_restaurants_changed(restaurant_ids):
+    restaurant_ids = list(restaurant_ids)
+    transaction.on_commit(lambda: restaurant_vectors.mark_dirty(restaurant_ids))
+
+
+def _forget_user(user_id):
+    try:
+        cache.delete(user_cache_key(user_id))
+    except Exception:
+        logger.exception("Could not drop cached ranking preferences")
+
+
+def forget_user(user_id):
+    transaction.on_commit(lambda: _forget_user(user_id))
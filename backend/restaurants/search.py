@@ -0,0 +1,191 @@
+"""
+Ranked full-text search over restaurants.
+
+Two storage engines are supported, chosen from the database vendor:
+
+- PostgreSQL (``POSTGRES_READY``): a weighted ``tsvector`` column,
+  ``search_document``, on the restaurant table with a GIN index.
+- SQLite (the default ``db.sqlite3``): an FTS5 virtual table keyed by
+  restaurant id and ranked with ``bm25``.
+
+Both are created by migration 0010 and kept in sync one row at a time from
+the Restaurant ``post_save``/``post_delete`` signals. Any other database, or
+an SQLite build without FTS5, falls back to the old ``icontains`` scan.
+
+Field weights, highest first: name, cuisine_type, description, address.
+
+Menu items are searched by ``search_menu_items``: every query word must
+appear in the item's name or description, or start a word of one of its
+ingredients on the MenuItemTerm index (rather than anywhere in the
+ingredients JSON, units and notes included). Matches are ranked by where
+the words were found, per ``MENU_ITEM_WEIGHTS``.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from rest_framework import filters
+
+from .models import MenuItemTerm
+
+SEARCH_FIELDS = ('name', 'cuisine_type', 'description', 'address')
+
+RESTAURANT_TABLE = 'restaurants_restaurant'
+FTS_TABLE = 'restaurants_restaurant_fts'
+
+# bm25 column weights for the FTS5 table, in SEARCH_FIELDS order
+FTS_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+
+# setweight() labels for the tsvector document, in SEARCH_FIELDS order
+PG_DOCUMENT_SQL = " || ".join(
+    f"setweight(to_tsvector('english', coalesce({field}, '')), '{weight}')"
+    for field, weight in zip(SEARCH_FIELDS, 'ABCD')
+)
+
+# Rank contributed by each query word, by where it was found
+MENU_ITEM_WEIGHTS = {'name': 4, 'ingredient': 2, 'description': 1}
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+_engine_cache = {}
+
+
+def search_engine():
+    """Return 'postgres', 'fts5' or None for the default connection"""
+    key = (connection.alias, str(connection.settings_dict.get('NAME')))
+    if key not in _engine_cache:
+        engine = None
+        if connection.vendor == 'postgresql':
+            engine = 'postgres'
+        elif connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                if FTS_TABLE in connection.introspection.table_names(cursor):
+                    engine = 'fts5'
+        _engine_cache[key] = engine
+    return _engine_cache[key]
+
+
+def search_terms(query):
+    """Split user input into plain word tokens safe to embed in a match expression"""
+    return _TERM_RE.findall((query or '').lower())
+
+
+def index_restaurant(restaurant):
+    """Write one restaurant's search document"""
+    engine = search_engine()
+    if engine == 'postgres':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {RESTAURANT_TABLE} SET search_document = {PG_DOCUMENT_SQL} WHERE id = %s",
+                [restaurant.pk],
+            )
+    elif engine == 'fts5':
+        columns = ', '.join(SEARCH_FIELDS)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [restaurant.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, {columns}) VALUES (%s, %s, %s, %s, %s)",
+                [restaurant.pk] + [getattr(restaurant, field) or '' for field in SEARCH_FIELDS],
+            )
+
+
+def unindex_restaurant(restaurant_id):
+    """Drop a deleted restaurant from the index (the tsvector column goes with its row)"""
+    if search_engine() == 'fts5':
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [restaurant_id])
+
+
+def search_restaurants(queryset, query):
+    """
+    Restrict ``queryset`` to restaurants matching every term of ``query``.
+
+    On indexed engines the rows are annotated with ``search_rank`` (higher
+    is more relevant) and the last term is matched as a prefix so partially
+    typed words still hit. The caller decides whether to order by rank.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+
+    engine = search_engine()
+    if engine == 'postgres':
+        tsquery = ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+        document = f'{RESTAURANT_TABLE}.search_document'
+        return queryset.extra(
+            select={'search_rank': f"ts_rank_cd({document}, to_tsquery('english', %s))"},
+            select_params=[tsquery],
+            where=[f"{document} @@ to_tsquery('english', %s)"],
+            params=[tsquery],
+        )
+    if engine == 'fts5':
+        match = ' '.join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        return queryset.extra(
+            select={'search_rank': f"-bm25({FTS_TABLE}, {weights})"},
+            tables=[FTS_TABLE],
+            where=[f"{FTS_TABLE}.rowid = {RESTAURANT_TABLE}.id", f"{FTS_TABLE} MATCH %s"],
+            params=[match],
+        )
+
+    condition = Q()
+    for field in ('name', 'description', 'cuisine_type'):
+        condition |= Q(**{f'{field}__icontains': query})
+    return queryset.filter(condition)
+
+
+class RankedSearchFilter(filters.SearchFilter):
+    """
+    ``?search=`` backed by the restaurant search index.
+
+    Results are ordered by relevance unless the client asked for an explicit
+    ``?ordering=``; the view's default ordering then only breaks ties. Place
+    it after OrderingFilter in ``filter_backends``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not search_terms(query) or search_engine() is None:
+            return super().filter_queryset(request, queryset, view)
+
+        queryset = search_restaurants(queryset, query)
+        if not request.query_params.get(filters.OrderingFilter.ordering_param):
+            queryset = queryset.order_by('-search_rank', *queryset.query.order_by)
+        return queryset
+
+
+def search_menu_items(queryset, query):
+    """
+    Restrict ``queryset`` to menu items matching every word of ``query``,
+    annotated with ``search_rank`` (higher is more relevant).
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+    ranks = {}
+    for number, term in enumerate(terms):
+        ingredient = Q(pk__in=MenuItemTerm.ingredients_mentioning(term).values('menu_item'))
+        ranks[f'_term_{number}_rank'] = sum(
+            Case(When(condition, then=Value(MENU_ITEM_WEIGHTS[place])), default=Value(0), output_field=IntegerField())
+            for place, condition in (
+                ('name', Q(name__icontains=term)),
+                ('ingredient', ingredient),
+                ('description', Q(description__icontains=term)),
+            )
+        )
+    queryset = queryset.alias(**ranks).filter(**{f'{alias}__gt': 0 for alias in ranks})
+    return queryset.annotate(search_rank=sum(F(alias) for alias in ranks))
+
+
+class MenuItemSearchFilter(filters.SearchFilter):
+    """
+    ``?search=`` over menu item names, descriptions and indexed ingredients,
+    best matches first; the view's ordering only breaks ties.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not search_terms(query):
+            return queryset
+        queryset = search_menu_items(queryset, query)
+        return queryset.order_by('-search_rank', *queryset.query.order_by)
@@ -1,5 +1,9 @@
+import json
 
 from rest_framework import serializers
+from therestaurant.fastpath import FastField
+from therestaurant.fieldsets import SparseFieldsetMixin
+from therestaurant.images import srcset
 from .models import Restaurant, MenuCategory, MenuItem, RestaurantReview
 from django.contrib.auth import get_user_model
 
@@ -8,6 +12,7 @@ class RestaurantCreateSerializer(serializers.ModelSerializer):
         model = Restaurant
         fields = [
             'id', 'slug', 'name', 'description', 'cuisine_type', 'address',
+            'latitude', 'longitude',
             'phone_number', 'email', 'website', 'image', 'price_range',
             'opening_hours', 'features', 'is_active',
             'delivery_fee', 'delivery_time', 'min_order', 'rating',
@@ -31,44 +36,102 @@ class RestaurantCreateSerializer(serializers.ModelSerializer):
 
 User = get_user_model()
 
-class MenuItemSerializer(serializers.ModelSerializer):
+def menu_item_image(request, image, name):
+    """Uploaded menu item image URL, or a food-type specific placeholder"""
+    # First check if there's an uploaded image
+    if image and hasattr(image, 'url'):
+        try:
+            return request.build_absolute_uri(image.url)
+        except:
+            pass  # If there's an error building the URL, fall back to placeholder
+    
+    # Food-type specific placeholder images based on item name/ingredients
+    item_name = name.lower()
+    
+    if 'pasta' in item_name or 'spaghetti' in item_name or 'penne' in item_name:
+        return 'https://images.unsplash.com/photo-1563379091339-03246963d96c?w=300&h=200&fit=crop'
+    elif 'sushi' in item_name or 'roll' in item_name:
+        return 'https://images.unsplash.com/photo-1579584425555-c3ce17fd4351?w=300&h=200&fit=crop'
+    elif 'bowl' in item_name or 'buddha' in item_name:
+        return 'https://images.unsplash.com/photo-1546069901-ba9599a7e63c?w=300&h=200&fit=crop'
+    elif 'smoothie' in item_name or 'juice' in item_name or 'machine' in item_name or 'blast' in item_name:
+        return 'https://images.unsplash.com/photo-1553530666-ba11a7da3888?w=300&h=200&fit=crop'
+    elif 'bruschetta' in item_name or 'calamari' in item_name:
+        return 'https://images.unsplash.com/photo-1565299624946-b28f40a0ca4b?w=300&h=200&fit=crop'
+    else:
+        return 'https://images.unsplash.com/photo-1565299507177-b0ac66763828?w=300&h=200&fit=crop'
+
+def restaurant_image(request, image, cuisine_type):
+    """Uploaded restaurant image URL, or a cuisine-specific placeholder"""
+    # First check if there's an uploaded image
+    if image and hasattr(image, 'url'):
+        try:
+            return request.build_absolute_uri(image.url)
+        except:
+            pass  # If there's an error building the URL, fall back to placeholder
+    
+    # Cuisine-specific placeholder images as fallback
+    cuisine_images = {
+        'Italian': 'https://images.unsplash.com/photo-1565299624946-b28f40a0ca4b?w=400&h=250&fit=crop&crop=center',
+        'Japanese': 'https://images.unsplash.com/photo-1579584425555-c3ce17fd4351?w=400&h=250&fit=crop&crop=center',
+        'Chinese': 'https://images.unsplash.com/photo-1526318896980-cf78c088247c?w=400&h=250&fit=crop&crop=center',
+        'Mexican': 'https://images.unsplash.com/photo-1565299585323-38174c2f9a4e?w=400&h=250&fit=crop&crop=center',
+        'Indian': 'https://images.unsplash.com/photo-1565557623262-b51c2513a641?w=400&h=250&fit=crop&crop=center',
+        'American': 'https://images.unsplash.com/photo-1568901346375-23c9450c58cd?w=400&h=250&fit=crop&crop=center',
+        'Vegetarian': 'https://images.unsplash.com/photo-1540420773420-3366772f4999?w=400&h=250&fit=crop&crop=center',
+        'Thai': 'https://images.unsplash.com/photo-1559847844-5315695dadae?w=400&h=250&fit=crop&crop=center',
+        'French': 'https://images.unsplash.com/photo-1428515613728-6b4607e44363?w=400&h=250&fit=crop&crop=center',
+        'Korean': 'https://images.unsplash.com/photo-1498654896293-37aacf113fd9?w=400&h=250&fit=crop&crop=center'
+    }
+    
+    return cuisine_images.get(
+        cuisine_type, 
+        'https://images.unsplash.com/photo-1517248135467-4c7edcad34c4?w=400&h=250&fit=crop&crop=center'
+    )
+
+def is_owner(request, owner_id):
+    if request and request.user.is_authenticated:
+        return owner_id == request.user.pk or request.user.user_type == 'platform_admin'
+    return False
+
+class MenuItemSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     restaurant_name = serializers.SerializerMethodField()
 
     class Meta:
         model = MenuItem
         fields = [
-            'id', 'slug', 'restaurant', 'name', 'description', 'price', 'image', 'ingredients',
+            'id', 'slug', 'restaurant', 'name', 'description', 'price', 'image', 'image_srcset', 'ingredients',
             'allergens', 'nutritional_info', 'is_available', 'is_vegetarian',
             'is_vegan', 'is_gluten_free', 'spice_level', 'prep_time',
             'restaurant_name', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        field_dependencies = {
+            'image': ['image', 'name'], 'image_srcset': ['image', 'image_variants'],
+            'restaurant_name': ['restaurant__name'],
+        }
+        fast_fields = {
+            'image': FastField('image', 'name', render=lambda context, image, name: menu_item_image(
+                context.get('request'), image, name
+            )),
+            'image_srcset': FastField('image', 'image_variants', render=lambda context, image, variants: srcset(
+                context.get('request'), image, variants
+            )),
+            'restaurant_name': FastField('restaurant__name'),
+        }
+        expandable_fields = {
+            'restaurant': ('restaurants.serializers.RestaurantListSerializer', {'read_only': True}),
+        }
 
     def get_image(self, obj):
         """Return uploaded image if available, otherwise food-type specific placeholder"""
-        # First check if there's an uploaded image
-        if obj.image and hasattr(obj.image, 'url'):
-            try:
-                return self.context['request'].build_absolute_uri(obj.image.url)
-            except:
-                pass  # If there's an error building the URL, fall back to placeholder
-        
-        # Food-type specific placeholder images based on item name/ingredients
-        item_name = obj.name.lower()
-        
-        if 'pasta' in item_name or 'spaghetti' in item_name or 'penne' in item_name:
-            return 'https://images.unsplash.com/photo-1563379091339-03246963d96c?w=300&h=200&fit=crop'
-        elif 'sushi' in item_name or 'roll' in item_name:
-            return 'https://images.unsplash.com/photo-1579584425555-c3ce17fd4351?w=300&h=200&fit=crop'
-        elif 'bowl' in item_name or 'buddha' in item_name:
-            return 'https://images.unsplash.com/photo-1546069901-ba9599a7e63c?w=300&h=200&fit=crop'
-        elif 'smoothie' in item_name or 'juice' in item_name or 'machine' in item_name or 'blast' in item_name:
-            return 'https://images.unsplash.com/photo-1553530666-ba11a7da3888?w=300&h=200&fit=crop'
-        elif 'bruschetta' in item_name or 'calamari' in item_name:
-            return 'https://images.unsplash.com/photo-1565299624946-b28f40a0ca4b?w=300&h=200&fit=crop'
-        else:
-            return 'https://images.unsplash.com/photo-1565299507177-b0ac66763828?w=300&h=200&fit=crop'
+        return menu_item_image(self.context.get('request'), obj.image, obj.name)
+
+    def get_image_srcset(self, obj):
+        """WebP and JPEG srcsets of the uploaded image's resized copies, once they are built"""
+        return srcset(self.context.get('request'), obj.image, obj.image_variants)
 
     def get_restaurant_name(self, obj):
         """Return the restaurant name this menu item belongs to"""
@@ -78,10 +141,14 @@ class MenuCategorySerializer(serializers.ModelSerializer):
     items = MenuItemSerializer(many=True, read_only=True)
     items_count = serializers.SerializerMethodField()
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = MenuCategory
-        fields = ['id', 'name', 'description', 'meal_period', 'display_order', 'items', 'items_count', 'image']
+        fields = [
+            'id', 'name', 'description', 'meal_period', 'display_order', 'items', 'items_count', 'image',
+            'image_srcset',
+        ]
         read_only_fields = ['id']
 
     def get_items_count(self, obj):
@@ -97,12 +164,13 @@ class MenuCategorySerializer(serializers.ModelSerializer):
         # Fallback placeholder image for category
         return 'https://images.unsplash.com/photo-1504674900247-0877df9cc836?w=300&h=200&fit=crop'
 
-class RestaurantListSerializer(serializers.ModelSerializer):
+    def get_image_srcset(self, obj):
+        return srcset(self.context.get('request'), obj.image, obj.image_variants)
+
+class RestaurantListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Simplified serializer for restaurant listings"""
-    categories_count = serializers.SerializerMethodField()
-    menu_items_count = serializers.SerializerMethodField()
-    reviews_count = serializers.SerializerMethodField()
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     owner_name = serializers.SerializerMethodField()
     is_owner = serializers.SerializerMethodField()
 
@@ -110,117 +178,96 @@ class RestaurantListSerializer(serializers.ModelSerializer):
         model = Restaurant
         fields = [
             'id', 'slug', 'name', 'description', 'cuisine_type', 'address',
-            'phone_number', 'email', 'website', 'image', 'rating', 'price_range',
+            'latitude', 'longitude',
+            'phone_number', 'email', 'website', 'image', 'image_srcset', 'rating', 'price_range',
             'delivery_fee', 'delivery_time', 'min_order',
             'categories_count', 'menu_items_count', 'reviews_count',
             'is_active', 'features', 'opening_hours', 'owner', 'owner_name', 'is_owner'
         ]
+        field_dependencies = {
+            'image': ['image', 'cuisine_type'], 'image_srcset': ['image', 'image_variants'],
+            'owner_name': ['owner__username'], 'is_owner': ['owner'],
+        }
+        fast_fields = {
+            'image': FastField('image', 'cuisine_type', render=lambda context, image, cuisine_type: restaurant_image(
+                context.get('request'), image, cuisine_type
+            )),
+            'image_srcset': FastField('image', 'image_variants', render=lambda context, image, variants: srcset(
+                context.get('request'), image, variants
+            )),
+            'owner_name': FastField('owner__username'),
+            'is_owner': FastField('owner', render=lambda context, owner_id: is_owner(context.get('request'), owner_id)),
+        }
+        expandable_fields = {
+            'owner': ('accounts.serializers.UserSummarySerializer', {'read_only': True}),
+        }
     
     def get_owner_name(self, obj):
-        return obj.owner.username if obj.owner else None
+        return obj.owner.username if obj.owner_id else None
     
     def get_is_owner(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return obj.owner == request.user or request.user.user_type == 'platform_admin'
-        return False
+        return is_owner(self.context.get('request'), obj.owner_id)
 
     def get_image(self, obj):
         """Return uploaded image if available, otherwise cuisine-specific placeholder"""
-        # First check if there's an uploaded image
-        if obj.image and hasattr(obj.image, 'url'):
-            try:
-                return self.context['request'].build_absolute_uri(obj.image.url)
-            except:
-                pass  # If there's an error building the URL, fall back to placeholder
-        
-        # Cuisine-specific placeholder images as fallback
-        cuisine_images = {
-            'Italian': 'https://images.unsplash.com/photo-1565299624946-b28f40a0ca4b?w=400&h=250&fit=crop&crop=center',
-            'Japanese': 'https://images.unsplash.com/photo-1579584425555-c3ce17fd4351?w=400&h=250&fit=crop&crop=center',
-            'Chinese': 'https://images.unsplash.com/photo-1526318896980-cf78c088247c?w=400&h=250&fit=crop&crop=center',
-            'Mexican': 'https://images.unsplash.com/photo-1565299585323-38174c2f9a4e?w=400&h=250&fit=crop&crop=center',
-            'Indian': 'https://images.unsplash.com/photo-1565557623262-b51c2513a641?w=400&h=250&fit=crop&crop=center',
-            'American': 'https://images.unsplash.com/photo-1568901346375-23c9450c58cd?w=400&h=250&fit=crop&crop=center',
-            'Vegetarian': 'https://images.unsplash.com/photo-1540420773420-3366772f4999?w=400&h=250&fit=crop&crop=center',
-            'Thai': 'https://images.unsplash.com/photo-1559847844-5315695dadae?w=400&h=250&fit=crop&crop=center',
-            'French': 'https://images.unsplash.com/photo-1428515613728-6b4607e44363?w=400&h=250&fit=crop&crop=center',
-            'Korean': 'https://images.unsplash.com/photo-1498654896293-37aacf113fd9?w=400&h=250&fit=crop&crop=center'
-        }
-        
-        return cuisine_images.get(
-            obj.cuisine_type, 
-            'https://images.unsplash.com/photo-1517248135467-4c7edcad34c4?w=400&h=250&fit=crop&crop=center'
-        )
+        return restaurant_image(self.context.get('request'), obj.image, obj.cuisine_type)
 
-    def get_categories_count(self, obj):
-        return obj.categories.count()
+    def get_image_srcset(self, obj):
+        return srcset(self.context.get('request'), obj.image, obj.image_variants)
 
-    def get_menu_items_count(self, obj):
-        return obj.menu_items.filter(is_available=True).count()
-
-    def get_reviews_count(self, obj):
-        return obj.reviews.count()
-
-class RestaurantDetailSerializer(serializers.ModelSerializer):
-    categories = MenuCategorySerializer(many=True, read_only=True)
+class RestaurantDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    categories = serializers.SerializerMethodField()
     recent_reviews = serializers.SerializerMethodField()
     average_rating = serializers.SerializerMethodField()
     total_reviews = serializers.SerializerMethodField()
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Restaurant
         fields = [
             'id', 'slug', 'name', 'description', 'cuisine_type', 'address',
-            'phone_number', 'email', 'website', 'image', 'rating',
+            'latitude', 'longitude',
+            'phone_number', 'email', 'website', 'image', 'image_srcset', 'rating',
             'price_range', 'opening_hours', 'features', 'is_active',
             'delivery_fee', 'delivery_time', 'min_order',
             'categories', 'recent_reviews', 'average_rating', 'total_reviews',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'rating', 'created_at', 'updated_at']
+        field_dependencies = {
+            'image': ['image', 'cuisine_type'], 'image_srcset': ['image', 'image_variants'],
+            'categories': [], 'recent_reviews': [],
+            'average_rating': ['rating_sum', 'reviews_count'], 'total_reviews': ['reviews_count'],
+        }
 
     def get_image(self, obj):
         """Return uploaded image if available, otherwise cuisine-specific placeholder"""
-        # First check if there's an uploaded image
-        if obj.image and hasattr(obj.image, 'url'):
-            try:
-                return self.context['request'].build_absolute_uri(obj.image.url)
-            except:
-                pass  # If there's an error building the URL, fall back to placeholder
-        
-        # Cuisine-specific placeholder images as fallback
-        cuisine_images = {
-            'Italian': 'https://images.unsplash.com/photo-1565299624946-b28f40a0ca4b?w=400&h=250&fit=crop&crop=center',
-            'Japanese': 'https://images.unsplash.com/photo-1579584425555-c3ce17fd4351?w=400&h=250&fit=crop&crop=center',
-            'Chinese': 'https://images.unsplash.com/photo-1526318896980-cf78c088247c?w=400&h=250&fit=crop&crop=center',
-            'Mexican': 'https://images.unsplash.com/photo-1565299585323-38174c2f9a4e?w=400&h=250&fit=crop&crop=center',
-            'Indian': 'https://images.unsplash.com/photo-1565557623262-b51c2513a641?w=400&h=250&fit=crop&crop=center',
-            'American': 'https://images.unsplash.com/photo-1568901346375-23c9450c58cd?w=400&h=250&fit=crop&crop=center',
-            'Vegetarian': 'https://images.unsplash.com/photo-1540420773420-3366772f4999?w=400&h=250&fit=crop&crop=center',
-            'Thai': 'https://images.unsplash.com/photo-1559847844-5315695dadae?w=400&h=250&fit=crop&crop=center',
-            'French': 'https://images.unsplash.com/photo-1428515613728-6b4607e44363?w=400&h=250&fit=crop&crop=center',
-            'Korean': 'https://images.unsplash.com/photo-1498654896293-37aacf113fd9?w=400&h=250&fit=crop&crop=center'
-        }
-        
-        return cuisine_images.get(
-            obj.cuisine_type, 
-            'https://images.unsplash.com/photo-1517248135467-4c7edcad34c4?w=400&h=250&fit=crop&crop=center'
-        )
+        return restaurant_image(self.context.get('request'), obj.image, obj.cuisine_type)
+
+    def get_image_srcset(self, obj):
+        return srcset(self.context.get('request'), obj.image, obj.image_variants)
+
+    def get_categories(self, obj):
+        """The menu, parsed from the restaurant's menu snapshot"""
+        request = self.context.get('request')
+        if request is None:
+            return MenuCategorySerializer(obj.categories.prefetch_related('items'), many=True).data
+        from .snapshots import menu_content
+        content, _ = menu_content(obj, request)
+        return json.loads(content)
 
     def get_recent_reviews(self, obj):
         recent_reviews = obj.reviews.select_related('user')[:5]
         return RestaurantReviewSerializer(recent_reviews, many=True).data
 
     def get_average_rating(self, obj):
-        reviews = obj.reviews.all()
-        if reviews:
-            return sum(review.rating for review in reviews) / len(reviews)
+        if obj.reviews_count:
+            return obj.rating_sum / obj.reviews_count
         return 0.0
 
     def get_total_reviews(self, obj):
-        return obj.reviews.count()
+        return obj.reviews_count
 
 class RestaurantReviewSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
@@ -252,7 +299,45 @@ class RestaurantSearchSerializer(serializers.Serializer):
         required=False,
         allow_empty=True
     )
+    open_now = serializers.BooleanField(required=False, allow_null=True, default=None)
+    open_at = serializers.DateTimeField(required=False)
     ordering = serializers.ChoiceField(
         choices=['rating', '-rating', 'name', '-name', 'price_range', '-price_range'],
         required=False
-    )
\ No newline at end of file
+    )
+
+class RestaurantNearbySerializer(serializers.Serializer):
+    """Query parameters for the nearby restaurant search"""
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+    radius = serializers.FloatField(required=False, default=5, min_value=0.01, max_value=50, help_text='Kilometres')
+
+class MenuImportRowSerializer(serializers.Serializer):
+    """One menu item of a bulk menu import, with the category it belongs to"""
+    category = serializers.CharField(max_length=100)
+    meal_period = serializers.ChoiceField(choices=MenuCategory.MEAL_PERIOD_CHOICES, required=False)
+    category_description = serializers.CharField(required=False, allow_blank=True)
+    name = serializers.CharField(max_length=200)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    price = serializers.DecimalField(max_digits=8, decimal_places=2, min_value=0)
+    ingredients = serializers.ListField(required=False, default=list)
+    allergens = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+    nutritional_info = serializers.DictField(required=False, default=dict)
+    is_available = serializers.BooleanField(required=False, default=True)
+    is_vegetarian = serializers.BooleanField(required=False, default=False)
+    is_vegan = serializers.BooleanField(required=False, default=False)
+    is_gluten_free = serializers.BooleanField(required=False, default=False)
+    spice_level = serializers.IntegerField(required=False, default=0, min_value=0, max_value=5)
+    prep_time = serializers.IntegerField(required=False, default=0, min_value=0, allow_null=True)
+
+class MenuItemBulkUpdateSerializer(serializers.Serializer):
+    """One entry of a bulk menu item update"""
+    id = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=8, decimal_places=2, min_value=0, required=False)
+    is_available = serializers.BooleanField(required=False)
+    category = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if len(attrs) == 1:
+            raise serializers.ValidationError('Give at least one of price, is_available or category')
+        return attrs
@@ -0,0 +1,395 @@
+import copy
+
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from therestaurant import images
+from .hours import compile_opening_hours
+from .models import (
+    Restaurant, RestaurantFeature, CuisineRollup, RestaurantOpeningInterval, MenuCategory, MenuItem, MenuItemTerm,
+    RestaurantReview, normalize_features,
+)
+from .search import SEARCH_FIELDS, index_restaurant, unindex_restaurant
+from . import personalize, suggest
+from .cache import bump_versions_on_commit, forget_slug
+from .snapshots import menu_changed
+
+
+def adjust_restaurant_stats(restaurant_id, **deltas):
+    """Apply counter deltas to a restaurant with a single F() UPDATE.
+
+    The review average in ``rating`` is recomputed from the counters in the
+    same transaction whenever they move, so it drops back to 0 once the last
+    review is deleted.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if restaurant_id is None or not deltas:
+        return
+    restaurants = Restaurant.objects.filter(pk=restaurant_id)
+    restaurants.update(**{field: F(field) + delta for field, delta in deltas.items()})
+
+    if 'reviews_count' in deltas or 'rating_sum' in deltas:
+        stats = restaurants.values('reviews_count', 'rating_sum', 'rating', 'cuisine_type', 'is_active').first()
+        if stats:
+            rating = Restaurant.average_rating(stats['rating_sum'], stats['reviews_count'])
+            if rating != stats['rating']:
+                restaurants.update(rating=rating)
+                personalize.on_restaurants_changed([restaurant_id])
+                if stats['is_active']:
+                    CuisineRollup.refresh(stats['cuisine_type'])
+
+
+def menu_rows_bulk_saved(stats, items=()):
+    """
+    What the MenuCategory and MenuItem post_save handlers would have done for
+    rows written with ``bulk_create``/``bulk_update``, which send no signals.
+
+    ``stats`` maps each affected restaurant id to its counter deltas;
+    ``items`` are the MenuItems written.
+    """
+    for restaurant_id, deltas in stats.items():
+        adjust_restaurant_stats(restaurant_id, **deltas)
+    bump_versions_on_commit(*stats)
+    menu_changed(*stats)
+    personalize.on_restaurants_changed(stats)
+    if items:
+        suggest.on_menu_items_saved(items)
+
+
+def _deleted_with_restaurant(origin):
+    """Children removed by a restaurant cascade need no counter updates"""
+    return isinstance(origin, Restaurant) or getattr(origin, 'model', None) is Restaurant
+
+
+# Response cache invalidation. Registered ahead of the counter handlers so
+# ``_stats_snapshot`` still names the previous restaurant of a moved row.
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def invalidate_restaurant_responses(sender, instance, **kwargs):
+    bump_versions_on_commit(instance.pk)
+    if kwargs.get('signal') is post_delete:
+        forget_slug(instance.slug)
+
+
+@receiver(post_save, sender=MenuCategory)
+@receiver(post_delete, sender=MenuCategory)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=RestaurantReview)
+@receiver(post_delete, sender=RestaurantReview)
+def invalidate_menu_and_review_responses(sender, instance, origin=None, **kwargs):
+    if _deleted_with_restaurant(origin):
+        return
+    previous = getattr(instance, '_stats_snapshot', None)
+    if isinstance(previous, tuple):
+        previous = previous[0]
+    bump_versions_on_commit(instance.restaurant_id, previous)
+
+    # A removed row leaves no updated_at behind, so Last-Modified (see
+    # Restaurant.content_state) is carried by the restaurant instead.
+    if kwargs.get('signal') is post_delete:
+        touched = instance.restaurant_id
+    elif previous != instance.restaurant_id:
+        touched = previous
+    else:
+        touched = None
+    if touched is not None:
+        Restaurant.objects.filter(pk=touched).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=MenuCategory)
+@receiver(post_delete, sender=MenuCategory)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def invalidate_menu_snapshot(sender, instance, origin=None, **kwargs):
+    if _deleted_with_restaurant(origin):
+        return
+    previous = instance._stats_snapshot
+    if isinstance(previous, tuple):
+        previous = previous[0]
+    menu_changed(instance.restaurant_id, previous)
+
+
+@receiver(post_init, sender=Restaurant)
+def snapshot_menu_name(sender, instance, **kwargs):
+    instance._menu_name_snapshot = instance.__dict__.get('name')
+
+
+@receiver(post_save, sender=Restaurant)
+def invalidate_renamed_menu(sender, instance, created, **kwargs):
+    # Menu items carry their restaurant's name
+    name = instance.__dict__.get('name')
+    if not created and name is not None and name != instance._menu_name_snapshot:
+        menu_changed(instance.pk)
+    instance._menu_name_snapshot = name
+
+
+@receiver(post_save, sender=Restaurant)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or not set(update_fields).isdisjoint(SEARCH_FIELDS):
+        index_restaurant(instance)
+    suggest.on_restaurant_saved(instance)
+    personalize.on_restaurants_changed([instance.pk])
+
+
+# Restaurant JSON fields mirrored into indexed tables. The snapshot is a
+# deep copy so in-place edits of the JSON still register as changes.
+INDEXED_JSON_FIELDS = ('features', 'opening_hours')
+
+
+@receiver(post_init, sender=Restaurant)
+def snapshot_indexed_json(sender, instance, **kwargs):
+    instance._json_snapshot = {
+        field: copy.deepcopy(instance.__dict__.get(field)) for field in INDEXED_JSON_FIELDS
+    }
+
+
+def sync_features(restaurant, created):
+    """Mirror the ``features`` JSON list into RestaurantFeature rows"""
+    wanted = normalize_features(restaurant.features)
+    if not created:
+        RestaurantFeature.objects.filter(restaurant=restaurant).exclude(name__in=wanted).delete()
+    RestaurantFeature.objects.bulk_create(
+        [RestaurantFeature(restaurant=restaurant, name=name) for name in sorted(wanted)],
+        ignore_conflicts=True,
+    )
+
+
+def sync_opening_intervals(restaurant, created):
+    """Recompile ``opening_hours`` into RestaurantOpeningInterval rows"""
+    if not created:
+        RestaurantOpeningInterval.objects.filter(restaurant=restaurant).delete()
+    RestaurantOpeningInterval.objects.bulk_create([
+        RestaurantOpeningInterval(restaurant=restaurant, start_minute=start, end_minute=end)
+        for start, end in compile_opening_hours(restaurant.opening_hours)
+    ])
+
+
+@receiver(post_save, sender=Restaurant)
+def sync_indexed_json(sender, instance, created, **kwargs):
+    for field, sync in (('features', sync_features), ('opening_hours', sync_opening_intervals)):
+        value = instance.__dict__.get(field)
+        if value is None or (not created and value == instance._json_snapshot[field]):
+            continue
+        sync(instance, created)
+        instance._json_snapshot[field] = copy.deepcopy(value)
+
+
+@receiver(post_init, sender=MenuItem)
+def snapshot_menu_item_terms(sender, instance, **kwargs):
+    instance._terms_snapshot = {
+        kind: copy.deepcopy(instance.__dict__.get(field)) for kind, field in MenuItemTerm.FIELDS.items()
+    }
+
+
+@receiver(post_save, sender=MenuItem)
+def sync_menu_item_terms(sender, instance, created, **kwargs):
+    """Mirror ``allergens`` and ``ingredients`` into MenuItemTerm rows"""
+    changed = []
+    for kind, field in MenuItemTerm.FIELDS.items():
+        value = instance.__dict__.get(field)
+        if value is None or (not created and value == instance._terms_snapshot[kind]):
+            continue
+        changed.append(kind)
+        instance._terms_snapshot[kind] = copy.deepcopy(value)
+    if not changed:
+        return
+    if not created:
+        MenuItemTerm.objects.filter(menu_item=instance, kind__in=changed).delete()
+    MenuItemTerm.objects.bulk_create(MenuItemTerm.rows_for(instance, changed))
+
+
+@receiver(post_delete, sender=Restaurant)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_restaurant(instance.pk)
+    suggest.on_restaurant_deleted(instance.pk)
+    personalize.on_restaurants_changed([instance.pk])
+
+
+ROLLUP_FIELDS = ('cuisine_type', 'is_active', 'rating')
+
+
+@receiver(post_init, sender=Restaurant)
+def snapshot_rollup_fields(sender, instance, **kwargs):
+    instance._rollup_snapshot = tuple(instance.__dict__.get(field) for field in ROLLUP_FIELDS)
+
+
+@receiver(post_save, sender=Restaurant)
+def update_cuisine_rollups(sender, instance, created, **kwargs):
+    current = tuple(instance.__dict__.get(field) for field in ROLLUP_FIELDS)
+    previous = (None, False, None) if created else instance._rollup_snapshot
+    if None in current or current == previous:
+        return
+    if previous[1] and previous[0] != current[0]:
+        CuisineRollup.refresh(previous[0], current[0])
+    elif previous[1] or current[1]:
+        CuisineRollup.refresh(current[0])
+    instance._rollup_snapshot = current
+
+
+@receiver(post_delete, sender=Restaurant)
+def release_cuisine_rollup(sender, instance, **kwargs):
+    cuisine_type, is_active, _ = instance._rollup_snapshot
+    if is_active:
+        CuisineRollup.refresh(cuisine_type)
+
+
+@receiver(post_save, sender=MenuItem)
+def update_menu_item_suggestions(sender, instance, **kwargs):
+    suggest.on_menu_item_saved(instance)
+    # Runs before update_menu_item_counts: the snapshot still has the previous restaurant
+    personalize.on_restaurants_changed({instance.restaurant_id, instance._stats_snapshot[0]} - {None})
+
+
+@receiver(post_delete, sender=MenuItem)
+def remove_menu_item_suggestions(sender, instance, **kwargs):
+    suggest.on_menu_item_deleted(instance.pk)
+    personalize.on_restaurants_changed([instance.restaurant_id])
+
+
+# Each instance remembers the values its counters were last derived from, so
+# updates can move them between restaurants without re-reading the row.
+# Deferred fields are read from __dict__ to avoid triggering a query.
+
+@receiver(post_init, sender=MenuCategory)
+def snapshot_category(sender, instance, **kwargs):
+    instance._stats_snapshot = instance.__dict__.get('restaurant_id')
+
+
+@receiver(post_save, sender=MenuCategory)
+def update_category_counts(sender, instance, created, **kwargs):
+    previous = None if created else instance._stats_snapshot
+    if previous != instance.restaurant_id:
+        adjust_restaurant_stats(previous, categories_count=-1)
+        adjust_restaurant_stats(instance.restaurant_id, categories_count=1)
+    instance._stats_snapshot = instance.restaurant_id
+
+
+@receiver(post_delete, sender=MenuCategory)
+def release_category_counts(sender, instance, origin=None, **kwargs):
+    if not _deleted_with_restaurant(origin):
+        adjust_restaurant_stats(instance._stats_snapshot, categories_count=-1)
+
+
+@receiver(post_init, sender=MenuItem)
+def snapshot_menu_item(sender, instance, **kwargs):
+    instance._stats_snapshot = (
+        instance.__dict__.get('restaurant_id'),
+        instance.__dict__.get('is_available'),
+    )
+
+
+@receiver(post_save, sender=MenuItem)
+def update_menu_item_counts(sender, instance, created, **kwargs):
+    previous = (None, False) if created else instance._stats_snapshot
+    current = (instance.restaurant_id, instance.is_available)
+    if previous != current:
+        if previous[1]:
+            adjust_restaurant_stats(previous[0], menu_items_count=-1)
+        if current[1]:
+            adjust_restaurant_stats(current[0], menu_items_count=1)
+    instance._stats_snapshot = current
+
+
+@receiver(post_delete, sender=MenuItem)
+def release_menu_item_counts(sender, instance, origin=None, **kwargs):
+    restaurant_id, is_available = instance._stats_snapshot
+    if is_available and not _deleted_with_restaurant(origin):
+        adjust_restaurant_stats(restaurant_id, menu_items_count=-1)
+
+
+@receiver(post_init, sender=RestaurantReview)
+def snapshot_review(sender, instance, **kwargs):
+    instance._stats_snapshot = (
+        instance.__dict__.get('restaurant_id'),
+        instance.__dict__.get('rating'),
+    )
+
+
+@receiver(post_save, sender=RestaurantReview)
+def update_review_stats(sender, instance, created, **kwargs):
+    current = (instance.restaurant_id, instance.rating)
+    if created:
+        adjust_restaurant_stats(instance.restaurant_id, reviews_count=1, rating_sum=instance.rating)
+    elif instance._stats_snapshot != current:
+        previous_restaurant, previous_rating = instance._stats_snapshot
+        if previous_restaurant == instance.restaurant_id:
+            adjust_restaurant_stats(instance.restaurant_id, rating_sum=instance.rating - previous_rating)
+        else:
+            adjust_restaurant_stats(previous_restaurant, reviews_count=-1, rating_sum=-previous_rating)
+            adjust_restaurant_stats(instance.restaurant_id, reviews_count=1, rating_sum=instance.rating)
+    instance._stats_snapshot = current
+
+
+@receiver(post_delete, sender=RestaurantReview)
+def release_review_stats(sender, instance, origin=None, **kwargs):
+    restaurant_id, rating = instance._stats_snapshot
+    if not _deleted_with_restaurant(origin):
+        adjust_restaurant_stats(restaurant_id, reviews_count=-1, rating_sum=-(rating or 0))
+
+
+# User details are embedded in catalog responses: reviewers in the detail's
+# recent_reviews (RestaurantReviewSerializer user / user_name), owners in the
+# list's owner_name and ?expand=owner (UserSummarySerializer). A rename must
+# drop the cached responses, and for reviewers also move the detail validators.
+
+REVIEWER_FIELDS = ('username', 'first_name', 'last_name', 'email', 'user_type')
+OWNER_FIELDS = ('username', 'first_name', 'last_name', 'profile_picture')
+
+
+def _displayed_user_state(instance):
+    state = {field: instance.__dict__.get(field) for field in REVIEWER_FIELDS + OWNER_FIELDS}
+    state['profile_picture'] = getattr(state['profile_picture'], 'name', state['profile_picture'])
+    return state
+
+
+@receiver(post_init, sender=settings.AUTH_USER_MODEL)
+def snapshot_displayed_user(sender, instance, **kwargs):
+    instance._displayed_snapshot = _displayed_user_state(instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_restaurants_showing_user(sender, instance, created, **kwargs):
+    previous, current = instance._displayed_snapshot, _displayed_user_state(instance)
+    instance._displayed_snapshot = current
+    if created:
+        return
+
+    def changed(fields):
+        return any(previous[field] != current[field] for field in fields)
+
+    if changed(REVIEWER_FIELDS):
+        reviewed = list(
+            RestaurantReview.objects.filter(user=instance)
+            .values_list('restaurant_id', flat=True).distinct()
+        )
+        if reviewed:
+            Restaurant.objects.filter(pk__in=reviewed).update(updated_at=timezone.now())
+            bump_versions_on_commit(*reviewed)
+    if changed(OWNER_FIELDS):
+        owned = list(Restaurant.objects.filter(owner=instance).values_list('pk', flat=True))
+        if owned:
+            bump_versions_on_commit(*owned)
+
+
+# Cached ranking preferences (restaurants.personalize) of the user concerned
+
+@receiver(post_save, sender='accounts.UserProfile')
+@receiver(post_save, sender='orders.Order')
+@receiver(post_delete, sender='orders.Order')
+def forget_ranking_preferences(sender, instance, **kwargs):
+    personalize.forget_user(instance.user_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def forget_user_ranking_preferences(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'dietary_preferences' in update_fields:
+        personalize.forget_user(instance.pk)
+
+
+images.track(Restaurant, 'image', 'image_variants')
+images.track(MenuCategory, 'image', 'image_variants')
+images.track(MenuItem, 'image', 'image_variants')
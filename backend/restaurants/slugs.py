@@ -0,0 +1,117 @@
+"""
+Unique slug allocation for Restaurant and MenuItem.
+
+A slug is its model's ``slug_base()`` (the slugified name, cut to
+``SLUG_BASE_LENGTH``) or, when that is taken, the base followed by the
+lowest free ``-2``, ``-3``, ... suffix. The slugs a base could collide with
+are the base itself and ones starting with ``<base>-`` (or, for bases long
+enough to be cut for the suffix, with the cut base), so one query fetches
+them and the suffix is picked in memory rather than probed one ``exists()``
+at a time.
+
+Two saves can still pick the same slug concurrently; the unique index
+rejects the second and ``UniqueSlugMixin.save`` allocates again.
+``UniqueSlugMixin.assign_slugs`` fills in slugs for a list of unsaved
+instances before ``bulk_create``, with one query per batch of bases;
+``SlugAllocator`` does the same across several batches.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+SLUG_BASE_LENGTH = 240
+# Longest suffix allowed for ("-9999999999"); longer bases are cut for it
+SUFFIX_LENGTH = 11
+SAVE_ATTEMPTS = 3
+# Bases per query in bulk allocation
+BASES_PER_QUERY = 100
+
+
+def candidate_slug(base, number):
+    """The ``number``-th slug for ``base``: the base itself, then ``base-2``, ``base-3``, ..."""
+    if number == 1:
+        return base
+    suffix = f'-{number}'
+    return f'{base[:SLUG_BASE_LENGTH - len(suffix)]}{suffix}'
+
+
+def next_free_slug(base, taken):
+    number = 1
+    while candidate_slug(base, number) in taken:
+        number += 1
+    return candidate_slug(base, number)
+
+
+def taken_slugs(model, bases, exclude_pk=None):
+    """Existing slugs of ``model`` that could collide with any of ``bases``"""
+    bases = sorted(set(bases))
+    taken = set()
+    for start in range(0, len(bases), BASES_PER_QUERY):
+        condition = Q()
+        for base in bases[start:start + BASES_PER_QUERY]:
+            condition |= Q(slug=base) | Q(slug__startswith=f'{base}-')
+            if len(base) > SLUG_BASE_LENGTH - SUFFIX_LENGTH:
+                # Suffixed slugs of a long base cut it short
+                condition |= Q(slug__startswith=base[:SLUG_BASE_LENGTH - SUFFIX_LENGTH])
+        rows = model._default_manager.filter(condition)
+        if exclude_pk is not None:
+            rows = rows.exclude(pk=exclude_pk)
+        taken.update(rows.values_list('slug', flat=True))
+    return taken
+
+
+class UniqueSlugMixin:
+    """
+    Model mixin filling in an empty ``slug`` from ``slug_base()`` on save.
+
+    ``slug_base()`` returns the slugified base (at most ``SLUG_BASE_LENGTH``
+    characters), or an empty string when there is nothing to build it from.
+    """
+
+    def slug_base(self):
+        raise NotImplementedError
+
+    def save(self, *args, **kwargs):
+        base = '' if self.slug else self.slug_base()
+        if not base:
+            return super().save(*args, **kwargs)
+        for attempt in range(SAVE_ATTEMPTS):
+            self.slug = next_free_slug(base, taken_slugs(type(self), [base], exclude_pk=self.pk))
+            try:
+                # A savepoint, so a collision leaves an outer transaction usable
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                collided = type(self)._default_manager.filter(slug=self.slug).exclude(pk=self.pk).exists()
+                self.slug = ''
+                if not collided or attempt == SAVE_ATTEMPTS - 1:
+                    raise
+
+    @classmethod
+    def assign_slugs(cls, instances):
+        """Give every instance without a slug a unique one, for ``bulk_create``; returns ``instances``"""
+        return SlugAllocator(cls).assign(instances)
+
+
+class SlugAllocator:
+    """
+    Assigns slugs to batches of unsaved instances, remembering what it has
+    looked up and handed out so later batches only query new bases.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.bases = set()
+        self.taken = set()
+
+    def assign(self, instances):
+        pending = [(instance, instance.slug_base()) for instance in instances if not instance.slug]
+        pending = [(instance, base) for instance, base in pending if base]
+        bases = {base for _, base in pending} - self.bases
+        if bases:
+            self.taken.update(taken_slugs(self.model, bases))
+            self.bases.update(bases)
+        self.taken.update(instance.slug for instance in instances if instance.slug)
+        for instance, base in pending:
+            instance.slug = next_free_slug(base, self.taken)
+            self.taken.add(instance.slug)
+        return instances
@@ -0,0 +1,123 @@
+"""
+Pre-rendered menu documents.
+
+Every menu change (a MenuCategory or MenuItem saved, moved or deleted, or
+the restaurant renamed) bumps ``Restaurant.menu_version`` in the writing
+transaction; once it commits, the restaurant's MenuSnapshot is rebuilt in
+the background. The ``menu`` action then serves the stored bytes as they
+are, without touching categories or items.
+
+A snapshot is only served while its version matches the restaurant's
+``menu_version``; otherwise the request renders and stores it inline, so a
+lost background job costs latency, never correctness.
+
+Absolute URLs in the payload are rendered against ``SNAPSHOT_ORIGIN`` and
+rewritten to the requesting host when served.
+
+Background builds run on a single in-process worker thread; set
+``MENU_SNAPSHOT_ASYNC = False`` to build inline after commit instead (the
+test runner does).
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from therestaurant.renderers import ORJSONRenderer
+
+from .models import Restaurant, MenuCategory, MenuSnapshot
+from .serializers import MenuCategorySerializer
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_ORIGIN = 'http://menu-snapshot.invalid'
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='menu-snapshots')
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+class _SnapshotRequest:
+    """Stands in for the request serializers use to build absolute URLs"""
+
+    def build_absolute_uri(self, location='/'):
+        return urljoin(SNAPSHOT_ORIGIN + '/', location)
+
+
+def render_menu(restaurant_id):
+    """The ``menu`` payload of a restaurant as JSON bytes"""
+    categories = (
+        MenuCategory.objects
+        .filter(restaurant_id=restaurant_id)
+        .prefetch_related('items__restaurant')
+    )
+    data = MenuCategorySerializer(categories, many=True, context={'request': _SnapshotRequest()}).data
+    return ORJSONRenderer().render(data)
+
+
+def build_snapshot(restaurant_id):
+    """Render and store the current menu; returns the MenuSnapshot, or None if the restaurant is gone"""
+    # Read the version first: a change landing mid-render leaves this
+    # snapshot already outdated rather than wrongly current.
+    version = Restaurant.objects.filter(pk=restaurant_id).values_list('menu_version', flat=True).first()
+    if version is None:
+        return None
+    content = render_menu(restaurant_id)
+    # Never replace a snapshot rendered from a newer version
+    updated = MenuSnapshot.objects.filter(restaurant_id=restaurant_id, version__lte=version).update(
+        version=version, content=content, built_at=timezone.now(),
+    )
+    if not updated:
+        try:
+            with transaction.atomic():
+                MenuSnapshot.objects.create(restaurant_id=restaurant_id, version=version, content=content)
+        except IntegrityError:
+            pass  # a concurrent build stored a snapshot first
+    return MenuSnapshot.objects.filter(restaurant_id=restaurant_id).first()
+
+
+def _build_in_background(restaurant_id):
+    with _pending_lock:
+        _pending.discard(restaurant_id)
+    try:
+        build_snapshot(restaurant_id)
+    except Exception:
+        logger.exception("Menu snapshot build failed for restaurant %s", restaurant_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_build(restaurant_id):
+    """Queue a rebuild, collapsing repeats for a restaurant already waiting"""
+    if not getattr(settings, 'MENU_SNAPSHOT_ASYNC', True):
+        build_snapshot(restaurant_id)
+        return
+    with _pending_lock:
+        if restaurant_id in _pending:
+            return
+        _pending.add(restaurant_id)
+    _executor.submit(_build_in_background, restaurant_id)
+
+
+def menu_changed(*restaurant_ids):
+    """Bump the menu version now and rebuild the snapshot after commit"""
+    restaurant_ids = {pk for pk in restaurant_ids if pk is not None}
+    if not restaurant_ids:
+        return
+    Restaurant.objects.filter(pk__in=restaurant_ids).update(menu_version=F('menu_version') + 1)
+    for restaurant_id in restaurant_ids:
+        transaction.on_commit(lambda pk=restaurant_id: schedule_build(pk))
+
+
+def menu_content(restaurant, request):
+    """(JSON bytes, version) of a restaurant's menu for ``request``, from the snapshot when current"""
+    snapshot = MenuSnapshot.objects.filter(restaurant=restaurant, version=F('restaurant__menu_version')).first()
+    if snapshot is None:
+        snapshot = build_snapshot(restaurant.pk)
+    origin = request.build_absolute_uri('/').rstrip('/')
+    content = bytes(snapshot.content).replace(SNAPSHOT_ORIGIN.encode(), origin.encode())
+    return content, snapshot.version
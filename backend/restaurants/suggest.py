@@ -0,0 +1,368 @@
+"""
+In-memory autocomplete over restaurant names, dish names and cuisines.
+
+Each process holds one ``SuggestionIndex``. Suggestions are matched word by
+word against a vocabulary of normalized tokens:
+
+- the last query word may be a prefix (bisect over the sorted vocabulary),
+- words of three letters or more may carry typos; candidate tokens come
+  from a trigram index and are confirmed with a bounded edit distance
+  (one edit for short words, two from five letters on, so "jolof" finds
+  "jollof").
+
+The index is built lazily on the first request. After that it is kept
+current incrementally: saves and deletes in this process are applied from
+the model signals, and every ``SYNC_INTERVAL`` seconds rows whose
+``updated_at`` moved past the last watermark are pulled in, so other
+workers' writes show up without a rebuild. A full rebuild only happens
+every ``REBUILD_INTERVAL`` seconds to drop rows deleted elsewhere.
+"""
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from .models import Restaurant, MenuItem
+
+SYNC_INTERVAL = 30
+REBUILD_INTERVAL = 60 * 60
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+
+# Fuzzy candidates examined per query word, ranked by shared trigrams
+FUZZY_CANDIDATES = 200
+# Vocabulary tokens accepted for a single prefix
+PREFIX_CANDIDATES = 500
+
+KIND_ORDER = {'restaurant': 0, 'cuisine': 1, 'dish': 2}
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+    """Lowercase, strip accents and split into alphanumeric words"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _WORD_RE.findall(text.lower())
+
+
+def trigrams(token):
+    padded = f'${token}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_edits(word):
+    if len(word) < 3:
+        return 0
+    if len(word) < 5:
+        return 1
+    return 2
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance, or ``limit + 1`` once it is exceeded"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous2 is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous2[j - 2] + 1)
+            row_min = min(row_min, current[j])
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def prefix_distance(word, token, limit):
+    """Distance from ``word`` to the closest prefix of ``token`` (for partly typed words)"""
+    best = limit + 1
+    for length in range(max(1, len(word) - limit), min(len(token), len(word) + limit) + 1):
+        best = min(best, edit_distance(word, token[:length], limit))
+        if best == 0:
+            break
+    return best
+
+
+class SuggestionIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        self.built = False
+        self.entries = {}                       # key -> suggestion dict
+        self.entry_tokens = {}                  # key -> tuple of tokens
+        self.token_entries = defaultdict(set)   # token -> keys
+        self.sorted_tokens = []                 # vocabulary, for prefix bisect
+        self.trigram_tokens = defaultdict(set)  # trigram -> tokens
+        self.restaurants = {}                   # restaurant id -> cuisine key
+        self.restaurant_dishes = defaultdict(set)  # restaurant id -> dish keys
+        self.dish_restaurants = {}              # dish key -> restaurant id
+        self.cuisine_counts = Counter()
+        self.watermark = None
+        self.built_at = 0.0
+        self.synced_at = 0.0
+
+    # -- vocabulary -----------------------------------------------------
+
+    def _add_entry(self, key, text, payload):
+        self._remove_entry(key)
+        tokens = tuple(normalize(text))
+        if not tokens:
+            return
+        self.entries[key] = dict(payload, type=key[0], text=text)
+        self.entry_tokens[key] = tokens
+        for token in set(tokens):
+            if token not in self.token_entries:
+                self.sorted_tokens.insert(bisect_left(self.sorted_tokens, token), token)
+                for gram in trigrams(token):
+                    self.trigram_tokens[gram].add(token)
+            self.token_entries[token].add(key)
+
+    def _remove_entry(self, key):
+        tokens = self.entry_tokens.pop(key, None)
+        self.entries.pop(key, None)
+        for token in set(tokens or ()):
+            keys = self.token_entries[token]
+            keys.discard(key)
+            if not keys:
+                del self.token_entries[token]
+                del self.sorted_tokens[bisect_left(self.sorted_tokens, token)]
+                for gram in trigrams(token):
+                    self.trigram_tokens[gram].discard(token)
+                    if not self.trigram_tokens[gram]:
+                        del self.trigram_tokens[gram]
+
+    # -- entries --------------------------------------------------------
+
+    def _set_cuisine(self, restaurant_id, cuisine):
+        previous = self.restaurants.pop(restaurant_id, None)
+        if previous is not None:
+            self.cuisine_counts[previous] -= 1
+            if self.cuisine_counts[previous] <= 0:
+                del self.cuisine_counts[previous]
+                self._remove_entry(('cuisine', previous))
+        if cuisine is not None:
+            key = ' '.join(normalize(cuisine))
+            self.restaurants[restaurant_id] = key
+            self.cuisine_counts[key] += 1
+            if ('cuisine', key) not in self.entries:
+                self._add_entry(('cuisine', key), cuisine, {})
+
+    def _upsert_restaurant(self, row):
+        key = ('restaurant', row['id'])
+        if not row['is_active']:
+            self._drop_restaurant(row['id'])
+            return
+        was_indexed = row['id'] in self.restaurants
+        self._add_entry(key, row['name'], {'slug': row['slug']})
+        self._set_cuisine(row['id'], row['cuisine_type'])
+        if not was_indexed and self.built:
+            # Reactivated: its dishes were dropped along with it
+            for item in self._menu_item_rows(restaurant_id=row['id']):
+                self._upsert_menu_item(item)
+
+    def _drop_restaurant(self, restaurant_id):
+        self._remove_entry(('restaurant', restaurant_id))
+        self._set_cuisine(restaurant_id, None)
+        for key in self.restaurant_dishes.pop(restaurant_id, set()):
+            self.dish_restaurants.pop(key, None)
+            self._remove_entry(key)
+
+    def _upsert_menu_item(self, row):
+        key = ('dish', row['id'])
+        if not row['is_available'] or row['restaurant_id'] not in self.restaurants:
+            self._drop_menu_item(row['id'])
+            return
+        previous = self.dish_restaurants.get(key)
+        if previous is not None and previous != row['restaurant_id']:
+            self.restaurant_dishes[previous].discard(key)
+        self._add_entry(key, row['name'], {'slug': row['slug'], 'restaurant': row['restaurant_id']})
+        self.restaurant_dishes[row['restaurant_id']].add(key)
+        self.dish_restaurants[key] = row['restaurant_id']
+
+    def _drop_menu_item(self, item_id):
+        key = ('dish', item_id)
+        restaurant_id = self.dish_restaurants.pop(key, None)
+        if restaurant_id is not None:
+            self.restaurant_dishes[restaurant_id].discard(key)
+        self._remove_entry(key)
+
+    # -- loading --------------------------------------------------------
+
+    RESTAURANT_FIELDS = ('id', 'name', 'slug', 'cuisine_type', 'is_active', 'updated_at')
+    MENU_ITEM_FIELDS = ('id', 'name', 'slug', 'restaurant_id', 'is_available', 'updated_at')
+
+    def _menu_item_rows(self, **filters):
+        return MenuItem.objects.filter(**filters).values(*self.MENU_ITEM_FIELDS).iterator()
+
+    def _advance(self, row):
+        if self.watermark is None or row['updated_at'] > self.watermark:
+            self.watermark = row['updated_at']
+
+    def build(self):
+        with self._lock:
+            self.clear()
+            for row in Restaurant.objects.filter(is_active=True).values(*self.RESTAURANT_FIELDS).iterator():
+                self._upsert_restaurant(row)
+                self._advance(row)
+            for row in self._menu_item_rows(is_available=True, restaurant__is_active=True):
+                self._upsert_menu_item(row)
+                self._advance(row)
+            self.built = True
+            self.built_at = self.synced_at = time.monotonic()
+
+    def sync(self):
+        """Pull rows changed since the watermark (written by any process)"""
+        with self._lock:
+            since = self.watermark
+            restaurant_rows = Restaurant.objects.values(*self.RESTAURANT_FIELDS)
+            item_rows = MenuItem.objects.values(*self.MENU_ITEM_FIELDS)
+            if since is not None:
+                restaurant_rows = restaurant_rows.filter(updated_at__gte=since)
+                item_rows = item_rows.filter(updated_at__gte=since)
+            for row in restaurant_rows:
+                self._upsert_restaurant(row)
+                self._advance(row)
+            for row in item_rows:
+                self._upsert_menu_item(row)
+                self._advance(row)
+            self.synced_at = time.monotonic()
+
+    def ensure_fresh(self):
+        now = time.monotonic()
+        if not self.built or now - self.built_at > REBUILD_INTERVAL:
+            self.build()
+        elif now - self.synced_at > SYNC_INTERVAL:
+            self.sync()
+
+    # -- signal hooks ---------------------------------------------------
+
+    def restaurant_saved(self, restaurant):
+        if self.built:
+            with self._lock:
+                self._upsert_restaurant({field: getattr(restaurant, field) for field in self.RESTAURANT_FIELDS})
+
+    def restaurant_deleted(self, restaurant_id):
+        if self.built:
+            with self._lock:
+                self._drop_restaurant(restaurant_id)
+
+    def menu_item_saved(self, item):
+        if self.built:
+            with self._lock:
+                self._upsert_menu_item({field: getattr(item, field) for field in self.MENU_ITEM_FIELDS})
+
+    def menu_items_saved(self, items):
+        if self.built:
+            with self._lock:
+                for item in items:
+                    self._upsert_menu_item({field: getattr(item, field) for field in self.MENU_ITEM_FIELDS})
+
+    def menu_item_deleted(self, item_id):
+        if self.built:
+            with self._lock:
+                self._drop_menu_item(item_id)
+
+    # -- querying -------------------------------------------------------
+
+    def _prefix_tokens(self, word):
+        start = bisect_left(self.sorted_tokens, word)
+        matches = []
+        for token in self.sorted_tokens[start:start + PREFIX_CANDIDATES]:
+            if not token.startswith(word):
+                break
+            matches.append(token)
+        return matches
+
+    def _token_costs(self, word, is_last):
+        """Vocabulary tokens matching one query word, with their edit cost"""
+        costs = {}
+        if is_last:
+            for token in self._prefix_tokens(word):
+                costs[token] = 0
+        elif word in self.token_entries:
+            costs[word] = 0
+
+        limit = max_edits(word)
+        if limit:
+            overlap = Counter()
+            for gram in trigrams(word):
+                overlap.update(self.trigram_tokens.get(gram, ()))
+            for token, _ in overlap.most_common(FUZZY_CANDIDATES):
+                if token in costs:
+                    continue
+                if is_last:
+                    distance = prefix_distance(word, token, limit)
+                else:
+                    distance = edit_distance(word, token, limit)
+                if distance <= limit:
+                    costs[token] = distance
+        return costs
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        words = normalize(query)
+        if not words:
+            return []
+        with self._lock:
+            scores = None
+            for position, word in enumerate(words):
+                word_scores = {}
+                for token, cost in self._token_costs(word, position == len(words) - 1).items():
+                    for key in self.token_entries.get(token, ()):
+                        if cost < word_scores.get(key, cost + 1):
+                            word_scores[key] = cost
+                if scores is None:
+                    scores = word_scores
+                else:
+                    scores = {key: scores[key] + cost for key, cost in word_scores.items() if key in scores}
+                if not scores:
+                    return []
+
+            phrase = ' '.join(words)
+
+            def rank(key):
+                text = ' '.join(self.entry_tokens[key])
+                return (scores[key], not text.startswith(phrase), KIND_ORDER[key[0]], len(text), text)
+
+            best = heapq.nsmallest(limit, scores, key=rank)
+            return [dict(self.entries[key], typos=scores[key]) for key in best]
+
+
+suggestion_index = SuggestionIndex()
+
+
+# Signal receivers in restaurants.signals call these so the in-process index
+# only changes once the write has committed.
+
+def on_restaurant_saved(restaurant):
+    transaction.on_commit(lambda: suggestion_index.restaurant_saved(restaurant))
+
+
+def on_restaurant_deleted(restaurant_id):
+    transaction.on_commit(lambda: suggestion_index.restaurant_deleted(restaurant_id))
+
+
+def on_menu_item_saved(item):
+    transaction.on_commit(lambda: suggestion_index.menu_item_saved(item))
+
+
+def on_menu_items_saved(items):
+    transaction.on_commit(lambda: suggestion_index.menu_items_saved(items))
+
+
+def on_menu_item_deleted(item_id):
+    transaction.on_commit(lambda: suggestion_index.menu_item_deleted(item_id))
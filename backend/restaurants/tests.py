@@ -1,3 +1,1465 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import shutil
+import tempfile
+from django.contrib.auth import get_user_model
+from decimal import Decimal
+from unittest import mock
+from io import StringIO
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .models import Restaurant, MenuCategory, MenuItem, RestaurantReview
+
+User = get_user_model()
+
+
+def make_user(username, user_type='customer'):
+    return User.objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        password='secret-pass-123',
+        user_type=user_type,
+    )
+
+
+def make_restaurant(name, owner=None, **kwargs):
+    defaults = {
+        'description': f'{name} description',
+        'cuisine_type': 'Ghanaian',
+        'address': '1 Oxford Street, Accra',
+        'phone_number': '0240000000',
+        'email': 'hello@example.com',
+        'price_range': '$$',
+    }
+    defaults.update(kwargs)
+    return Restaurant.objects.create(name=name, owner=owner, **defaults)
+
+
+def make_menu_item(restaurant, category, name, **kwargs):
+    defaults = {'description': f'{name} description', 'price': '25.00'}
+    defaults.update(kwargs)
+    return MenuItem.objects.create(restaurant=restaurant, category=category, name=name, **defaults)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class RestaurantListingQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = make_user('vendor', user_type='vendor')
+        reviewers = [make_user(f'reviewer{i}') for i in range(3)]
+        for i in range(20):
+            restaurant = make_restaurant(f'Restaurant {i}', owner=cls.vendor)
+            mains = MenuCategory.objects.create(restaurant=restaurant, name='Mains')
+            MenuCategory.objects.create(restaurant=restaurant, name='Drinks')
+            make_menu_item(restaurant, mains, 'Jollof Rice')
+            make_menu_item(restaurant, mains, 'Waakye')
+            make_menu_item(restaurant, mains, 'Kelewele', is_available=False)
+            for reviewer in reviewers:
+                RestaurantReview.objects.create(
+                    restaurant=restaurant, user=reviewer, rating=4, comment='Good'
+                )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_list_page_uses_constant_queries(self):
+        # One COUNT for the paginator plus one SELECT joining the owner.
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/restaurants/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_list_reports_counts(self):
+        response = self.client.get('/api/restaurants/')
+        first = response.data['results'][0]
+        self.assertEqual(first['categories_count'], 2)
+        self.assertEqual(first['menu_items_count'], 2)
+        self.assertEqual(first['reviews_count'], 3)
+        self.assertEqual(first['owner_name'], 'vendor')
+        self.assertFalse(first['is_owner'])
+
+    def test_search_uses_constant_queries(self):
+        self.client.force_authenticate(make_user('searcher'))
+        with self.assertNumQueries(2):
+            response = self.client.post('/api/restaurants/search/', {'query': 'Restaurant'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['menu_items_count'], 2)
+
+    def test_my_restaurants_uses_constant_queries(self):
+        self.client.force_authenticate(self.vendor)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/restaurants/my-restaurants/')
+        self.assertEqual(len(response.data), 20)
+        self.assertTrue(all(row['is_owner'] for row in response.data))
+
+    def test_nested_usage_needs_no_count_queries(self):
+        from .serializers import RestaurantListSerializer
+        restaurant = Restaurant.objects.select_related('owner').get(name='Restaurant 0')
+        with self.assertNumQueries(0):
+            data = RestaurantListSerializer(restaurant).data
+        self.assertEqual(data['categories_count'], 2)
+        self.assertEqual(data['menu_items_count'], 2)
+        self.assertEqual(data['reviews_count'], 3)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class RestaurantStatsTests(TestCase):
+    def setUp(self):
+        self.vendor = make_user('vendor', user_type='vendor')
+        self.restaurant = make_restaurant('Buka', owner=self.vendor, rating=Decimal('4.50'))
+        self.other = make_restaurant('Chez Afrique')
+        self.category = MenuCategory.objects.create(restaurant=self.restaurant, name='Mains')
+
+    def stats(self, restaurant=None):
+        return Restaurant.objects.values(
+            'categories_count', 'menu_items_count', 'reviews_count', 'rating_sum', 'rating'
+        ).get(pk=(restaurant or self.restaurant).pk)
+
+    def test_menu_item_counter_follows_availability_and_deletes(self):
+        item = make_menu_item(self.restaurant, self.category, 'Fufu')
+        make_menu_item(self.restaurant, self.category, 'Banku', is_available=False)
+        self.assertEqual(self.stats()['menu_items_count'], 1)
+
+        item.is_available = False
+        item.save()
+        self.assertEqual(self.stats()['menu_items_count'], 0)
+
+        item.is_available = True
+        item.save()
+        MenuItem.objects.get(name='Banku').delete()
+        self.assertEqual(self.stats()['menu_items_count'], 1)
+
+        self.category.delete()
+        self.assertEqual(self.stats()['menu_items_count'], 0)
+        self.assertEqual(self.stats()['categories_count'], 0)
+
+    def test_review_writes_through_viewset_update_rating(self):
+        client = APIClient()
+        client.force_authenticate(self.vendor)
+        response = client.post(f'/api/restaurants/{self.restaurant.slug}/reviews/', {'rating': 5, 'comment': 'Great'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        RestaurantReview.objects.create(restaurant=self.restaurant, user=make_user('diner'), rating=2, comment='Meh')
+        stats = self.stats()
+        self.assertEqual((stats['reviews_count'], stats['rating_sum']), (2, 7))
+        self.assertEqual(stats['rating'], Decimal('3.50'))
+
+        review = RestaurantReview.objects.get(comment='Great')
+        response = client.patch(f'/api/reviews/{review.pk}/', {'rating': 3}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stats()['rating'], Decimal('2.50'))
+
+        response = client.delete(f'/api/reviews/{review.pk}/')
+        self.assertEqual(response.status_code, 204)
+        stats = self.stats()
+        self.assertEqual((stats['reviews_count'], stats['rating_sum']), (1, 2))
+        self.assertEqual(stats['rating'], Decimal('2.00'))
+
+        RestaurantReview.objects.get().delete()
+        stats = self.stats()
+        self.assertEqual((stats['reviews_count'], stats['rating_sum']), (0, 0))
+        self.assertEqual(stats['rating'], Decimal('0.00'))
+
+    def test_restaurant_save_does_not_clobber_counters(self):
+        stale = Restaurant.objects.get(pk=self.restaurant.pk)
+        make_menu_item(self.restaurant, self.category, 'Fufu')
+        stale.name = 'Buka Renamed'
+        stale.save()
+        self.assertEqual(self.stats()['menu_items_count'], 1)
+
+    def test_detail_average_uses_counters(self):
+        RestaurantReview.objects.create(restaurant=self.restaurant, user=make_user('a'), rating=4, comment='ok')
+        RestaurantReview.objects.create(restaurant=self.restaurant, user=make_user('b'), rating=5, comment='ok')
+        response = APIClient().get(f'/api/restaurants/{self.restaurant.slug}/')
+        self.assertEqual(response.data['average_rating'], 4.5)
+        self.assertEqual(response.data['total_reviews'], 2)
+
+    def test_reconcile_command_fixes_drift(self):
+        make_menu_item(self.restaurant, self.category, 'Fufu')
+        RestaurantReview.objects.create(restaurant=self.restaurant, user=make_user('a'), rating=4, comment='ok')
+        Restaurant.objects.update(categories_count=9, menu_items_count=9, reviews_count=0, rating_sum=0)
+
+        out = StringIO()
+        call_command('reconcile_restaurant_stats', '--batch-size', '1', stdout=out)
+        self.assertIn('Fixed 2', out.getvalue())
+        stats = self.stats()
+        self.assertEqual(
+            (stats['categories_count'], stats['menu_items_count'], stats['reviews_count'], stats['rating_sum']),
+            (1, 1, 1, 4),
+        )
+        self.assertEqual(self.stats(self.other)['categories_count'], 0)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class RestaurantSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('searcher'))
+        self.jollof = make_restaurant('Jollof Palace', cuisine_type='Ghanaian', description='Smoky party rice')
+        self.noodles = make_restaurant('Noodle Bar', cuisine_type='Asian', description='Famous for jollof fusion bowls')
+        make_restaurant('Pizza Hub', cuisine_type='Italian', description='Wood fired pizza', address='Jollof Street')
+
+    def search(self, query, **extra):
+        response = self.client.post('/api/restaurants/search/', {'query': query, **extra}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.data['results']]
+
+    def test_results_ranked_by_field_weight(self):
+        self.assertEqual(self.search('jollof'), ['Jollof Palace', 'Noodle Bar', 'Pizza Hub'])
+
+    def test_all_terms_required_and_last_term_is_prefix(self):
+        self.assertEqual(self.search('party ri'), ['Jollof Palace'])
+        self.assertEqual(self.search('pizza asian'), [])
+
+    def test_explicit_ordering_overrides_rank(self):
+        self.assertEqual(self.search('jollof', ordering='name'), ['Jollof Palace', 'Noodle Bar', 'Pizza Hub'])
+        self.assertEqual(self.search('jollof', ordering='-name'), ['Pizza Hub', 'Noodle Bar', 'Jollof Palace'])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.jollof.name = 'Waakye Corner'
+        self.jollof.save()
+        self.assertEqual(self.search('waakye'), ['Waakye Corner'])
+        self.assertNotIn('Waakye Corner', self.search('palace'))
+
+        self.noodles.delete()
+        self.assertEqual(self.search('fusion'), [])
+
+    def test_list_search_param_is_ranked(self):
+        response = self.client.get('/api/restaurants/', {'search': 'jollof'})
+        self.assertEqual(
+            [row['name'] for row in response.data['results']],
+            ['Jollof Palace', 'Noodle Bar', 'Pizza Hub'],
+        )
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class SearchSuggestTests(TestCase):
+    def setUp(self):
+        from .suggest import suggestion_index
+        self.index = suggestion_index
+        self.index.clear()
+        self.client = APIClient()
+        self.restaurant = make_restaurant('Jollof Palace', cuisine_type='Ghanaian')
+        category = MenuCategory.objects.create(restaurant=self.restaurant, name='Mains')
+        self.item = make_menu_item(self.restaurant, category, 'Smoky Jollof Rice')
+        make_menu_item(self.restaurant, category, 'Kelewele')
+        make_restaurant('Pasta Corner', cuisine_type='Italian')
+
+    def suggest(self, query):
+        response = self.client.get('/api/search/suggest', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [(row['type'], row['text']) for row in response.data['suggestions']]
+
+    def test_prefix_matches_restaurants_dishes_and_cuisines(self):
+        self.assertEqual(self.suggest('jol'), [('restaurant', 'Jollof Palace'), ('dish', 'Smoky Jollof Rice')])
+        self.assertEqual(self.suggest('ghan'), [('cuisine', 'Ghanaian')])
+
+    def test_tolerates_typos(self):
+        self.assertEqual(self.suggest('jolof')[0], ('restaurant', 'Jollof Palace'))
+        self.assertIn(('dish', 'Kelewele'), self.suggest('kelwele'))
+        self.assertIn(('cuisine', 'Italian'), self.suggest('itlaian'))
+        self.assertEqual(self.suggest('zzzz'), [])
+
+    def test_saves_update_index_incrementally(self):
+        self.suggest('jol')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.name = 'Waakye Special'
+            self.item.save()
+            self.restaurant.cuisine_type = 'West African'
+            self.restaurant.save()
+        self.assertEqual(self.suggest('waak'), [('dish', 'Waakye Special')])
+        self.assertEqual(self.suggest('ghan'), [])
+        self.assertEqual(self.suggest('west af'), [('cuisine', 'West African')])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurant.is_active = False
+            self.restaurant.save()
+        self.assertEqual(self.suggest('waak'), [])
+
+    def test_sync_picks_up_writes_from_other_processes(self):
+        from django.utils import timezone
+        self.suggest('jol')
+        MenuItem.objects.filter(pk=self.item.pk).update(name='Red Red', updated_at=timezone.now())
+        self.index.synced_at = 0
+        self.assertEqual(self.suggest('red r'), [('dish', 'Red Red')])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Three ratings shared by 45 restaurants so most sort keys tie
+        for i in range(45):
+            make_restaurant(f'Restaurant {i % 15:02d}', rating=Decimal(i % 3))
+        cls.expected = list(
+            Restaurant.objects.order_by('-rating', 'name', 'id').values_list('id', flat=True)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_cursor_walks_every_row_once_in_order(self):
+        data = self.get('/api/restaurants/', {'cursor': ''})
+        self.assertNotIn('count', data)
+        self.assertIsNone(data['previous'])
+
+        seen, pages = [], []
+        while True:
+            pages.append(data)
+            seen.extend(row['id'] for row in data['results'])
+            if not data['next']:
+                break
+            data = self.get(data['next'])
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([len(page['results']) for page in pages], [20, 20, 5])
+
+        back = self.get(pages[2]['previous'])
+        self.assertEqual(back['results'], pages[1]['results'])
+        self.assertEqual(self.get(back['previous'])['results'], pages[0]['results'])
+
+    def test_page_numbers_remain_the_default(self):
+        data = self.get('/api/restaurants/', {'page': 2})
+        self.assertEqual(data['count'], 45)
+        self.assertEqual([row['id'] for row in data['results']], self.expected[20:40])
+
+    def test_relevance_ordering_falls_back_to_page_numbers(self):
+        data = self.get('/api/restaurants/', {'cursor': '', 'search': 'restaurant'})
+        self.assertEqual(data['count'], 45)
+        self.assertNotIn('cursor=', data['next'])
+
+    def test_bad_cursor_is_not_found(self):
+        response = self.client.get('/api/restaurants/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class NearbySearchTests(TestCase):
+    # Accra city centre
+    LAT, LNG = 5.5600, -0.2057
+
+    def setUp(self):
+        self.client = APIClient()
+        self.osu = make_restaurant('Osu Chop Bar', latitude=5.5560, longitude=-0.1769)
+        self.airport = make_restaurant('Airport Grill', latitude=5.6052, longitude=-0.1668, cuisine_type='Italian')
+        make_restaurant('Kumasi Kitchen', latitude=6.6885, longitude=-1.6244)
+        make_restaurant('No Address Cafe')
+
+    def nearby(self, **params):
+        response = self.client.get('/api/restaurants/nearby/', {'lat': self.LAT, 'lng': self.LNG, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(row['name'], row['distance_km']) for row in response.data['results']]
+
+    def test_nearest_first_within_radius(self):
+        results = self.nearby(radius=10)
+        self.assertEqual([name for name, _ in results], ['Osu Chop Bar', 'Airport Grill'])
+        self.assertAlmostEqual(results[0][1], 3.22, places=1)
+        self.assertEqual(len(self.nearby(radius=50)), 2)
+
+    def test_composes_with_filters_and_ordering(self):
+        self.assertEqual([name for name, _ in self.nearby(radius=10, cuisine_type='Italian')], ['Airport Grill'])
+        self.assertEqual(
+            [name for name, _ in self.nearby(radius=10, ordering='-distance')],
+            ['Airport Grill', 'Osu Chop Bar'],
+        )
+        self.assertEqual(
+            [name for name, _ in self.nearby(radius=10, ordering='name')],
+            ['Airport Grill', 'Osu Chop Bar'],
+        )
+
+    def test_moving_a_restaurant_updates_its_cell(self):
+        self.osu.latitude, self.osu.longitude = 6.69, -1.62
+        self.osu.save(update_fields=['latitude', 'longitude'])
+        self.assertEqual([name for name, _ in self.nearby(radius=10)], ['Airport Grill'])
+
+    def test_invalid_parameters(self):
+        response = self.client.get('/api/restaurants/nearby/', {'lat': 95, 'lng': 0})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('lat', response.data)
+        response = self.client.get('/api/restaurants/nearby/', {'lat': self.LAT, 'lng': self.LNG, 'radius': 250})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FeatureFilterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('diner'))
+        self.cafe = make_restaurant('Wifi Cafe', features=['wifi', 'takeout'])
+        make_restaurant('Full House', features=['WiFi', 'parking', 'delivery'])
+        make_restaurant('Drive In', features=['parking'])
+
+    def names(self, **params):
+        response = self.client.get('/api/restaurants/', {'ordering': 'name', **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.data['results']]
+
+    def test_all_and_any_filters(self):
+        self.assertEqual(self.names(features='wifi'), ['Full House', 'Wifi Cafe'])
+        self.assertEqual(self.names(features='wifi,parking'), ['Full House'])
+        self.assertEqual(self.names(features_any='takeout,delivery'), ['Full House', 'Wifi Cafe'])
+        self.assertEqual(self.names(features='wifi', features_any='parking'), ['Full House'])
+
+    def test_index_follows_json_edits(self):
+        self.cafe.features.append('parking')
+        self.cafe.save()
+        self.assertEqual(self.names(features='wifi,parking'), ['Full House', 'Wifi Cafe'])
+
+        self.cafe.features = ['takeout']
+        self.cafe.save()
+        self.assertEqual(self.names(features='wifi'), ['Full House'])
+
+    def test_search_action_requires_every_feature(self):
+        response = self.client.post('/api/restaurants/search/', {'features': ['parking', 'delivery']}, format='json')
+        self.assertEqual([row['name'] for row in response.data['results']], ['Full House'])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class OpeningHoursTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('diner'))
+        # 2026-10-19 is a Monday
+        self.cafe = make_restaurant('Day Cafe', opening_hours={
+            'monday': '07:00-18:00', 'tuesday': 'closed', 'sunday': '08:00-12:00, 14:00-16:00',
+        })
+        make_restaurant('Night Bar', opening_hours={
+            'mon': {'closed': True},
+            'sat': {'closed': False, 'open': '18:00', 'close': '02:00'},
+            'sun': {'closed': False, 'open': '20:00', 'close': '01:00'},
+        })
+        make_restaurant('Unknown Hours')
+
+    def names(self, **params):
+        response = self.client.get('/api/restaurants/', {'ordering': 'name', **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.data['results']]
+
+    def test_compiles_both_formats_with_overnight_and_week_wrap(self):
+        from .hours import compile_opening_hours
+        self.assertEqual(
+            compile_opening_hours({'mon': '22:00-24:00', 'sun': {'open': '23:00', 'close': '03:00'}}),
+            [(0, 180), (1320, 1440), (10020, 10080)],
+        )
+        self.assertEqual(compile_opening_hours({'tue': 'closed', 'wed': 'late'}), [])
+
+    def test_open_at_filter(self):
+        self.assertEqual(self.names(open_at='2026-10-19T12:00:00'), ['Day Cafe'])
+        self.assertEqual(self.names(open_at='2026-10-20T12:00:00'), [])
+        self.assertEqual(self.names(open_at='2026-10-25T15:00:00'), ['Day Cafe'])
+        self.assertEqual(self.names(open_at='2026-10-25T13:00:00'), [])
+        # Saturday's late session runs into Sunday, Sunday's into Monday
+        self.assertEqual(self.names(open_at='2026-10-25T01:30:00'), ['Night Bar'])
+        self.assertEqual(self.names(open_at='2026-10-19T00:30:00'), ['Night Bar'])
+
+        response = self.client.get('/api/restaurants/', {'open_at': 'tonight'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_open_now_and_search(self):
+        monday_noon = datetime.datetime(2026, 10, 19, 12, 0, tzinfo=datetime.timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=monday_noon):
+            self.assertEqual(self.names(open_now='true'), ['Day Cafe'])
+            self.assertEqual(self.names(open_now='false'), ['Night Bar', 'Unknown Hours'])
+            response = self.client.post('/api/restaurants/search/', {'open_now': True}, format='json')
+        self.assertEqual([row['name'] for row in response.data['results']], ['Day Cafe'])
+
+    def test_intervals_follow_edits(self):
+        self.cafe.opening_hours['tuesday'] = '09:00-10:00'
+        self.cafe.save()
+        self.assertEqual(self.names(open_at='2026-10-20T09:30:00'), ['Day Cafe'])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CuisineRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.vendor = make_user('vendor', user_type='vendor')
+        self.roma = make_restaurant('Roma', owner=self.vendor, cuisine_type='Italian', rating=Decimal('4.50'))
+        self.napoli = make_restaurant('Napoli', cuisine_type='Italian', rating=Decimal('3.50'))
+        self.chop_bar = make_restaurant('Chop Bar', cuisine_type='Ghanaian', rating=Decimal('4.00'))
+
+    def popular(self):
+        response = self.client.get('/api/restaurants/popular-cuisines/')
+        return [(row['name'], row['restaurant_count'], row['avg_rating']) for row in response.data]
+
+    def leaderboard(self, cuisine):
+        response = self.client.get('/api/restaurants/leaderboard/', {'cuisine_type': cuisine})
+        return [row['name'] for row in response.data['results']]
+
+    def test_served_from_rollups_without_scanning_restaurants(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.popular(), [('Italian', 2, 4.0), ('Ghanaian', 1, 4.0)])
+        with self.assertNumQueries(0):
+            self.popular()
+        with self.assertNumQueries(2):
+            self.assertEqual(self.leaderboard('Italian'), ['Roma', 'Napoli'])
+        self.assertEqual(self.client.get('/api/restaurants/leaderboard/', {'cuisine_type': 'Thai'}).status_code, 404)
+
+    def test_rollups_follow_cuisine_activity_and_rating_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.napoli.cuisine_type = 'Ghanaian'
+            self.napoli.save()
+        self.assertEqual(self.popular(), [('Ghanaian', 2, 3.8), ('Italian', 1, 4.5)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.chop_bar.is_active = False
+            self.chop_bar.save()
+        self.assertEqual(self.leaderboard('Ghanaian'), ['Napoli'])
+
+        reviewer = make_user('reviewer')
+        with self.captureOnCommitCallbacks(execute=True):
+            RestaurantReview.objects.create(restaurant=self.napoli, user=reviewer, rating=5, comment='Great')
+        self.assertEqual(self.popular(), [('Ghanaian', 1, 5.0), ('Italian', 1, 4.5)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.roma.delete()
+        self.assertEqual(self.popular(), [('Ghanaian', 1, 5.0)])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CatalogResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.vendor = make_user('vendor', user_type='vendor')
+        self.restaurant = make_restaurant('Jollof Palace', owner=self.vendor)
+        self.other = make_restaurant('Pasta Corner', cuisine_type='Italian')
+        self.category = MenuCategory.objects.create(restaurant=self.restaurant, name='Mains')
+        self.item = make_menu_item(self.restaurant, self.category, 'Jollof Rice')
+
+    def test_anonymous_reads_are_served_from_cache(self):
+        url = f'/api/restaurants/{self.restaurant.slug}/'
+        first = self.client.get(url)
+        # Only the ETag state query remains on a hit
+        with self.assertNumQueries(1):
+            second = self.client.get(url)
+        self.assertEqual(first.data, second.data)
+        self.client.get('/api/restaurants/popular-cuisines/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/restaurants/popular-cuisines/')
+        self.assertEqual(self.client.get('/api/restaurants/nope/').status_code, 404)
+
+    def test_writes_bump_restaurant_and_global_versions(self):
+        detail_url = f'/api/restaurants/{self.restaurant.slug}/'
+        other_url = f'/api/restaurants/{self.other.slug}/'
+        self.client.get(detail_url)
+        self.client.get(other_url)
+        self.client.get('/api/restaurants/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.name = 'Smoky Jollof'
+            self.item.save()
+
+        self.assertEqual(self.client.get(detail_url).data['categories'][0]['items'][0]['name'], 'Smoky Jollof')
+        listing = self.client.get('/api/restaurants/', {'ordering': 'name'})
+        self.assertEqual(listing.data['results'][0]['menu_items_count'], 1)
+        with self.assertNumQueries(1):
+            self.client.get(other_url)
+
+    def test_authenticated_requests_bypass_cache(self):
+        self.client.get('/api/restaurants/')
+        self.client.force_authenticate(self.vendor)
+        response = self.client.get('/api/restaurants/', {'ordering': 'name'})
+        self.assertTrue(response.data['results'][0]['is_owner'])
+
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.restaurant = make_restaurant('Jollof Palace')
+        category = MenuCategory.objects.create(restaurant=self.restaurant, name='Mains')
+        self.item = make_menu_item(self.restaurant, category, 'Jollof Rice')
+        make_menu_item(self.restaurant, category, 'Old Special', is_available=False)
+        self.url = f'/api/restaurants/{self.restaurant.slug}/'
+
+    def test_matching_etag_short_circuits_to_304(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(self.client.get(self.url + 'menu/').status_code, 200)
+
+    def test_menu_changes_and_deletes_change_validators(self):
+        etag = self.client.get(self.url + 'menu/')['ETag']
+        self.item.price = '30.00'
+        self.item.save()
+        response = self.client.get(self.url + 'menu/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+        MenuItem.objects.get(name='Old Special').delete()
+        self.assertEqual(self.client.get(self.url + 'menu/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_renamed_reviewer_changes_detail_validators(self):
+        reviewer = make_user('diner')
+        RestaurantReview.objects.create(restaurant=self.restaurant, user=reviewer, rating=4, comment='Tasty')
+        etag = self.client.get(self.url)['ETag']
+
+        reviewer.first_name, reviewer.last_name = 'Ama', 'Mensah'
+        with self.captureOnCommitCallbacks(execute=True):
+            reviewer.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['recent_reviews'][0]['user_name'], 'Ama Mensah')
+
+    def test_renamed_owner_refreshes_cached_list(self):
+        owner = make_user('own', user_type='vendor')
+        Restaurant.objects.filter(pk=self.restaurant.pk).update(owner=owner)
+        self.assertEqual(self.client.get('/api/restaurants/').data['results'][0]['owner_name'], 'own')
+        self.client.get('/api/restaurants/?expand=owner')
+
+        owner.username = 'renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            owner.save()
+        self.assertEqual(self.client.get('/api/restaurants/').data['results'][0]['owner_name'], 'renamed')
+        response = self.client.get('/api/restaurants/?expand=owner')
+        self.assertEqual(response.data['results'][0]['owner']['username'], 'renamed')
+
+    def test_missing_restaurant_still_404s(self):
+        self.assertEqual(self.client.get('/api/restaurants/nope/', HTTP_IF_NONE_MATCH='"x"').status_code, 404)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class MenuSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.restaurant = make_restaurant('Jollof Palace')
+        self.category = MenuCategory.objects.create(restaurant=self.restaurant, name='Mains')
+        self.item = make_menu_item(self.restaurant, self.category, 'Jollof Rice')
+        self.url = f'/api/restaurants/{self.restaurant.slug}/menu/'
+
+    def version(self):
+        return self.client.get(self.url + 'version/').data['version']
+
+    def test_menu_is_served_from_stored_bytes(self):
+        from .models import MenuSnapshot
+        first = self.client.get(self.url)
+        self.assertEqual(first['Content-Type'], 'application/json')
+        self.assertEqual(first.json()[0]['items'][0]['restaurant_name'], 'Jollof Palace')
+        self.assertTrue(MenuSnapshot.objects.filter(restaurant=self.restaurant).exists())
+
+        # ETag state, restaurant lookup and the snapshot: no category or item queries
+        with self.assertNumQueries(3):
+            second = self.client.get(self.url)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(second['X-Menu-Version'], str(self.version()))
+
+    def test_menu_changes_bump_version_and_rebuild_after_commit(self):
+        from .models import MenuSnapshot
+        self.client.get(self.url)
+        version = self.version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_menu_item(self.restaurant, self.category, 'Waakye')
+        self.assertEqual(self.version(), version + 1)
+        self.assertEqual(MenuSnapshot.objects.get(restaurant=self.restaurant).version, version + 1)
+        self.assertEqual(len(self.client.get(self.url).json()[0]['items']), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurant.name = 'Jollof Kingdom'
+            self.restaurant.save()
+        self.assertEqual(self.client.get(self.url).json()[0]['items'][0]['restaurant_name'], 'Jollof Kingdom')
+
+    def test_stale_snapshot_is_never_served(self):
+        self.client.get(self.url)
+        # Bumped without running the after-commit rebuild
+        self.item.name = 'Smoky Jollof'
+        self.item.save()
+        self.assertEqual(self.client.get(self.url).json()[0]['items'][0]['name'], 'Smoky Jollof')
+        detail = self.client.get(f'/api/restaurants/{self.restaurant.slug}/')
+        self.assertEqual(detail.data['categories'][0]['items'][0]['name'], 'Smoky Jollof')
+
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.vendor = make_user('vendor', user_type='vendor')
+        self.restaurant = make_restaurant('Jollof Palace', owner=self.vendor)
+        category = MenuCategory.objects.create(restaurant=self.restaurant, name='Mains')
+        self.item = make_menu_item(self.restaurant, category, 'Jollof Rice')
+
+    def test_list_renders_only_requested_fields(self):
+        response = self.client.get('/api/restaurants/?fields=name,image')
+        self.assertEqual(set(response.data['results'][0]), {'name', 'image'})
+
+    def test_unrequested_columns_and_joins_are_skipped(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/restaurants/?fields=name,slug')
+        select = queries.captured_queries[-1]['sql']
+        self.assertNotIn('description', select)
+        self.assertNotIn('accounts_customuser', select)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/restaurants/?fields=name,owner_name')
+        self.assertEqual(response.data['results'][0]['owner_name'], 'vendor')
+        self.assertIn('accounts_customuser', queries.captured_queries[-1]['sql'])
+
+    def test_method_fields_are_not_computed_unless_requested(self):
+        with mock.patch('restaurants.snapshots.menu_content') as menu_content:
+            response = self.client.get(f'/api/restaurants/{self.restaurant.slug}/?fields=name,average_rating')
+        self.assertEqual(set(response.data), {'name', 'average_rating'})
+        menu_content.assert_not_called()
+
+    def test_expand_embeds_restaurant_on_menu_items(self):
+        response = self.client.get(f'/api/menu-items/{self.item.slug}/')
+        self.assertEqual(response.data['restaurant'], self.restaurant.pk)
+
+        response = self.client.get(
+            f'/api/menu-items/{self.item.slug}/?fields=name,restaurant.name&expand=restaurant'
+        )
+        self.assertEqual(response.data, {'name': 'Jollof Rice', 'restaurant': {'name': 'Jollof Palace'}})
+
+    def test_expanded_owner_is_public_summary(self):
+        self.vendor.first_name, self.vendor.last_name = 'Ama', 'Mensah'
+        self.vendor.save()
+        self.vendor.profile.allergens = ['peanuts']
+        self.vendor.profile.save()
+        for url in ('/api/restaurants/?expand=owner', '/api/restaurants/?fields=name,owner&expand=owner'):
+            owner = self.client.get(url).data['results'][0]['owner']
+            self.assertEqual(
+                set(owner), {'id', 'username', 'display_name', 'profile_picture', 'profile_picture_srcset'},
+            )
+            self.assertEqual(owner['display_name'], 'Ama Mensah')
+
+    def test_writes_ignore_fields(self):
+        self.client.force_authenticate(self.vendor)
+        response = self.client.patch(
+            f'/api/restaurants/{self.restaurant.slug}/?fields=name', {'description': 'New'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['description'], 'New')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FastPathSerializerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.vendor = make_user('vendor', user_type='vendor')
+        self.owned = make_restaurant('Jollof Palace', owner=self.vendor, image='restaurants/palace.jpg', rating='4.50')
+        self.unowned = make_restaurant('Sushi Bar', cuisine_type='Japanese', features=['wifi'])
+        category = MenuCategory.objects.create(restaurant=self.owned, name='Mains')
+        make_menu_item(self.owned, category, 'Spaghetti', image='menu_items/spaghetti.jpg')
+        make_menu_item(self.owned, category, 'Buddha Bowl', allergens=['nuts'])
+
+    def serialized(self, serializer_class, queryset, path):
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+        request = Request(APIRequestFactory().get(path))
+        request.user = self.vendor
+        return serializer_class(queryset, many=True, context={'request': request}).data
+
+    def test_restaurant_list_matches_model_serializer(self):
+        from .serializers import RestaurantListSerializer
+        self.client.force_authenticate(self.vendor)
+        response = self.client.get('/api/restaurants/')
+        expected = self.serialized(
+            RestaurantListSerializer, Restaurant.objects.order_by('-rating', 'name'), '/api/restaurants/'
+        )
+        self.assertEqual(response.json()['results'], json.loads(json.dumps(expected, default=str)))
+        self.assertTrue(response.data['results'][0]['is_owner'])
+        self.assertIsNone(response.data['results'][1]['owner_name'])
+
+    def test_menu_item_list_matches_model_serializer(self):
+        from .serializers import MenuItemSerializer
+        response = self.client.get('/api/menu-items/')
+        expected = self.serialized(MenuItemSerializer, MenuItem.objects.order_by('id'), '/api/menu-items/')
+        self.assertEqual(response.json()['results'], json.loads(json.dumps(expected, default=str)))
+
+    def test_list_is_one_query_of_rows(self):
+        # COUNT plus one SELECT joining the restaurant name: no per-row lookups
+        with self.assertNumQueries(2):
+            self.client.get('/api/menu-items/')
+
+    def test_retrieve_checks_object_permissions_on_the_instance(self):
+        from .views import IsRestaurantOwnerOrAdminOrReadOnly
+        item = MenuItem.objects.get(name='Spaghetti')
+        self.client.force_authenticate(self.vendor)
+        with mock.patch.object(IsRestaurantOwnerOrAdminOrReadOnly, 'has_object_permission', return_value=False) as check:
+            response = self.client.get(f'/api/menu-items/{item.slug}/')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(check.call_args.args[2], item)
+        response = self.client.get(f'/api/menu-items/{item.slug}/')
+        self.assertEqual(response.data['name'], 'Spaghetti')
+
+    def test_uncompilable_serializers_fall_back(self):
+        from therestaurant.fastpath import compile_serializer
+        from .serializers import RestaurantDetailSerializer, RestaurantListSerializer
+        self.assertIsNone(compile_serializer(RestaurantDetailSerializer()))
+        self.assertIsNotNone(compile_serializer(RestaurantListSerializer()))
+        response = self.client.get(f'/api/restaurants/{self.owned.slug}/')
+        self.assertEqual(response.data['categories'][0]['name'], 'Mains')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ORJSONTests(TestCase):
+    def render_both(self, data):
+        from rest_framework.renderers import JSONRenderer
+        from therestaurant.renderers import ORJSONRenderer
+        return JSONRenderer().render(data), ORJSONRenderer().render(data)
+
+    def test_output_matches_json_renderer(self):
+        from django.utils.translation import gettext_lazy
+        data = {
+            'price': Decimal('25.50'),
+            'created_at': datetime.datetime(2026, 10, 17, 12, 30, 5, 120000, tzinfo=datetime.timezone.utc),
+            'label': gettext_lazy('Menu'),
+            'notes': 'Jollof   waakye   kenkey',
+            'tags': ('rice', 'spicy'),
+            1: None,
+        }
+        stdlib, fast = self.render_both(data)
+        self.assertEqual(fast, stdlib)
+        self.assertIn(b'"2026-10-17T12:30:05.120000Z"', fast)
+
+    def test_menu_snapshot_matches_json_renderer(self):
+        from rest_framework.renderers import JSONRenderer
+        from .snapshots import render_menu
+        restaurant = make_restaurant('Buka')
+        make_menu_item(restaurant, MenuCategory.objects.create(restaurant=restaurant, name='Mains'), 'Jollof')
+        content = render_menu(restaurant.pk)
+        self.assertEqual(content, JSONRenderer().render(json.loads(content)))
+
+    def test_falls_back_without_orjson(self):
+        from therestaurant.renderers import ORJSONRenderer
+        with mock.patch('therestaurant.renderers.orjson', None):
+            self.assertEqual(ORJSONRenderer().render({'price': Decimal('1.50')}), b'{"price":1.5}')
+
+    def test_parses_json_bodies(self):
+        vendor = make_user('vendor', user_type='vendor')
+        self.client = APIClient()
+        self.client.force_authenticate(vendor)
+        payload = {
+            'name': 'Chop Bar', 'description': 'Local dishes', 'cuisine_type': 'Ghanaian',
+            'address': 'Kumasi', 'phone_number': '0240000000', 'email': 'chop@example.com', 'price_range': '$',
+        }
+        response = self.client.post('/api/restaurants/', payload, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data['name'], 'Chop Bar')
+
+        response = self.client.post('/api/restaurants/', '{"name": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.data['detail'].startswith('JSON parse error'))
+
+
+class SlugAllocationTests(TestCase):
+    def setUp(self):
+        self.restaurant = make_restaurant('Chop Bar')
+        self.category = MenuCategory.objects.create(restaurant=self.restaurant, name='Mains')
+
+    def test_repeated_names_take_the_lowest_free_suffix(self):
+        slugs = [make_menu_item(self.restaurant, self.category, 'Jollof Rice').slug for _ in range(3)]
+        self.assertEqual(slugs, ['chop-bar-jollof-rice', 'chop-bar-jollof-rice-2', 'chop-bar-jollof-rice-3'])
+        make_menu_item(self.restaurant, self.category, 'Jollof Rice Special')
+        MenuItem.objects.filter(slug='chop-bar-jollof-rice-2').delete()
+        self.assertEqual(make_menu_item(self.restaurant, self.category, 'Jollof Rice').slug, 'chop-bar-jollof-rice-2')
+        self.assertEqual(make_restaurant('Chop Bar').slug, 'chop-bar-2')
+
+    def test_one_prefix_query_per_save(self):
+        for _ in range(5):
+            make_menu_item(self.restaurant, self.category, 'Jollof Rice')
+        with CaptureQueriesContext(connection) as queries:
+            item = make_menu_item(self.restaurant, self.category, 'Jollof Rice')
+        self.assertEqual(item.slug, 'chop-bar-jollof-rice-6')
+        self.assertEqual(len([q for q in queries if '"slug"' in q['sql'] and 'LIKE' in q['sql']]), 1)
+
+    def test_taken_slugs_only_reads_candidates(self):
+        from .slugs import SLUG_BASE_LENGTH, taken_slugs
+        make_restaurant('C')
+        make_restaurant('C')
+        self.assertEqual(taken_slugs(Restaurant, ['c']), {'c', 'c-2'})
+
+        long_name = 'jollof ' * 40
+        slugs = [make_restaurant(long_name).slug for _ in range(3)]
+        self.assertEqual([len(slug) for slug in slugs], [SLUG_BASE_LENGTH] * 3)
+        self.assertEqual(len(set(slugs)), 3)
+        self.assertTrue(slugs[2].endswith('-3'))
+
+    def test_retries_after_a_concurrent_save_takes_the_slug(self):
+        from . import slugs
+        make_menu_item(self.restaurant, self.category, 'Jollof Rice')
+        # The first allocation misses the existing row, as a concurrent save would
+        with mock.patch.object(slugs, 'taken_slugs', side_effect=[set(), {'chop-bar-jollof-rice'}]):
+            item = make_menu_item(self.restaurant, self.category, 'Jollof Rice')
+        self.assertEqual(item.slug, 'chop-bar-jollof-rice-2')
+        self.assertEqual(MenuItem.objects.filter(name='Jollof Rice').count(), 2)
+
+    def test_assign_slugs_before_bulk_create(self):
+        make_menu_item(self.restaurant, self.category, 'Jollof Rice')
+        items = [
+            MenuItem(restaurant=self.restaurant, category=self.category, name=name, description='', price='10.00')
+            for name in ['Jollof Rice'] * 50 + ['Waakye']
+        ]
+        with self.assertNumQueries(1):
+            MenuItem.assign_slugs(items)
+        MenuItem.objects.bulk_create(items)
+        self.assertEqual(items[0].slug, 'chop-bar-jollof-rice-2')
+        self.assertEqual(items[49].slug, 'chop-bar-jollof-rice-51')
+        self.assertEqual(items[50].slug, 'chop-bar-waakye')
+        self.assertEqual(MenuItem.objects.values('slug').distinct().count(), 52)
+
+    def test_audit_slugs_runs(self):
+        out = StringIO()
+        call_command('audit_slugs', stdout=out)
+        self.assertIn('No duplicate MenuItem slugs.', out.getvalue())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class MenuImportTests(TestCase):
+    CSV = (
+        'category,meal_period,name,description,price,ingredients,allergens,is_vegetarian,spice_level\n'
+        'Mains,lunch,Jollof Rice,Smoky,25.00,rice;tomato;pepper,,false,2\n'
+        'Mains,lunch,Jollof Rice,Party size,40.00,rice;tomato,,,\n'
+        'Sides,,Kelewele,"Spiced, fried plantain",10.50,plantain;ginger,,true,1\n'
+    )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.vendor = make_user('vendor', user_type='vendor')
+        self.restaurant = make_restaurant('Chop Bar', owner=self.vendor)
+        MenuCategory.objects.create(restaurant=self.restaurant, name='Mains', display_order=3)
+        self.url = f'/api/restaurants/{self.restaurant.slug}/menu/import/'
+        self.client.force_authenticate(self.vendor)
+
+    def post_csv(self, content, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url + kwargs.pop('query', ''), content, content_type='text/csv')
+
+    def test_csv_import(self):
+        response = self.post_csv(self.CSV)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.data, {'rows': 3, 'created': {'categories': 1, 'items': 3}, 'errors': []})
+
+        items = {item.slug: item for item in MenuItem.objects.filter(restaurant=self.restaurant)}
+        self.assertEqual(sorted(items), ['chop-bar-jollof-rice', 'chop-bar-jollof-rice-2', 'chop-bar-kelewele'])
+        kelewele = items['chop-bar-kelewele']
+        self.assertEqual(kelewele.ingredients, ['plantain', 'ginger'])
+        self.assertEqual(kelewele.price, Decimal('10.50'))
+        self.assertTrue(kelewele.is_vegetarian)
+        self.assertEqual(kelewele.description, 'Spiced, fried plantain')
+        self.assertEqual((kelewele.category.name, kelewele.category.display_order), ('Sides', 4))
+        self.assertEqual(items['chop-bar-jollof-rice'].category.meal_period, 'all_day')  # existing category kept
+
+        self.restaurant.refresh_from_db()
+        self.assertEqual((self.restaurant.categories_count, self.restaurant.menu_items_count), (2, 3))
+        self.assertEqual(self.restaurant.menu_version, 2)
+        menu = self.client.get(f'/api/restaurants/{self.restaurant.slug}/menu/').json()
+        self.assertEqual(sum(len(category['items']) for category in menu), 3)
+
+    def test_nested_json_import(self):
+        payload = {'categories': [
+            {'name': 'Soups', 'meal_period': 'dinner', 'items': [
+                {'name': 'Light Soup', 'price': '30.00', 'allergens': ['fish'], 'is_available': False},
+                {'name': 'Groundnut Soup', 'price': '32.00', 'nutritional_info': {'calories': 540}},
+            ]},
+        ]}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        soup = MenuItem.objects.get(name='Light Soup')
+        self.assertEqual((soup.category.name, soup.category.meal_period, soup.allergens), ('Soups', 'dinner', ['fish']))
+        self.restaurant.refresh_from_db()
+        self.assertEqual(self.restaurant.menu_items_count, 1)
+
+    def test_invalid_rows_are_reported_and_nothing_is_written(self):
+        content = self.CSV + 'Sides,,Waakye,,free,,,,\nSides,brunch,,,5.00,,,,9\n'
+        response = self.post_csv(content)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['row'] for error in response.data['errors']], [4, 5])
+        self.assertIn('price', response.data['errors'][0]['errors'])
+        self.assertEqual(set(response.data['errors'][1]['errors']), {'name', 'spice_level'})
+        self.assertFalse(MenuItem.objects.exists())
+        self.assertEqual(self.restaurant.categories.count(), 1)
+
+    def test_file_upload_and_dry_run(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        upload = SimpleUploadedFile('menu.csv', self.CSV.encode(), content_type='text/csv')
+        response = self.client.post(self.url + '?dry_run=1', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['created'], {'categories': 1, 'items': 3})
+        self.assertFalse(MenuItem.objects.exists())
+
+    def test_only_owners_can_import(self):
+        self.client.force_authenticate(make_user('other', user_type='vendor'))
+        self.assertEqual(self.post_csv(self.CSV).status_code, 403)
+        self.assertFalse(MenuItem.objects.exists())
+
+    def test_queries_do_not_grow_with_rows(self):
+        rows = ''.join(f'Mains,,Dish {i},,{i}.00,,,,\n' for i in range(300))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_csv('category,meal_period,name,description,price,ingredients,allergens,is_vegan,prep_time\n' + rows)
+        self.assertEqual(response.status_code, 201, response.content)
+        # Batched slug lookups and inserts plus the snapshot rebuild; nothing per row
+        self.assertLess(len(queries), 30)
+        self.assertEqual(MenuItem.objects.filter(restaurant=self.restaurant).count(), 300)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class MenuItemBulkUpdateTests(TestCase):
+    url = '/api/menu-items/bulk/'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.vendor = make_user('vendor', user_type='vendor')
+        self.restaurant = make_restaurant('Chop Bar', owner=self.vendor)
+        self.mains = MenuCategory.objects.create(restaurant=self.restaurant, name='Mains')
+        self.specials = MenuCategory.objects.create(restaurant=self.restaurant, name='Specials')
+        self.items = [make_menu_item(self.restaurant, self.mains, f'Dish {i}') for i in range(5)]
+        self.other = make_restaurant('Elsewhere', owner=make_user('rival', user_type='vendor'))
+        self.other_item = make_menu_item(self.other, MenuCategory.objects.create(restaurant=self.other, name='Mains'), 'Fufu')
+        self.client.force_authenticate(self.vendor)
+
+    def patch(self, changes):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.patch(self.url, changes, format='json')
+
+    def test_applies_changes_in_one_update(self):
+        version = Restaurant.objects.get(pk=self.restaurant.pk).menu_version
+        changes = [
+            {'id': self.items[0].pk, 'is_available': False},
+            {'id': self.items[1].pk, 'price': '12.50', 'category': self.specials.pk},
+            {'id': self.items[2].pk, 'is_available': False, 'price': '9.00'},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.patch({'items': changes})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.data['updated'], 3)
+        self.assertEqual(response.data['items'][1]['price'], '12.50')
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE "restaurants_menuitem"')]), 1)
+
+        first, second, third = MenuItem.objects.filter(pk__in=[i.pk for i in self.items[:3]]).order_by('pk')
+        self.assertFalse(first.is_available)
+        self.assertEqual((second.price, second.category_id), (Decimal('12.50'), self.specials.pk))
+        self.assertGreater(second.updated_at, self.items[1].updated_at)
+        self.assertEqual((third.is_available, third.price), (False, Decimal('9.00')))
+
+        restaurant = Restaurant.objects.get(pk=self.restaurant.pk)
+        self.assertEqual(restaurant.menu_items_count, 3)
+        self.assertEqual(restaurant.menu_version, version + 1)
+        menu = self.client.get(f'/api/restaurants/{self.restaurant.slug}/menu/').json()
+        self.assertEqual([c['items_count'] for c in menu], [2, 1])
+
+    def test_other_restaurants_items_are_forbidden(self):
+        response = self.patch([
+            {'id': self.items[0].pk, 'is_available': False},
+            {'id': self.other_item.pk, 'is_available': False},
+        ])
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(MenuItem.objects.get(pk=self.items[0].pk).is_available)
+
+    def test_admins_may_update_any_restaurant(self):
+        self.client.force_authenticate(make_user('admin', user_type='platform_admin'))
+        response = self.patch([{'id': self.other_item.pk, 'price': '30.00'}])
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_invalid_entries_are_reported_and_nothing_changes(self):
+        other_category = self.other.categories.get()
+        response = self.patch([
+            {'id': self.items[0].pk, 'is_available': False},
+            {'id': self.items[1].pk, 'category': other_category.pk},
+            {'id': 999999, 'price': '1.00'},
+            {'id': self.items[0].pk, 'price': '2.00'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [(error['row'], list(error['errors'])) for error in response.data['errors']],
+            [(2, ['category']), (3, ['id']), (4, ['id'])],
+        )
+        self.assertTrue(MenuItem.objects.get(pk=self.items[0].pk).is_available)
+
+        response = self.patch([{'id': self.items[0].pk}, {'id': self.items[1].pk, 'price': '-1'}])
+        self.assertEqual([error['row'] for error in response.data['errors']], [1, 2])
+        self.assertEqual(self.patch([]).status_code, 400)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class MealPeriodTests(TestCase):
+    url = '/api/menu-items/meal-periods/'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.restaurant = make_restaurant('Chop Bar', latitude=5.6037, longitude=-0.1870)
+        self.far = make_restaurant('Far Away', latitude=6.6885, longitude=-1.6244)
+        for restaurant in (self.restaurant, self.far):
+            for period in ('breakfast', 'lunch', 'all_day'):
+                category = MenuCategory.objects.create(restaurant=restaurant, name=period, meal_period=period)
+                for i in range(3):
+                    make_menu_item(restaurant, category, f'{period} {i}')
+        MenuItem.objects.filter(name='lunch 0').update(is_available=False)
+
+    def periods(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return {entry['period']: entry for entry in response.data}
+
+    def test_one_query_and_limit_per_period(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'limit': 2})
+        periods = self.periods(response)
+        self.assertEqual(list(periods), ['breakfast', 'lunch', 'all_day'])
+        self.assertEqual([len(entry['items']) for entry in periods.values()], [2, 2, 2])
+        self.assertEqual(periods['breakfast']['items'][0]['name'], 'breakfast 0')
+        self.assertEqual(periods['breakfast']['items'][0]['restaurant_name'], 'Chop Bar')
+        self.assertEqual(periods['breakfast']['emoji'], '🌅')
+
+        cache.clear()
+        with mock.patch('restaurants.views.compile_serializer', return_value=None):
+            fallback = self.client.get(self.url, {'limit': 2})
+        self.assertEqual(fallback.json(), response.json())
+
+    def test_next_link_pages_through_one_period(self):
+        entry = self.periods(self.client.get(self.url, {'limit': 4}))['lunch']
+        self.assertEqual([item['name'] for item in entry['items']], ['lunch 1', 'lunch 2', 'lunch 1', 'lunch 2'])
+        self.assertIsNone(entry['next'])
+
+        entry = self.periods(self.client.get(self.url, {'limit': 4}))['breakfast']
+        self.assertIn('period=breakfast', entry['next'])
+        rest = self.periods(self.client.get(entry['next']))
+        self.assertEqual(list(rest), ['breakfast'])
+        self.assertEqual([item['name'] for item in rest['breakfast']['items']], ['breakfast 1', 'breakfast 2'])
+        self.assertIsNone(rest['breakfast']['next'])
+
+    def test_restaurant_and_location_scoping(self):
+        scoped = self.periods(self.client.get(self.url, {'restaurant': self.far.pk}))
+        self.assertEqual({item['restaurant'] for item in scoped['all_day']['items']}, {self.far.pk})
+        nearby = self.periods(self.client.get(self.url, {'lat': 5.60, 'lng': -0.19, 'radius': 5}))
+        self.assertEqual({item['restaurant'] for item in nearby['all_day']['items']}, {self.restaurant.pk})
+        self.assertEqual(self.client.get(self.url, {'lat': 5.60}).status_code, 400)
+
+    def test_now_keeps_the_periods_being_served(self):
+        self.assertEqual(list(self.periods(self.client.get(self.url, {'now': '08:15'}))), ['breakfast', 'all_day'])
+        self.assertEqual(list(self.periods(self.client.get(self.url, {'now': '2026-10-17T12:00:00+00:00'}))), ['lunch', 'all_day'])
+        self.assertEqual(list(self.periods(self.client.get(self.url, {'now': '23:30'}))), ['all_day'])
+        self.assertEqual(self.client.get(self.url, {'now': 'teatime'}).status_code, 400)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class AllergenFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        restaurant = make_restaurant('Chop Bar')
+        category = MenuCategory.objects.create(restaurant=restaurant, name='Mains')
+        self.satay = make_menu_item(
+            restaurant, category, 'Chicken Satay', allergens=['Peanuts', 'sesame'],
+            ingredients=[{'name': 'Chicken', 'quantity': 200, 'unit': 'g'}, 'peanut_sauce'],
+        )
+        self.waakye = make_menu_item(restaurant, category, 'Waakye', allergens=[], ingredients=['rice', 'beans'])
+        self.kenkey = make_menu_item(restaurant, category, 'Kenkey and Fish', allergens=['fish'], ingredients=['corn', 'fish'])
+
+    def names(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return sorted(item['name'] for item in response.data['results'])
+
+    def test_terms_follow_the_json_lists(self):
+        from .models import MenuItemTerm
+        self.assertEqual(
+            set(self.satay.terms.values_list('kind', 'name')),
+            {
+                ('allergen', 'peanuts'), ('allergen', 'sesame'), ('ingredient', 'chicken'), ('ingredient', 'peanut sauce'),
+                ('word', 'chicken'), ('word', 'peanut'), ('word', 'sauce'),
+            },
+        )
+        self.satay.allergens = ['sesame']
+        self.satay.save()
+        self.assertEqual(list(self.satay.terms.filter(kind=MenuItemTerm.ALLERGEN).values_list('name', flat=True)), ['sesame'])
+        # Unchanged lists are not rewritten
+        with CaptureQueriesContext(connection) as queries:
+            MenuItem.objects.get(pk=self.waakye.pk).save()
+        self.assertFalse([q for q in queries if 'restaurants_menuitemterm' in q['sql']])
+
+    def test_exclusion_and_inclusion_filters(self):
+        self.assertEqual(
+            self.names(self.client.get('/api/menu-items/', {'exclude_allergens': 'peanuts, milk,Sesame'})),
+            ['Kenkey and Fish', 'Waakye'],
+        )
+        self.assertEqual(self.names(self.client.get('/api/menu-items/', {'exclude_ingredients': 'fish'})), ['Chicken Satay', 'Waakye'])
+        self.assertEqual(self.names(self.client.get('/api/menu-items/', {'ingredients': 'rice,beans'})), ['Waakye'])
+        self.assertEqual(self.names(self.client.get('/api/menu-items/', {'ingredients': 'rice,fish'})), [])
+
+    def test_profile_allergens(self):
+        user = make_user('diner')
+        user.profile.allergens = ['Fish', 'peanuts']
+        user.profile.save()
+        self.client.force_authenticate(user)
+        self.assertEqual(self.names(self.client.get('/api/menu-items/', {'avoid_my_allergens': 'true'})), ['Waakye'])
+
+    def test_dietary_filters_are_paginated(self):
+        response = self.client.get('/api/menu-items/dietary_filters/', {'exclude_allergens': 'fish'})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(self.names(response), ['Chicken Satay', 'Waakye'])
+        response = self.client.get('/api/menu-items/dietary_filters/', {'cursor': '', 'gluten_free': 'true'})
+        self.assertEqual(response.data['results'], [])
+        self.assertEqual(self.client.get('/api/menu-items/dietary_filters/', {'max_spice_level': 'hot'}).status_code, 400)
+
+    def test_imported_items_are_indexed(self):
+        from .menu_import import import_menu
+        import_menu(self.satay.restaurant, [
+            {'category': 'Sides', 'name': 'Groundnut Soup', 'price': '20.00', 'allergens': ['peanuts']},
+        ])
+        self.assertEqual(
+            self.names(self.client.get('/api/menu-items/', {'exclude_allergens': 'peanuts'})),
+            ['Kenkey and Fish', 'Waakye'],
+        )
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class IngredientSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        restaurant = make_restaurant('Chop Bar')
+        category = MenuCategory.objects.create(restaurant=restaurant, name='Mains')
+        make_menu_item(restaurant, category, 'Tomato Soup', description='Slow cooked', ingredients=['onion'])
+        make_menu_item(
+            restaurant, category, 'Jollof Rice', description='Party rice',
+            ingredients=[{'name': 'Cherry Tomatoes', 'quantity': 200, 'unit': 'g', 'notes': 'roasted'}, 'rice'],
+        )
+        make_menu_item(restaurant, category, 'Red Red', description='Beans in tomato stew', ingredients=['beans'])
+
+    def names(self, params):
+        response = self.client.get('/api/menu-items/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [item['name'] for item in response.data['results']]
+
+    def test_ingredient_filter_matches_words_of_indexed_names(self):
+        self.assertEqual(self.names({'ingredient': 'tomato'}), ['Jollof Rice'])
+        self.assertEqual(self.names({'ingredient': 'Rice, cherry'}), ['Jollof Rice'])
+        self.assertEqual(self.names({'ingredient': 'rice,onion'}), [])
+        # Units and notes are not ingredients
+        self.assertEqual(self.names({'ingredient': 'roasted'}), [])
+
+    def test_ingredient_filter_is_a_prefix_lookup_on_word_rows(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.names({'ingredient': 'cherry tom'})
+        self.assertNotIn("'%", queries.captured_queries[-1]['sql'])
+        item = MenuItem.objects.get(name='Red Red')
+        item.ingredients = ['beans', 'Plum Tomatoes']
+        item.save()
+        self.assertEqual(self.names({'ingredient': 'tomato'}), ['Jollof Rice', 'Red Red'])
+
+    def test_search_ranks_name_then_ingredient_then_description(self):
+        self.assertEqual(self.names({'search': 'tomato'}), ['Tomato Soup', 'Jollof Rice', 'Red Red'])
+        self.assertEqual(self.names({'search': 'tomato rice'}), ['Jollof Rice'])
+        self.assertEqual(self.names({'search': 'roasted'}), [])
+
+
+def image_bytes(width, height, image_format='JPEG', mode='RGB'):
+    from PIL import Image
+    output = io.BytesIO()
+    Image.new(mode, (width, height), (200, 80, 40, 128)[:len(mode)]).save(output, image_format)
+    return output.getvalue()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.client = APIClient()
+        self.restaurant = make_restaurant('Buka')
+        self.category = MenuCategory.objects.create(restaurant=self.restaurant, name='Mains')
+
+    def open_derivative(self, source, width, image_format):
+        from PIL import Image
+        from django.core.files.storage import default_storage
+        from therestaurant.images import derivative_name
+        with default_storage.open(derivative_name(source, width, image_format)) as image_file:
+            image = Image.open(image_file)
+            image.load()
+            return image
+
+    def test_upload_builds_derivatives_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurant.image.save('front.jpg', ContentFile(image_bytes(2000, 1000)))
+        self.restaurant.refresh_from_db()
+        source = self.restaurant.image.name
+        self.assertEqual(self.restaurant.image_variants, {'source': source, 'widths': [160, 320, 640, 1280]})
+        webp = self.open_derivative(source, 640, 'webp')
+        self.assertEqual((webp.format, webp.size), ('WEBP', (640, 320)))
+        self.assertEqual(self.open_derivative(source, 1280, 'jpeg').format, 'JPEG')
+
+        srcset = self.client.get(f'/api/restaurants/{self.restaurant.slug}/').data['image_srcset']
+        self.assertEqual(srcset['webp'].count('w, '), 3)
+        self.assertIn(f'/media/derivatives/{source.rsplit(".", 1)[0]}/640w.webp 640w', srcset['webp'])
+        self.assertTrue(srcset['jpeg'].endswith('1280w.jpg 1280w'))
+
+        # Saves that leave the image alone do not rebuild it
+        with mock.patch('therestaurant.images.schedule_build') as schedule_build:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.restaurant.description = 'Jollof and more'
+                self.restaurant.save()
+        schedule_build.assert_not_called()
+
+    def test_small_transparent_images_are_not_upscaled(self):
+        item = make_menu_item(self.restaurant, self.category, 'Suya')
+        with self.captureOnCommitCallbacks(execute=True):
+            item.image.save('suya.png', ContentFile(image_bytes(300, 200, 'PNG', 'RGBA')))
+        item.refresh_from_db()
+        self.assertEqual(item.image_variants['widths'], [160])
+        self.assertEqual(self.open_derivative(item.image.name, 160, 'webp').mode, 'RGBA')
+        self.assertEqual(self.open_derivative(item.image.name, 160, 'jpeg').mode, 'RGB')
+
+        result = self.client.get('/api/menu-items/').data['results'][0]
+        self.assertTrue(result['image_srcset']['webp'].endswith('160w.webp 160w'))
+
+    def test_stale_variants_are_not_served(self):
+        from therestaurant.images import srcset
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.image.save('mains.jpg', ContentFile(image_bytes(800, 600)))
+        self.category.refresh_from_db()
+        self.assertIsNotNone(srcset(None, self.category.image, self.category.image_variants))
+        MenuCategory.objects.filter(pk=self.category.pk).update(image='menu_categories/other.jpg')
+        self.category.refresh_from_db()
+        self.assertIsNone(srcset(None, self.category.image, self.category.image_variants))
+
+    def test_backfill_command(self):
+        from django.core.files.storage import default_storage
+        user = make_user('ama')
+        item = make_menu_item(self.restaurant, self.category, 'Kelewele')
+        item_image = default_storage.save('menu_items/kelewele.jpg', ContentFile(image_bytes(700, 700)))
+        picture = default_storage.save('profiles/ama.jpg', ContentFile(image_bytes(400, 400)))
+        MenuItem.objects.filter(pk=item.pk).update(image=item_image)
+        User.objects.filter(pk=user.pk).update(profile_picture=picture)
+
+        out = StringIO()
+        call_command('build_image_derivatives', workers=1, stdout=out)
+        self.assertIn('Built derivatives of 2 images', out.getvalue())
+        item.refresh_from_db()
+        user.refresh_from_db()
+        self.assertEqual(item.image_variants['widths'], [160, 320, 640])
+        self.assertEqual(user.profile_picture_variants, {'source': picture, 'widths': [160, 320]})
+
+        out = StringIO()
+        call_command('build_image_derivatives', workers=1, stdout=out)
+        self.assertIn('Built derivatives of 0 images', out.getvalue())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ForYouRankingTests(TestCase):
+    def setUp(self):
+        from .personalize import restaurant_vectors
+        self.vectors = restaurant_vectors
+        self.vectors.clear()
+        cache.clear()
+        self.client = APIClient()
+        self.user = make_user('ama')
+        self.client.force_authenticate(self.user)
+
+        self.chop_bar = make_restaurant('Chop Bar', cuisine_type='Ghanaian', rating=Decimal('4.0'))
+        self.trattoria = make_restaurant('Trattoria', cuisine_type='Italian', rating=Decimal('4.5'), price_range='$$$')
+        self.greens = make_restaurant('Green Bowl', cuisine_type='Vegan', rating=Decimal('3.5'))
+        for restaurant, items in (
+            (self.chop_bar, [('Waakye', {}), ('Groundnut Soup', {'allergens': ['Peanuts']})]),
+            (self.trattoria, [('Margherita', {'is_vegetarian': True}), ('Carbonara', {})]),
+            (self.greens, [('Buddha Bowl', {'is_vegetarian': True, 'is_vegan': True, 'is_gluten_free': True})]),
+        ):
+            category = MenuCategory.objects.create(restaurant=restaurant, name='Mains')
+            for name, fields in items:
+                make_menu_item(restaurant, category, name, **fields)
+
+    def ranked(self, **params):
+        response = self.client.get('/api/restaurants/for-you/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['name'] for row in response.data['results']]
+
+    def order_from(self, restaurant, count=1):
+        from orders.models import Order
+        for _ in range(count):
+            Order.objects.create(
+                user=self.user, restaurant=restaurant, order_number=f'ORD-{Order.objects.count() + 1}',
+                total_amount='30.00', delivery_address='Accra', status='delivered',
+            )
+
+    def test_without_preferences_ranks_by_rating(self):
+        self.assertEqual(self.ranked(), ['Trattoria', 'Chop Bar', 'Green Bowl'])
+        self.client.force_authenticate(None)
+        self.assertEqual(self.ranked(limit=2), ['Trattoria', 'Chop Bar'])
+        self.assertEqual(self.client.get('/api/restaurants/for-you/', {'limit': 'x'}).status_code, 400)
+
+    def test_profile_and_dietary_preferences(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.profile.favorite_cuisines = ['ghanaian']
+            self.user.profile.save()
+        self.assertEqual(self.ranked()[0], 'Chop Bar')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.profile.allergens = ['peanuts']
+            self.user.profile.save()
+            self.user.dietary_preferences = ['Gluten-Free', 'vegan']
+            self.user.save()
+        self.assertEqual(self.ranked(), ['Green Bowl', 'Trattoria', 'Chop Bar'])
+
+    def test_order_history_boosts_cuisine_and_restaurant(self):
+        self.assertEqual(self.ranked()[0], 'Trattoria')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order_from(self.greens, count=3)
+        response = self.client.get('/api/restaurants/for-you/')
+        self.assertEqual(response.data['results'][0]['name'], 'Green Bowl')
+        self.assertGreater(response.data['results'][0]['score'], response.data['results'][1]['score'])
+
+    def test_works_without_the_cache(self):
+        broken = mock.Mock(side_effect=ConnectionError('cache down'))
+        with mock.patch.multiple('restaurants.personalize.cache', get=broken, set=broken, delete=broken):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.user.profile.favorite_cuisines = ['ghanaian']
+                self.user.profile.save()
+            with self.assertLogs('restaurants.personalize', 'ERROR'):
+                self.assertEqual(self.ranked()[0], 'Chop Bar')
+
+    def test_vectors_refresh_incrementally(self):
+        self.ranked()
+        with mock.patch.object(self.vectors, 'build', wraps=self.vectors.build) as build:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.trattoria.rating = Decimal('2.0')
+                self.trattoria.save()
+                make_restaurant('Waakye Joint', cuisine_type='Ghanaian', rating=Decimal('5.0'))
+            self.assertEqual(self.ranked(), ['Waakye Joint', 'Chop Bar', 'Green Bowl', 'Trattoria'])
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.chop_bar.is_active = False
+                self.chop_bar.save()
+            self.assertNotIn('Chop Bar', self.ranked())
+
+            # Written by another process: found by the watermark sync
+            from django.utils import timezone
+            MenuItem.objects.filter(restaurant=self.greens).update(is_vegetarian=False, updated_at=timezone.now())
+            self.vectors.synced_at = 0
+            self.ranked()
+            self.assertEqual(self.vectors.matrix[self.vectors.positions[self.greens.pk], self.vectors.dietary_columns['vegetarian']], 0)
+            build.assert_not_called()
+
+            # A new cuisine widens the matrix
+            with self.captureOnCommitCallbacks(execute=True):
+                make_restaurant('Sushi Go', cuisine_type='Japanese', rating=Decimal('1.0'))
+            self.assertEqual(self.ranked()[-1], 'Sushi Go')
+            build.assert_called_once()
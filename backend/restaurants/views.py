@@ -1,13 +1,33 @@
 from rest_framework import viewsets, status, permissions, filters
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Avg
-from .models import Restaurant, MenuCategory, MenuItem, RestaurantReview
+from therestaurant.conditional import conditional_response
+from therestaurant.fastpath import FastReadMixin, compile_serializer
+from therestaurant.fieldsets import SparseFieldsetViewMixin
+from therestaurant.parsers import ORJSONParser
+from .models import Restaurant, MenuCategory, MenuItem, RestaurantReview, CuisineRollup
+from .cache import cache_catalog_response
+from .filters import RestaurantFilter, MenuItemFilter
+from .geo import nearest
+from . import personalize
+from .meal_periods import MEAL_PERIODS, active_periods, meal_period_items, parse_local_time
+from .menu_import import MenuCSVParser, MenuJSONLinesParser, import_menu, json_rows, uploaded_rows
+from .search import MenuItemSearchFilter, RankedSearchFilter, search_restaurants
+from .signals import menu_rows_bulk_saved
+from .snapshots import menu_content
+from .suggest import suggestion_index, DEFAULT_LIMIT, MAX_LIMIT
 from .serializers import (
     RestaurantListSerializer, RestaurantDetailSerializer,
     MenuCategorySerializer, MenuItemSerializer, RestaurantReviewSerializer,
-    RestaurantSearchSerializer, RestaurantCreateSerializer
+    RestaurantSearchSerializer, RestaurantCreateSerializer, RestaurantNearbySerializer,
+    MenuItemBulkUpdateSerializer,
 )
 
 class IsOwnerOrAdminOrReadOnly(permissions.BasePermission):
@@ -42,18 +62,27 @@ class IsOwnerOrAdminOrReadOnly(permissions.BasePermission):
         # Allow owners to edit their own restaurants
         return obj.owner == request.user
 
-class RestaurantViewSet(viewsets.ModelViewSet):
+def restaurant_content_state(request, slug=None, **kwargs):
+    return Restaurant.content_state(slug)
+
+class RestaurantViewSet(FastReadMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Restaurant.objects.filter(is_active=True)
     lookup_field = 'slug'
     permission_classes = [IsOwnerOrAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['cuisine_type', 'price_range']
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, RankedSearchFilter]
+    filterset_class = RestaurantFilter
     search_fields = ['name', 'description', 'cuisine_type', 'address']
     ordering_fields = ['name', 'rating', 'created_at']
     ordering = ['-rating', 'name']
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ['list', 'search', 'nearby']:
+            queryset = queryset.with_listing_stats()
+        return queryset
+
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ['list', 'nearby']:
             return RestaurantListSerializer
         elif self.action in ['create', 'update', 'partial_update']:
             return RestaurantCreateSerializer
@@ -61,6 +90,15 @@ class RestaurantViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
+
+    @cache_catalog_response(uncached_params=['open_now'])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_response(restaurant_content_state)
+    @cache_catalog_response(per_restaurant=True)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
     
     @action(detail=False, methods=['get'], url_path='my-restaurants')
     def my_restaurants(self, request):
@@ -68,7 +106,7 @@ class RestaurantViewSet(viewsets.ModelViewSet):
         if not request.user.is_authenticated:
             return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
         
-        restaurants = Restaurant.objects.filter(owner=request.user)
+        restaurants = Restaurant.objects.filter(owner=request.user).with_listing_stats()
         serializer = RestaurantListSerializer(restaurants, many=True, context={'request': request})
         return Response(serializer.data)
 
@@ -84,11 +122,7 @@ class RestaurantViewSet(viewsets.ModelViewSet):
 
         # Apply filters
         if search_data.get('query'):
-            queryset = queryset.filter(
-                Q(name__icontains=search_data['query']) |
-                Q(description__icontains=search_data['query']) |
-                Q(cuisine_type__icontains=search_data['query'])
-            )
+            queryset = search_restaurants(queryset, search_data['query'])
 
         if search_data.get('cuisine_type'):
             queryset = queryset.filter(cuisine_type__icontains=search_data['cuisine_type'])
@@ -100,81 +134,188 @@ class RestaurantViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(rating__gte=search_data['min_rating'])
 
         if search_data.get('features'):
-            for feature in search_data['features']:
-                queryset = queryset.filter(features__contains=[feature])
+            queryset = queryset.with_all_features(search_data['features'])
+
+        if search_data.get('open_at'):
+            queryset = queryset.open_at(search_data['open_at'])
+        elif search_data.get('open_now') is not None:
+            queryset = queryset.open_at() if search_data['open_now'] else queryset.closed_at()
 
-        # Apply ordering
+        # Apply ordering; ranked matches default to relevance
         if search_data.get('ordering'):
             queryset = queryset.order_by(search_data['ordering'])
+        elif 'search_rank' in queryset.query.extra_select:
+            queryset = queryset.order_by('-search_rank', '-rating', 'name')
 
         # Paginate results
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = RestaurantListSerializer(page, many=True)
+            serializer = RestaurantListSerializer(page, many=True, context={'request': request})
             return self.get_paginated_response(serializer.data)
 
-        serializer = RestaurantListSerializer(queryset, many=True)
+        serializer = RestaurantListSerializer(queryset, many=True, context={'request': request})
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """
+        Restaurants within ``radius`` km of ``lat``/``lng``, nearest first.
+
+        Composes with the list filters (``cuisine_type``, ``price_range``,
+        ``search``). ``?ordering=-distance`` lists farthest first; any other
+        ``?ordering`` keeps that order and only restricts to the radius.
+        """
+        params = RestaurantNearbySerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        lat, lng, radius = (params.validated_data[key] for key in ('lat', 'lng', 'radius'))
+
+        ordering = request.query_params.get(filters.OrderingFilter.ordering_param) or 'distance'
+        by_distance = ordering.lstrip('-') == 'distance'
+        queryset = self.filter_queryset(self.get_queryset())
+        matches = nearest(queryset, lat, lng, radius, order_by_distance=by_distance)
+        if ordering == '-distance':
+            matches.reverse()
+
+        page = self.paginate_queryset(matches)
+        rows = matches if page is None else page
+        restaurants = queryset.in_bulk([pk for pk, _ in rows])
+        data = self.get_serializer([restaurants[pk] for pk, _ in rows], many=True).data
+        for row, (_, distance) in zip(data, rows):
+            row['distance_km'] = round(distance, 3)
+
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
     @action(detail=True, methods=['get'])
-    def menu(self, request, pk=None):
+    @conditional_response(restaurant_content_state)
+    def menu(self, request, slug=None):
         """Get restaurant menu by categories"""
         restaurant = self.get_object()
+        if isinstance(request.accepted_renderer, JSONRenderer):
+            # Pre-rendered bytes; see restaurants.snapshots
+            content, version = menu_content(restaurant, request)
+            return HttpResponse(content, content_type='application/json', headers={'X-Menu-Version': version})
         categories = restaurant.categories.prefetch_related('items').all()
-        serializer = MenuCategorySerializer(categories, many=True)
+        serializer = MenuCategorySerializer(categories, many=True, context={'request': request})
         return Response(serializer.data)
 
+    @action(detail=True, methods=['get'], url_path='menu/version')
+    def menu_version(self, request, slug=None):
+        """Current menu version, for clients polling for menu changes"""
+        version = self.get_queryset().filter(slug=slug).values_list('menu_version', flat=True).first()
+        if version is None:
+            return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'version': version})
+
+    @action(
+        detail=True, methods=['post'], url_path='menu/import',
+        parser_classes=[ORJSONParser, MenuCSVParser, MenuJSONLinesParser, MultiPartParser],
+    )
+    def import_menu(self, request, slug=None):
+        """Bulk-create categories and items from CSV or JSON; see restaurants.menu_import"""
+        restaurant = self.get_object()
+        data = request.data
+        if 'file' in request.FILES:
+            rows = uploaded_rows(request.FILES['file'])
+        elif isinstance(data, (list, dict)) and data:
+            rows = json_rows(data)
+        elif isinstance(data, (list, dict)):
+            return Response({'error': 'No menu to import'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            rows = data  # streamed CSV or JSON lines
+        dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true', 'yes')
+        report = import_menu(restaurant, rows, dry_run=dry_run)
+        if report['errors']:
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        if not report['rows']:
+            return Response({'error': 'No menu to import'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+
+    CUISINE_EMOJIS = {
+        'Italian': '🍝',
+        'Japanese': '🍣', 
+        'Mexican': '🌮',
+        'Indian': '🍛',
+        'Chinese': '🥢',
+        'American': '🍔',
+        'French': '🥐',
+        'Thai': '🍜',
+        'Mediterranean': '🫒',
+        'Korean': '🍲',
+        'Vietnamese': '🍲',
+        'Greek': '🥗',
+        'Spanish': '🥘',
+        'Turkish': '🥙',
+    }
+
     @action(detail=False, methods=['get'], url_path='popular-cuisines')
+    @cache_catalog_response()
     def popular_cuisines(self, request):
         """Get popular cuisines based on restaurant count and ratings"""
-        from django.db.models import Count, Avg
-        
-        # Get cuisine types with restaurant count and average rating
-        cuisines = (
-            Restaurant.objects
-            .filter(is_active=True)
-            .values('cuisine_type')
-            .annotate(
-                restaurant_count=Count('id'),
-                avg_rating=Avg('rating')
-            )
-            .filter(restaurant_count__gt=0)
-            .order_by('-restaurant_count', '-avg_rating')
-        )
-        
-        # Format the response with emojis for popular cuisines
-        cuisine_emojis = {
-            'Italian': '🍝',
-            'Japanese': '🍣', 
-            'Mexican': '🌮',
-            'Indian': '🍛',
-            'Chinese': '🥢',
-            'American': '🍔',
-            'French': '🥐',
-            'Thai': '🍜',
-            'Mediterranean': '🫒',
-            'Korean': '🍲',
-            'Vietnamese': '🍲',
-            'Greek': '🥗',
-            'Spanish': '🥘',
-            'Turkish': '🥙',
-        }
-        
+        # Served from the precomputed rollups; see CuisineRollup
         popular_cuisines = []
-        for cuisine_data in cuisines:
-            cuisine_type = cuisine_data['cuisine_type']
+        for rollup in CuisineRollup.objects.filter(restaurant_count__gt=0):
             popular_cuisines.append({
-                'name': cuisine_type,
+                'name': rollup.cuisine_type,
                 
-                'emoji': cuisine_emojis.get(cuisine_type, '🍽️'),
-                'restaurant_count': cuisine_data['restaurant_count'],
-                'avg_rating': round(cuisine_data['avg_rating'] or 0, 1)
+                'emoji': self.CUISINE_EMOJIS.get(rollup.cuisine_type, '🍽️'),
+                'restaurant_count': rollup.restaurant_count,
+                'avg_rating': round(float(rollup.avg_rating), 1)
             })
         
         return Response(popular_cuisines)
 
+    @action(detail=False, methods=['get'])
+    @cache_catalog_response()
+    def leaderboard(self, request):
+        """Top rated active restaurants of one cuisine (``?cuisine_type=``)"""
+        cuisine_type = request.query_params.get('cuisine_type', '').strip()
+        if not cuisine_type:
+            return Response({'error': 'cuisine_type is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', CuisineRollup.TOP_N)), 1), CuisineRollup.TOP_N)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        rollup = CuisineRollup.objects.filter(cuisine_type=cuisine_type).first()
+        if rollup is None:
+            return Response({'error': 'Unknown cuisine'}, status=status.HTTP_404_NOT_FOUND)
+
+        ids = rollup.top_restaurant_ids[:limit]
+        restaurants = Restaurant.objects.with_listing_stats().in_bulk(ids)
+        ranked = [restaurants[pk] for pk in ids if pk in restaurants]
+        serializer = RestaurantListSerializer(ranked, many=True, context={'request': request})
+        return Response({
+            'cuisine_type': rollup.cuisine_type,
+            'restaurant_count': rollup.restaurant_count,
+            'avg_rating': round(float(rollup.avg_rating), 1),
+            'results': serializer.data,
+        })
+
+    @action(detail=False, methods=['get'], url_path='for-you')
+    def for_you(self, request):
+        """
+        Active restaurants ranked for the signed-in user by cuisine, dietary
+        and allergen preferences and order history (see
+        restaurants.personalize); anonymous users get them by rating
+        """
+        try:
+            limit = min(max(int(request.query_params.get('limit', personalize.DEFAULT_LIMIT)), 1), personalize.MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        scores = dict(personalize.recommend(request.user, limit))
+        restaurants = Restaurant.objects.with_listing_stats().in_bulk(list(scores))
+        ranked = [restaurants[pk] for pk in scores if pk in restaurants]
+        data = RestaurantListSerializer(ranked, many=True, context={'request': request}).data
+        for row, restaurant in zip(data, ranked):
+            row['score'] = round(scores[restaurant.pk], 4)
+        return Response({'results': data})
+
     @action(detail=True, methods=['get', 'post'])
-    def reviews(self, request, pk=None):
+    def reviews(self, request, slug=None):
         """Get or create restaurant reviews"""
         restaurant = self.get_object()
         
@@ -189,13 +330,8 @@ class RestaurantViewSet(viewsets.ModelViewSet):
                 context={'request': request}
             )
             if serializer.is_valid():
+                # Restaurant rating and review counters are kept in sync by restaurants.signals
                 serializer.save(restaurant=restaurant)
-                
-                # Update restaurant rating
-                avg_rating = restaurant.reviews.aggregate(Avg('rating'))['rating__avg']
-                restaurant.rating = round(avg_rating, 2) if avg_rating else 0
-                restaurant.save()
-                
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -227,16 +363,15 @@ class MenuCategoryViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['restaurant']
 
-class MenuItemViewSet(viewsets.ModelViewSet):
+class MenuItemViewSet(FastReadMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = MenuItem.objects.filter(is_available=True).order_by('id')
     serializer_class = MenuItemSerializer
     permission_classes = [IsRestaurantOwnerOrAdminOrReadOnly]
     lookup_field = 'slug'
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    filterset_fields = ['restaurant', 'category', 'is_vegetarian', 
-        'is_vegan', 'is_gluten_free', 'spice_level'
-    ]
-    search_fields = ['name', 'description', 'ingredients']
+    filter_backends = [DjangoFilterBackend, MenuItemSearchFilter]
+    filterset_class = MenuItemFilter
+    # Ingredients are searched on the MenuItemTerm index (see restaurants.search)
+    search_fields = ['name', 'description']
     
     def get_queryset(self):
         """Show all items to owners/admins, only available items to others"""
@@ -254,86 +389,192 @@ class MenuItemViewSet(viewsets.ModelViewSet):
                         pass
         return MenuItem.objects.filter(is_available=True).order_by('id')
 
+    BULK_UPDATE_MAX = 1000
+
+    @action(detail=False, methods=['patch'], url_path='bulk')
+    def bulk_update(self, request):
+        """
+        Change the price, availability or category of many items at once.
+
+        Takes ``[{"id": 1, "is_available": false}, {"id": 2, "price": "12.50"}, ...]``
+        (or the list under ``"items"``). Ownership is checked once per
+        restaurant and every change is written with one ``bulk_update``; if
+        any entry is invalid nothing is changed and the response lists the
+        failing entries, numbered from 1.
+        """
+        changes = request.data.get('items') if isinstance(request.data, dict) else request.data
+        serializer = MenuItemBulkUpdateSerializer(
+            data=changes, many=True, allow_empty=False, max_length=self.BULK_UPDATE_MAX
+        )
+        if not serializer.is_valid():
+            errors = serializer.errors
+            if isinstance(errors, dict):
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'errors': [
+                {'row': number, 'errors': row_errors} for number, row_errors in enumerate(errors, 1) if row_errors
+            ]}, status=status.HTTP_400_BAD_REQUEST)
+        changes = serializer.validated_data
+
+        with transaction.atomic():
+            items = (
+                MenuItem.objects.select_related('restaurant').select_for_update(of=('self',))
+                .in_bulk([change['id'] for change in changes])
+            )
+            restaurants = {item.restaurant_id: item.restaurant for item in items.values()}
+            user = request.user
+            if user.user_type != 'platform_admin' and any(r.owner_id != user.pk for r in restaurants.values()):
+                return Response(
+                    {'error': 'You can only update items of your own restaurants'}, status=status.HTTP_403_FORBIDDEN
+                )
+            category_restaurants = dict(
+                MenuCategory.objects
+                .filter(pk__in={change['category'] for change in changes if 'category' in change})
+                .values_list('pk', 'restaurant_id')
+            )
+
+            errors, seen = [], set()
+            for number, change in enumerate(changes, 1):
+                item = items.get(change['id'])
+                if item is None:
+                    errors.append({'row': number, 'errors': {'id': ['Menu item not found']}})
+                elif change['id'] in seen:
+                    errors.append({'row': number, 'errors': {'id': ['Menu item listed more than once']}})
+                elif 'category' in change and category_restaurants.get(change['category']) != item.restaurant_id:
+                    errors.append({'row': number, 'errors': {'category': ["Not a category of the item's restaurant"]}})
+                seen.add(change['id'])
+            if errors:
+                return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+            now = timezone.now()
+            fields = {'updated_at'}
+            availability = dict.fromkeys(restaurants, 0)
+            for change in changes:
+                item = items[change['id']]
+                if 'is_available' in change and change['is_available'] != item.is_available:
+                    availability[item.restaurant_id] += 1 if change['is_available'] else -1
+                for field in ('price', 'is_available'):
+                    if field in change:
+                        setattr(item, field, change[field])
+                        fields.add(field)
+                if 'category' in change:
+                    item.category_id = change['category']
+                    fields.add('category')
+                # bulk_update skips auto_now
+                item.updated_at = now
+            MenuItem.objects.bulk_update(items.values(), sorted(fields))
+            # Counters, caches and menu snapshots once per restaurant, not per item
+            menu_rows_bulk_saved(
+                {pk: {'menu_items_count': delta} for pk, delta in availability.items()}, list(items.values())
+            )
+
+        updated = [items[change['id']] for change in changes]
+        return Response({
+            'updated': len(updated),
+            'items': MenuItemSerializer(updated, many=True, context={'request': request}).data,
+        })
+
+    RELATED_LIMIT = 10
+
+    @action(detail=True, methods=['get'])
+    def related(self, request, slug=None):
+        """
+        Customers also ordered: the available items most often ordered
+        together with this one, best first (up to ``limit``). Built from
+        order history by ``manage.py build_recommendations``.
+        """
+        from orders.recommendations import TOP_K, related_items
+
+        try:
+            limit = min(max(int(request.query_params.get('limit', self.RELATED_LIMIT)), 1), TOP_K)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        items = related_items([self.get_object().pk])
+        compiled = self.get_compiled_serializer()
+        if compiled is not None:
+            return Response(compiled.render_many(compiled.values(items)[:limit]))
+        return Response(self.get_serializer(items.select_related('restaurant')[:limit], many=True).data)
+
+    MEAL_PERIOD_LIMIT = 20
+    MEAL_PERIOD_MAX_LIMIT = 100
+
     @action(detail=False, methods=['get'], url_path='meal-periods')
+    @cache_catalog_response(uncached_params=['now'])
     def by_meal_period(self, request):
-        """Get menu items grouped by meal period"""
-        # Get distinct meal periods from categories that have items
-        categories = MenuCategory.objects.filter(
-            items__is_available=True
-        ).distinct().select_related('restaurant').prefetch_related('items')
-        
-        # Group items by meal period
-        meal_periods_data = {
-            'breakfast': [],
-            'brunch': [],
-            'lunch': [],
-            'supper': [],
-            'dinner': [],
-            'all_day': []
-        }
-        
-        for category in categories:
-            meal_period = category.meal_period
-            if meal_period in meal_periods_data:
-                items = category.items.filter(is_available=True)
-                serialized_items = MenuItemSerializer(
-                    items, 
-                    many=True, 
-                    context={'request': request}
-                ).data
-                meal_periods_data[meal_period].extend(serialized_items)
-        
-        # Format response with display names and emojis
+        """
+        Available menu items grouped by meal period, ``limit`` per period.
+
+        Optional scoping: ``restaurant`` (id), or ``lat``/``lng``/``radius``
+        for restaurants nearby. ``now`` (``HH:MM`` or an ISO datetime, in
+        the caller's local time) keeps only the periods being served then.
+        Each period's ``next`` link pages through that period alone
+        (``period`` plus ``after``, the last item id seen).
+        """
+        params = request.query_params
+        try:
+            limit = min(max(int(params.get('limit', self.MEAL_PERIOD_LIMIT)), 1), self.MEAL_PERIOD_MAX_LIMIT)
+            after = int(params['after']) if 'after' in params else None
+            restaurant_id = int(params['restaurant']) if params.get('restaurant') else None
+        except ValueError:
+            return Response({'error': 'limit, after and restaurant must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        periods = list(MEAL_PERIODS)
+        if 'now' in params:
+            local_time = parse_local_time(params['now'])
+            if local_time is None:
+                return Response({'error': 'now must be HH:MM or an ISO datetime'}, status=status.HTTP_400_BAD_REQUEST)
+            periods = active_periods(local_time)
+        if 'period' in params:
+            if params['period'] not in MEAL_PERIODS:
+                return Response({'error': 'Unknown meal period'}, status=status.HTTP_400_BAD_REQUEST)
+            periods = [period for period in periods if period == params['period']]
+
+        items = MenuItem.objects.filter(is_available=True)
+        if restaurant_id is not None:
+            items = items.filter(restaurant_id=restaurant_id)
+        if 'lat' in params or 'lng' in params:
+            location = RestaurantNearbySerializer(data=params)
+            if not location.is_valid():
+                return Response(location.errors, status=status.HTTP_400_BAD_REQUEST)
+            lat, lng, radius = (location.validated_data[key] for key in ('lat', 'lng', 'radius'))
+            nearby = nearest(Restaurant.objects.filter(is_active=True), lat, lng, radius, order_by_distance=False)
+            items = items.filter(restaurant_id__in=[pk for pk, _ in nearby])
+
+        compiled = compile_serializer(self.get_serializer())
+        grouped = meal_period_items(items, periods, limit, compiled=compiled, after=after)
+
         response_data = []
-        meal_period_info = {
-            'breakfast': {
-                'name': 'Breakfast', 
-                'emoji': '🌅',
-                'time': '7:00 AM - 11:00 AM'},
-            'brunch': {
-                'name': 'Brunch', 
-                'emoji': '🥞',
-                'time': '10:00 AM - 2:00 PM'
-            },
-            'lunch': {
-                'name': 'Lunch', 
-                'emoji': '🌤️',
-                'time': '11:30 AM - 3:00 PM'
-            },
-            'supper': {
-                'name': 'Supper', 
-                'emoji': '🌆',
-                'time': '5:00 PM - 7:00 PM'
-            },
-            'dinner': {
-                'name': 'Dinner', 
-                'emoji': '🌙',
-                'time': '6:00 PM - 10:00 PM'
-            },
-            'all_day': {
-                'name': 'All Day', 
-                'emoji': '⭐',
-                'time': 'Available All Day'
-            }
-        }
-        
-        for period_key, items in meal_periods_data.items():
-            if items:  # Only include periods with available items
-                info = meal_period_info[period_key]
-                response_data.append({
-                    'period': period_key,
-                    'name': info['name'],
-                    'emoji': info['emoji'],
-                    'time': info['time'],
-                    'items': items
-                })
-        
+        for period, (rows, has_more) in grouped.items():
+            if not rows:
+                continue  # Only include periods with available items
+            name, emoji, time, *_ = MEAL_PERIODS[period]
+            if compiled is not None:
+                data = compiled.render_many(rows)
+            else:
+                data = self.get_serializer(rows, many=True).data
+            next_link = None
+            if has_more:
+                last_id = rows[-1]['id'] if compiled is not None else rows[-1].pk
+                next_link = replace_query_param(
+                    replace_query_param(request.build_absolute_uri(), 'period', period), 'after', last_id
+                )
+            response_data.append({
+                'period': period,
+                'name': name,
+                'emoji': emoji,
+                'time': time,
+                'items': data,
+                'next': next_link,
+            })
         return Response(response_data)
 
     @action(detail=False, methods=['get'])
     def dietary_filters(self, request):
-        """Get menu items based on dietary preferences"""
-        queryset = self.get_queryset()
+        """
+        Get menu items based on dietary preferences, paginated.
+
+        Takes the list filters too, e.g. ``exclude_allergens=peanuts,milk``.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
         
         if request.query_params.get('vegetarian'):
             queryset = queryset.filter(is_vegetarian=True)
@@ -344,10 +585,18 @@ class MenuItemViewSet(viewsets.ModelViewSet):
         
         max_spice = request.query_params.get('max_spice_level')
         if max_spice:
-            queryset = queryset.filter(spice_level__lte=int(max_spice))
+            try:
+                queryset = queryset.filter(spice_level__lte=int(max_spice))
+            except ValueError:
+                return Response({'error': 'max_spice_level must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        response = self.fast_list(queryset)
+        if response is not None:
+            return response
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
 
 class RestaurantReviewViewSet(viewsets.ModelViewSet):
     queryset = RestaurantReview.objects.select_related('user', 'restaurant')
@@ -365,3 +614,20 @@ class RestaurantReviewViewSet(viewsets.ModelViewSet):
         if self.action in ['update', 'partial_update', 'destroy']:
             return self.queryset.filter(user=self.request.user)
         return self.queryset
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def search_suggest(request):
+    """Typo-tolerant autocomplete over restaurant names, dishes and cuisines"""
+    query = request.query_params.get('q', '').strip()
+    try:
+        limit = min(max(int(request.query_params.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    suggestion_index.ensure_fresh()
+    return Response({
+        'query': query,
+        'suggestions': suggestion_index.suggest(query, limit=limit),
+    })
@@ -38,6 +38,9 @@ class Post(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='post_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.post_type} - {self.created_at.date()}"
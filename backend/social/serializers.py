@@ -1,12 +1,27 @@
+from django.db.models import BooleanField, Count, Exists, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
 from .models import Follow, Post, Like, Comment, DiningGroup, GroupMembership, Favorite
 from accounts.serializers import PublicUserSerializer
 from restaurants.serializers import RestaurantListSerializer, MenuItemSerializer
+from therestaurant.fastpath import FastField
+from therestaurant.fieldsets import SparseFieldsetMixin
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
-class PostSerializer(serializers.ModelSerializer):
+def _post_count(model):
+    """Correlated count of ``model`` rows pointing at the outer post"""
+    rows = model.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(rows), 0)
+
+def _liked_by_requester(context):
+    request = context.get('request')
+    if request and request.user.is_authenticated:
+        return Exists(Like.objects.filter(post=OuterRef('pk'), user=request.user))
+    return Value(False, output_field=BooleanField())
+
+class PostSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = PublicUserSerializer(read_only=True)
     restaurant = RestaurantListSerializer(read_only=True)
     menu_item = MenuItemSerializer(read_only=True)
@@ -22,6 +37,12 @@ class PostSerializer(serializers.ModelSerializer):
             'likes_count', 'comments_count', 'is_liked', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'user', 'created_at', 'updated_at']
+        field_dependencies = {'likes_count': [], 'comments_count': [], 'is_liked': []}
+        fast_fields = {
+            'likes_count': FastField(annotate=lambda context: _post_count(Like)),
+            'comments_count': FastField(annotate=lambda context: _post_count(Comment)),
+            'is_liked': FastField(annotate=_liked_by_requester),
+        }
 
     def get_likes_count(self, obj):
         return obj.likes.count()
@@ -1,3 +1,46 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from restaurants.models import Restaurant
+from .models import Follow, Post, Like, Comment
+from .serializers import PostSerializer
+
+User = get_user_model()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FeedFastPathTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.ama = User.objects.create_user(username='ama', email='ama@example.com', password='secret-pass-123')
+        self.kofi = User.objects.create_user(username='kofi', email='kofi@example.com', password='secret-pass-123')
+        Follow.objects.create(follower=self.ama, following=self.kofi)
+        restaurant = Restaurant.objects.create(
+            name='Jollof Palace', description='Rice', cuisine_type='Ghanaian', address='Accra',
+            phone_number='0240000000', email='hello@example.com',
+        )
+        reviewed = Post.objects.create(user=self.kofi, restaurant=restaurant, content='Great jollof', tags=['rice'])
+        Post.objects.create(user=self.ama, content='Hungry')
+        Like.objects.create(user=self.ama, post=reviewed)
+        Comment.objects.create(user=self.ama, post=reviewed, content='Agreed')
+        self.client.force_authenticate(self.ama)
+
+    def test_feed_matches_model_serializer(self):
+        request = Request(APIRequestFactory().get('/api/social/posts/feed/'))
+        request.user = self.ama
+        expected = PostSerializer(Post.objects.order_by('id'), many=True, context={'request': request}).data
+
+        response = self.client.get('/api/social/posts/feed/')
+        results = sorted(response.json()['results'], key=lambda post: post['id'])
+        self.assertEqual(results, json.loads(json.dumps(expected, default=str)))
+        liked = next(post for post in response.data['results'] if post['content'] == 'Great jollof')
+        self.assertEqual((liked['likes_count'], liked['comments_count'], liked['is_liked']), (1, 1, True))
+
+    def test_feed_counts_do_not_query_per_post(self):
+        # Followed users, COUNT and one SELECT with the counts annotated
+        with self.assertNumQueries(3):
+            self.client.get('/api/social/posts/feed/')
@@ -3,10 +3,12 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
+from therestaurant.fastpath import FastReadMixin
+from therestaurant.fieldsets import SparseFieldsetViewMixin
 from .models import Follow, Post, Like, Comment, DiningGroup, GroupMembership, Favorite
 from .serializers import PostSerializer, CommentSerializer, DiningGroupSerializer, FollowSerializer
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(FastReadMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
@@ -63,10 +65,13 @@ class PostViewSet(viewsets.ModelViewSet):
         following_users = user.following.values_list('following', flat=True)
         
         # Include posts from followed users and own posts
-        queryset = self.get_queryset().filter(
+        queryset = self.sparse_queryset(self.get_queryset().filter(
             user__in=list(following_users) + [user.id]
-        )
-        
+        ))
+        response = self.fast_list(queryset)
+        if response is not None:
+            return response
+
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
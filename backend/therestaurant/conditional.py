@@ -0,0 +1,40 @@
+"""
+HTTP conditional GET for DRF views.
+
+``conditional_response(state_func)`` wraps a viewset method with Django's
+``condition()``: ``state_func(request, *args, **kwargs)`` returns
+``(parts, last_modified)`` describing the current state of whatever the
+response is built from, or None when it cannot tell (the view then runs as
+usual, e.g. to produce its 404). A strong ETag is hashed from ``parts`` plus
+the negotiated media type, so ``If-None-Match``/``If-Modified-Since`` turn
+into a 304 before the view queries or serializes anything.
+"""
+import hashlib
+
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+
+def make_etag(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def conditional_response(state_func):
+    def state(request, *args, **kwargs):
+        # condition() asks for the ETag and Last-Modified separately; compute once
+        if not hasattr(request, '_conditional_state'):
+            request._conditional_state = state_func(request, *args, **kwargs)
+        return request._conditional_state
+
+    def etag(request, *args, **kwargs):
+        result = state(request, *args, **kwargs)
+        if result is None:
+            return None
+        parts, _ = result
+        return make_etag(getattr(request, 'accepted_media_type', ''), *parts)
+
+    def last_modified(request, *args, **kwargs):
+        result = state(request, *args, **kwargs)
+        return result[1] if result else None
+
+    return method_decorator(condition(etag_func=etag, last_modified_func=last_modified))
@@ -0,0 +1,267 @@
+"""
+Compiled fast-path serialization for hot read endpoints.
+
+``compile_serializer`` turns a ModelSerializer (after ``?fields=``/``?expand=``
+pruning) into a flat list of per-field readers over ``.values()`` rows, so a
+list page is one query returning tuples of columns rather than model
+instances walked attribute by attribute. Each reader applies the DRF field's
+own ``to_representation`` to the raw column value (or passes it through
+where that would return it unchanged, e.g. strings, ints and JSON), so the
+JSON is exactly what the serializer would have produced.
+
+Supported fields: plain model columns, primary-key related fields, embedded
+serializers on a to-one relation (compiled recursively over joined columns),
+and SerializerMethodFields the serializer describes with a ``FastField`` in
+``Meta.fast_fields``. Anything else (to-many embeds, properties, overridden
+``to_representation``) makes ``compile_serializer`` return None, and the
+view falls back to the regular serializer.
+
+``FastReadMixin`` uses the compiled form for ``list`` and ``retrieve``
+whenever it is available.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.fields.files import FieldFile, FileField
+from django.http import Http404
+from rest_framework import ISO_8601, serializers
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+from rest_framework.relations import PKOnlyObject, PrimaryKeyRelatedField
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .fieldsets import resolve_column
+
+
+class FastField:
+    """
+    How a SerializerMethodField is read from a ``.values()`` row.
+
+    ``render(context, *values)`` receives the values of ``columns`` (paths
+    relative to the serializer's model, e.g. ``'owner__username'``) followed,
+    when ``annotate`` is given, by the value of the expression
+    ``annotate(context)`` returns. Annotations are only available to
+    top-level serializers.
+    """
+
+    def __init__(self, *columns, render=None, annotate=None):
+        self.columns = columns
+        self.annotate = annotate
+        self.render = render or (lambda context, value: value)
+
+
+class Unsupported(Exception):
+    pass
+
+
+# Fields whose representation of what the database driver returns is the value itself
+_IDENTITY_REPRESENTATIONS = {
+    serializers.CharField.to_representation,
+    serializers.IntegerField.to_representation,
+    serializers.FloatField.to_representation,
+    serializers.BooleanField.to_representation,
+    serializers.JSONField.to_representation,
+}
+
+
+def _file(model_field):
+    return lambda name: FieldFile(None, model_field, name)
+
+
+def _datetime_reader(field, key):
+    """DateTimeField.to_representation with the output time zone looked up once, or None"""
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    zone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or zone is None:
+        return None
+    to_representation = field.to_representation
+
+    def read(row):
+        value = row[key]
+        if not value:
+            return None
+        if value.utcoffset() is None:
+            return to_representation(value)
+        value = value.astimezone(zone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return read
+
+
+class CompiledSerializer:
+    def __init__(self, serializer):
+        self.model = serializer.Meta.model
+        self.context = serializer.context
+        self.columns = {}
+        self.annotations = {}
+        self.readers = self._compile(serializer, self.model, '')
+
+    def _column(self, model, prefix, path):
+        """Values key for a column, and how to turn its raw value into the model attribute"""
+        if resolve_column(model, path) is None:
+            raise Unsupported(path)
+        self.columns[prefix + path] = None
+        *relations, name = path.split('__')
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        model_field = model._meta.get_field(name)
+        if isinstance(model_field, FileField):
+            return prefix + path, _file(model_field)
+        return prefix + path, None
+
+    def _compile(self, serializer, model, prefix):
+        if type(serializer).to_representation is not serializers.Serializer.to_representation:
+            raise Unsupported(type(serializer).__name__)
+        fast_fields = getattr(serializer.Meta, 'fast_fields', {})
+        readers = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                readers.append((name, self._method_reader(fast_fields.get(name), model, prefix, name)))
+            elif isinstance(field, serializers.BaseSerializer):
+                readers.append((name, self._nested_reader(field, model, prefix)))
+            else:
+                readers.append((name, self._field_reader(field, model, prefix)))
+        return readers
+
+    def _field_reader(self, field, model, prefix):
+        if field.source == '*' or len(field.source_attrs) != 1:
+            raise Unsupported(field.field_name)
+        if isinstance(field, serializers.RelatedField) and not isinstance(field, PrimaryKeyRelatedField):
+            raise Unsupported(field.field_name)
+        key, convert = self._column(model, prefix, field.source)
+        to_representation = field.to_representation
+
+        if isinstance(field, PrimaryKeyRelatedField):
+            def read(row):
+                value = row[key]
+                return None if value is None else to_representation(PKOnlyObject(pk=value))
+            return read
+        if isinstance(field, serializers.DateTimeField):
+            read = _datetime_reader(field, key)
+            if read:
+                return read
+        if (
+            not convert and not getattr(field, 'binary', False)
+            and type(field).to_representation in _IDENTITY_REPRESENTATIONS
+        ):
+            return lambda row: row[key]
+
+        convert = convert or (lambda value: value)
+
+        def read(row):
+            value = row[key]
+            return None if value is None else to_representation(convert(value))
+        return read
+
+    def _method_reader(self, fast, model, prefix, name):
+        if fast is None or (fast.annotate and prefix):
+            raise Unsupported(name)
+        columns = [self._column(model, prefix, path) for path in fast.columns]
+        if fast.annotate:
+            alias = f'fast_{name}'
+            self.annotations[alias] = fast.annotate(self.context)
+            columns.append((alias, None))
+        render, context = fast.render, self.context
+        return lambda row: render(context, *[
+            convert(row[key]) if convert else row[key] for key, convert in columns
+        ])
+
+    def _nested_reader(self, serializer, model, prefix):
+        if isinstance(serializer, serializers.ListSerializer) or len(serializer.source_attrs) != 1:
+            raise Unsupported(serializer.field_name)
+        try:
+            relation = model._meta.get_field(serializer.source)
+        except FieldDoesNotExist:
+            raise Unsupported(serializer.field_name)
+        if not (relation.many_to_one or relation.one_to_one):
+            raise Unsupported(serializer.field_name)
+        related_model = relation.related_model
+        nested_prefix = f'{prefix}{serializer.source}__'
+        # A null relation (or a missing reverse one-to-one) renders as None
+        present = nested_prefix + related_model._meta.pk.name
+        self.columns[present] = None
+        readers = self._compile(serializer, related_model, nested_prefix)
+
+        def read(row):
+            if row[present] is None:
+                return None
+            return {name: reader(row) for name, reader in readers}
+        return read
+
+    def values(self, queryset, ordering=(), extra=()):
+        """``queryset`` as the ``.values()`` rows ``render`` reads, keeping its sort columns and ``extra``"""
+        columns = dict(self.columns)
+        terms = [*queryset.query.order_by, *self.model._meta.ordering, *ordering, self.model._meta.pk.name]
+        for term in terms:
+            if isinstance(term, str) and resolve_column(self.model, term.lstrip('-')) == []:
+                columns[self.model._meta.get_field(term.lstrip('-')).attname] = None
+        if self.annotations:
+            queryset = queryset.annotate(**self.annotations)
+        return queryset.values(*columns, *self.annotations, *extra)
+
+    def render(self, row):
+        return {name: reader(row) for name, reader in self.readers}
+
+    def render_many(self, rows):
+        return [self.render(row) for row in rows]
+
+
+def compile_serializer(serializer):
+    """CompiledSerializer for ``serializer``, or None when a field needs a model instance"""
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    if not isinstance(serializer, serializers.ModelSerializer):
+        return None
+    try:
+        return CompiledSerializer(serializer)
+    except Unsupported:
+        return None
+
+
+class FastReadMixin:
+    """Serves ``list`` and ``retrieve`` from compiled serializers when possible"""
+
+    def get_compiled_serializer(self):
+        if self.request.method not in SAFE_METHODS:
+            return None
+        return compile_serializer(self.get_serializer())
+
+    def fast_list(self, queryset):
+        """Paginated list response for ``queryset``, or None if the serializer cannot be compiled"""
+        compiled = self.get_compiled_serializer()
+        if compiled is None:
+            return None
+        rows = compiled.values(queryset, ordering=getattr(self, 'ordering', None) or ())
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(compiled.render_many(page))
+        return Response(compiled.render_many(rows))
+
+    def list(self, request, *args, **kwargs):
+        response = self.fast_list(self.filter_queryset(self.get_queryset()))
+        if response is None:
+            return super().list(request, *args, **kwargs)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        compiled = self.get_compiled_serializer()
+        if compiled is None:
+            return super().retrieve(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.checks_object_permissions():
+            # Object-level permissions are checked against the model instance
+            # as usual; only the rendering uses the compiled serializer
+            queryset = queryset.filter(pk=self.get_object().pk)
+        else:
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        row = compiled.values(queryset).first()
+        if row is None:
+            raise Http404
+        return Response(compiled.render(row))
+
+    def checks_object_permissions(self):
+        """Whether any of the view's permissions overrides ``has_object_permission``"""
+        return any(
+            type(permission).has_object_permission is not BasePermission.has_object_permission
+            for permission in self.get_permissions()
+        )
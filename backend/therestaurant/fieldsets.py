@@ -0,0 +1,221 @@
+"""
+Sparse fieldsets and opt-in expansion for read serializers.
+
+``?fields=id,name,restaurant.name`` limits a response to the listed fields;
+dotted names reach into nested serializers (``restaurant`` alone keeps the
+whole nested object). ``?expand=restaurant`` swaps in the richer
+representation a serializer declares in ``Meta.expandable_fields``, e.g. a
+menu item's restaurant id for the embedded restaurant. Expanded fields are
+always rendered, whether or not ``fields`` lists them.
+
+Fields that are left out are dropped from the serializer before it renders,
+so their SerializerMethodFields never run. ``SparseFieldsetViewMixin`` also
+trims the view's queryset to match: ``only()`` the columns the remaining
+fields read, ``select_related`` just the embedded relations still rendered,
+and ``prefetch_related`` expanded to-many relations. Method fields declare
+the columns they read in ``Meta.field_dependencies``; when a rendered field's
+columns cannot be worked out, every column is loaded as before.
+
+Only the top-level serializer of a read reads the query string; serializers
+given input data (creates and updates) always keep every field.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_field_tree(value):
+    """``'a,b.c,b.d'`` -> ``{'a': None, 'b': {'c': None, 'd': None}}``; None means every field"""
+    tree = {}
+    for path in (value or '').split(','):
+        names = [name.strip() for name in path.split('.')]
+        if not all(names):
+            continue
+        node = tree
+        for name in names[:-1]:
+            if name in node and node[name] is None:
+                break  # already asked for in full
+            node = node.setdefault(name, {})
+        else:
+            node[names[-1]] = None
+    return tree
+
+
+def resolve_column(model, path):
+    """Forward relations ``path`` (``'owner__username'``) joins through, or None if it is not a column"""
+    names = path.split('__')
+    relations = []
+    for index, name in enumerate(names):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete or field.many_to_many:
+            return None
+        if index < len(names) - 1:
+            if not field.is_relation:
+                return None
+            relations.append('__'.join(names[:index + 1]))
+            model = field.related_model
+    return relations
+
+
+class SparseFieldsetMixin:
+    """ModelSerializer mixin honouring ``?fields=`` and ``?expand=``"""
+
+    def _spec(self):
+        """(requested field tree or None for all, expand tree) for this serializer"""
+        if hasattr(self, '_sparse_spec'):
+            return self._sparse_spec
+        root = self.root
+        is_top = root is self or (self.parent is root and isinstance(root, serializers.ListSerializer))
+        request = self.context.get('request')
+        params = getattr(request, 'query_params', None)
+        if not is_top or params is None or hasattr(root, 'initial_data'):
+            return None, {}
+        requested = parse_field_tree(params.get(FIELDS_PARAM)) if FIELDS_PARAM in params else None
+        return requested, parse_field_tree(params.get(EXPAND_PARAM))
+
+    def _expanded_field(self, name):
+        serializer_class, kwargs = self.Meta.expandable_fields[name]
+        if isinstance(serializer_class, str):
+            serializer_class = import_string(serializer_class)
+        return serializer_class(**kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested, expand = self._spec()
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        expand = {name: subtree for name, subtree in expand.items() if name in expandable}
+        for name in expand:
+            fields[name] = self._expanded_field(name)
+        if requested is not None:
+            fields = {name: field for name, field in fields.items() if name in requested or name in expand}
+
+        for name, field in fields.items():
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if isinstance(nested, SparseFieldsetMixin):
+                nested._sparse_spec = (
+                    requested.get(name) if requested is not None else None,
+                    expand.get(name) or {},
+                )
+        return fields
+
+    @property
+    def is_sparse(self):
+        requested, expand = self._spec()
+        return requested is not None or bool(expand)
+
+    def _plan(self, model, prefix=''):
+        """(columns or None, relations to join, prefetches) the rendered fields read"""
+        columns, joins, prefetches = set(), set(), []
+        dependencies = getattr(self.Meta, 'field_dependencies', {})
+
+        def need(path):
+            relations = resolve_column(model, path)
+            if relations is None:
+                return False
+            columns.add(prefix + path)
+            joins.update(prefix + relation for relation in relations)
+            return True
+
+        complete = True
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            if name in dependencies:
+                complete = all([need(path) for path in dependencies[name]]) and complete
+                continue
+            if field.source == '*':
+                complete = False
+                continue
+            path = '__'.join(field.source_attrs)
+
+            if isinstance(field, serializers.ListSerializer):
+                prefetch = self._prefetch(model, path, field.child)
+                if prefetch is None:
+                    complete = False
+                else:
+                    prefetches.append(Prefetch(prefix + path, queryset=prefetch))
+                continue
+
+            if isinstance(field, serializers.BaseSerializer):
+                # An embedded object: join it, and load all of its columns
+                # unless it trims its own fields too
+                if len(field.source_attrs) > 1 or not need(path) or not model._meta.get_field(path).is_relation:
+                    complete = False
+                    continue
+                joins.add(prefix + path)
+                if isinstance(field, SparseFieldsetMixin):
+                    nested_columns, nested_joins, nested_prefetches = field._plan(
+                        field.Meta.model, prefix + path + '__'
+                    )
+                    joins.update(nested_joins)
+                    prefetches.extend(nested_prefetches)
+                    if nested_columns is None:
+                        complete = False
+                    elif nested_columns:
+                        columns.discard(prefix + path)
+                        columns.update(nested_columns)
+                continue
+
+            complete = need(path) and complete
+        return (columns if complete else None), joins, prefetches
+
+    def _prefetch(self, model, path, child):
+        """Queryset for a to-many relation rendered by ``child``, or None if not a plain relation"""
+        try:
+            field = model._meta.get_field(path)
+        except FieldDoesNotExist:
+            return None
+        if not field.one_to_many:
+            return None
+        queryset = field.related_model._default_manager.all()
+        if isinstance(child, SparseFieldsetMixin):
+            columns, joins, prefetches = child._plan(field.related_model)
+            if joins:
+                queryset = queryset.select_related(*joins)
+            if columns is not None:
+                # The reverse foreign key is what prefetching matches rows on
+                queryset = queryset.only(field.field.name, *columns)
+            if prefetches:
+                queryset = queryset.prefetch_related(*prefetches)
+        return queryset
+
+    def optimize_queryset(self, queryset, ordering=()):
+        """``queryset`` trimmed to what this serializer renders; unchanged without ``fields``/``expand``"""
+        if not self.is_sparse:
+            return queryset
+        columns, joins, prefetches = self._plan(queryset.model)
+        if columns is not None:
+            for term in [*queryset.query.order_by, *queryset.model._meta.ordering, *ordering]:
+                if isinstance(term, str) and resolve_column(queryset.model, term.lstrip('-')) == []:
+                    columns.add(term.lstrip('-'))
+            queryset = queryset.select_related(None)
+        if joins:
+            queryset = queryset.select_related(*joins)
+        if columns is not None:
+            queryset = queryset.only(*columns)
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        return queryset
+
+
+class SparseFieldsetViewMixin:
+    """Trims read querysets to the serializer's ``?fields=``/``?expand=`` selection"""
+
+    def filter_queryset(self, queryset):
+        return self.sparse_queryset(super().filter_queryset(queryset))
+
+    def sparse_queryset(self, queryset):
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        serializer = self.get_serializer()
+        if not isinstance(serializer, SparseFieldsetMixin):
+            return queryset
+        return serializer.optimize_queryset(queryset, ordering=getattr(self, 'ordering', None) or ())
@@ -0,0 +1,187 @@
+"""
+Responsive image derivatives.
+
+Uploaded photos are re-encoded with Pillow at each of ``DERIVATIVE_WIDTHS``
+(never upscaled) as WebP and JPEG, stored beside the original under
+``derivatives/<original path without extension>/<width>w.<ext>``.
+
+``track(model, field, variants_field)`` watches an image field: once a save
+that changed the file commits, the derivatives are built on a background
+worker thread, and ``variants_field`` (a JSONField) is saved with
+``{'source': <original name>, 'widths': [...]}``. That save goes through
+the model's own post_save handlers, so cached responses and menu snapshots
+showing the image are invalidated as for any other edit. Set
+``IMAGE_DERIVATIVES_ASYNC = False`` to build inline after commit instead
+(the test runner does).
+
+``srcset(request, image, variants)`` turns the recorded widths into
+``{'webp': '<url> 160w, <url> 320w, ...', 'jpeg': ...}`` for serializers,
+or None while no derivatives of the current file exist.
+
+``render_derivatives`` only works on bytes, so the backfill command
+(``manage.py build_image_derivatives``) can run it in a process pool.
+"""
+import io
+import logging
+import math
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_init, post_save
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_WIDTHS = (160, 320, 640, 1280)
+DERIVATIVES_ROOT = 'derivatives'
+
+# format: (file extension, Pillow format, save options)
+FORMATS = {
+    'webp': ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# (model, field, variants field) of every tracked image field
+TRACKED = []
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='image-derivatives')
+
+
+def derivative_name(source, width, image_format):
+    """Storage name of the ``width`` pixel wide ``image_format`` derivative of ``source``"""
+    root, _ = posixpath.splitext(source)
+    return f'{DERIVATIVES_ROOT}/{root}/{width}w.{FORMATS[image_format][0]}'
+
+
+def render_derivatives(content, widths=DERIVATIVE_WIDTHS):
+    """``{(width, format): bytes}`` for the image in ``content``; widths at or above its own are skipped"""
+    with Image.open(io.BytesIO(content)) as image:
+        widest = max(widths)
+        shortest = min(image.size)
+        if shortest > widest:
+            # JPEG can decode straight to a smaller scale; keep both sides
+            # above the widest derivative so rotation cannot cut it short
+            scale = widest / shortest
+            image.draft('RGB', (math.ceil(image.width * scale), math.ceil(image.height * scale)))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        rendered = {}
+        for width in sorted(widths):
+            if width >= image.width:
+                break
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.Resampling.LANCZOS)
+            for image_format, (_, pillow_format, options) in FORMATS.items():
+                frame = resized
+                if pillow_format == 'JPEG' and has_alpha:
+                    frame = Image.new('RGB', resized.size, 'white')
+                    frame.paste(resized, mask=resized.getchannel('A'))
+                output = io.BytesIO()
+                frame.save(output, pillow_format, **options)
+                rendered[width, image_format] = output.getvalue()
+        return rendered
+
+
+def store_derivatives(model, pk, field, variants_field, source, rendered):
+    """Save rendered derivatives of ``source`` and record them, unless the file changed meanwhile"""
+    storage = model._meta.get_field(field).storage
+    for (width, image_format), content in rendered.items():
+        name = derivative_name(source, width, image_format)
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, ContentFile(content))
+
+    instance = model._default_manager.filter(pk=pk, **{field: source}).first()
+    if instance is None:
+        return None
+    setattr(instance, variants_field, {'source': source, 'widths': sorted({width for width, _ in rendered})})
+    update_fields = [variants_field]
+    if any(f.name == 'updated_at' for f in model._meta.concrete_fields):
+        update_fields.append('updated_at')  # ETags and Last-Modified follow it
+    instance.save(update_fields=update_fields)
+    return instance
+
+
+def build_derivatives(model, pk, field, variants_field):
+    """Render and store the derivatives of a row's current image; returns the row, or None"""
+    source = model._default_manager.filter(pk=pk).values_list(field, flat=True).first()
+    if not source:
+        return None
+    storage = model._meta.get_field(field).storage
+    with storage.open(source, 'rb') as image_file:
+        content = image_file.read()
+    return store_derivatives(model, pk, field, variants_field, source, safe_render(source, content))
+
+
+def safe_render(source, content):
+    """``render_derivatives``, or no derivatives for a file Pillow cannot read"""
+    try:
+        return render_derivatives(content)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        logger.warning("Cannot build derivatives of %s", source)
+        return {}
+
+
+def _build_in_background(model, pk, field, variants_field):
+    try:
+        build_derivatives(model, pk, field, variants_field)
+    except Exception:
+        logger.exception("Image derivatives failed for %s %s", model._meta.label, pk)
+    finally:
+        close_old_connections()
+
+
+def schedule_build(model, pk, field, variants_field):
+    if not getattr(settings, 'IMAGE_DERIVATIVES_ASYNC', True):
+        build_derivatives(model, pk, field, variants_field)
+        return
+    _executor.submit(_build_in_background, model, pk, field, variants_field)
+
+
+def _file_name(value):
+    return getattr(value, 'name', value) or ''
+
+
+def track(model, field, variants_field):
+    """Build derivatives whenever a saved ``model`` row gets a new ``field`` file"""
+    snapshot = f'_{field}_derivatives_source'
+
+    def remember_source(sender, instance, **kwargs):
+        instance.__dict__[snapshot] = _file_name(instance.__dict__.get(field))
+
+    def schedule(sender, instance, update_fields=None, **kwargs):
+        if update_fields is not None and field not in update_fields:
+            return
+        name = _file_name(instance.__dict__.get(field))
+        if name and name != instance.__dict__.get(snapshot):
+            pk = instance.pk
+            transaction.on_commit(lambda: schedule_build(model, pk, field, variants_field))
+        instance.__dict__[snapshot] = name
+
+    dispatch_uid = f'image-derivatives:{model._meta.label}.{field}'
+    if (model, field, variants_field) not in TRACKED:
+        TRACKED.append((model, field, variants_field))
+    post_init.connect(remember_source, sender=model, weak=False, dispatch_uid=dispatch_uid)
+    post_save.connect(schedule, sender=model, weak=False, dispatch_uid=dispatch_uid)
+
+
+def srcset(request, image, variants):
+    """``{format: srcset}`` for the derivatives of ``image``, or None if there are none for it"""
+    name = _file_name(image)
+    if not name or not variants or variants.get('source') != name or not variants.get('widths'):
+        return None
+    storage = image.storage
+
+    def url(width, image_format):
+        location = storage.url(derivative_name(name, width, image_format))
+        return request.build_absolute_uri(location) if request is not None else location
+
+    return {
+        image_format: ', '.join(f'{url(width, image_format)} {width}w' for width in variants['widths'])
+        for image_format in FORMATS
+    }
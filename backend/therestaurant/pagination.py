@@ -0,0 +1,190 @@
+"""
+Project-wide pagination.
+
+``PageOrCursorPagination`` keeps the page-number behaviour the web app
+relies on, and switches to keyset (cursor) pagination when the client sends
+a ``cursor`` query parameter. ``?cursor=`` with an empty value asks for the
+first page; the ``next``/``previous`` links carry the encoded position.
+
+Keyset pages skip the ``COUNT(*)`` and filter on the sort key of the last
+row seen instead of using ``OFFSET``, so page 500 costs the same as page 1.
+The sort key is the view's effective ordering (``-rating, name`` for
+restaurants, ``-created_at`` for posts, orders and reviews) with the
+primary key appended as a tie-breaker. Orderings that are not plain,
+non-null model columns (e.g. search relevance), and plain lists such as
+the nearby results, fall back to page numbers.
+"""
+import base64
+import datetime
+import decimal
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, page_size):
+        self.page_size = page_size
+
+    # -- ordering -------------------------------------------------------
+
+    def get_ordering(self, queryset, view):
+        """Return [(field, descending), ...] ending in the pk, or None if unsupported"""
+        terms = list(queryset.query.order_by)
+        if not terms and queryset.query.default_ordering:
+            terms = list(queryset.model._meta.ordering)
+        if not terms:
+            terms = list(getattr(view, 'ordering', None) or [])
+
+        opts = queryset.model._meta
+        ordering = []
+        for term in terms:
+            if not isinstance(term, str):
+                return None
+            descending = term.startswith('-')
+            name = term.lstrip('-')
+            if name == 'pk':
+                name = opts.pk.name
+            try:
+                field = opts.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            if not field.concrete or field.null or field.is_relation:
+                return None
+            ordering.append((field, descending))
+
+        if not any(field.primary_key for field, _ in ordering):
+            ordering.append((opts.pk, ordering[-1][1] if ordering else False))
+        return ordering
+
+    # -- cursors --------------------------------------------------------
+
+    @staticmethod
+    def encode_value(value):
+        # Full-precision text: DjangoJSONEncoder would cut datetimes to milliseconds
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, (decimal.Decimal, datetime.timedelta)):
+            return str(value)
+        return value
+
+    def encode_cursor(self, values, reverse):
+        payload = json.dumps({'v': [self.encode_value(value) for value in values], 'r': int(reverse)})
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, encoded):
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            values = [
+                field.to_python(value)
+                for (field, _), value in zip(self.ordering, payload['v'], strict=True)
+            ]
+            return values, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def position(self, instance):
+        if isinstance(instance, dict):  # .values() rows
+            return [instance[field.attname] for field, _ in self.ordering]
+        return [getattr(instance, field.attname) for field, _ in self.ordering]
+
+    def beyond(self, values, reverse):
+        """Rows strictly after ``values`` in the (possibly reversed) sort order"""
+        condition = Q()
+        for index, (field, descending) in enumerate(self.ordering):
+            equal = {f.attname: v for (f, _), v in zip(self.ordering[:index], values[:index])}
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= Q(**equal, **{f'{field.attname}__{lookup}': values[index]})
+        return condition
+
+    # -- pagination -----------------------------------------------------
+
+    def paginate_queryset(self, queryset, request, view=None, ordering=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = ordering or self.get_ordering(queryset, view)
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        values, reverse = self.decode_cursor(encoded) if encoded else (None, False)
+
+        order_by = [
+            f"{'-' if descending != reverse else ''}{field.attname}"
+            for field, descending in self.ordering
+        ]
+        queryset = queryset.order_by(*order_by)
+        if values is not None:
+            queryset = queryset.filter(self.beyond(values, reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_cursor = self.previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                self.next_cursor = self.encode_cursor(self.position(rows[-1]), reverse=False)
+            if (values is not None and not reverse) or (reverse and has_more):
+                self.previous_cursor = self.encode_cursor(self.position(rows[0]), reverse=True)
+        return rows
+
+    def link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.link(self.next_cursor)),
+            ('previous', self.link(self.previous_cursor)),
+            ('results', data),
+        ]))
+
+
+class PageOrCursorPagination(PageNumberPagination):
+    """Page numbers by default, keyset pagination when ``?cursor`` is present"""
+    cursor_query_param = KeysetPagination.cursor_query_param
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.cursor_query_param in request.query_params and isinstance(queryset, QuerySet):
+            keyset = KeysetPagination(self.get_page_size(request))
+            ordering = keyset.get_ordering(queryset, view)
+            if ordering is not None:
+                self.keyset = keyset
+                return keyset.paginate_queryset(queryset, request, view, ordering=ordering)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_next_link(self):
+        # Page links must not carry an unusable cursor parameter along
+        link = super().get_next_link()
+        return link and remove_query_param(link, self.cursor_query_param)
+
+    def get_previous_link(self):
+        link = super().get_previous_link()
+        return link and remove_query_param(link, self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [{
+            'name': self.cursor_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Keyset pagination cursor; send an empty value for the first page.',
+            'schema': {'type': 'string'},
+        }]
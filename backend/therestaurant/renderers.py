@@ -0,0 +1,41 @@
+"""
+JSON rendering with orjson.
+
+``ORJSONRenderer`` is a drop-in for DRF's ``JSONRenderer``: with orjson
+installed it encodes in one native call, otherwise (and for output orjson
+cannot reproduce, such as the indented JSON of the browsable API or
+non-default ``COMPACT_JSON``/``UNICODE_JSON``/``STRICT_JSON`` settings) it
+defers to the stdlib-based renderer.
+
+The output matches ``JSONRenderer``: compact UTF-8, UTC datetimes ending in
+``Z``, Decimals as numbers, lazy translation strings as text and U+2028/U+2029
+escaped. Types orjson has no native encoding for go through DRF's own
+``JSONEncoder.default``.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY if orjson else 0
+
+_default = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (
+            orjson is None
+            or self.encoder_class is not JSONEncoder
+            or self.ensure_ascii or not self.compact or not self.strict
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        content = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        # Valid JSON, but not valid JavaScript: escape as JSONRenderer does
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
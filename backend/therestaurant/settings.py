@@ -263,7 +263,16 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_RENDERER_CLASSES': [
+        'therestaurant.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'therestaurant.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'therestaurant.pagination.PageOrCursorPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
@@ -359,6 +368,26 @@ SIMPLE_JWT = {
 ### Media files Configuration
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Serve MEDIA_ROOT from Django (therestaurant.storage.serve_media); always on with DEBUG
+SERVE_MEDIA = DEBUG or os.environ.get('SERVE_MEDIA', 'False').lower() in ('1', 'true', 'yes', 'on')
+
+# Uploads are named by content hash and cached forever (therestaurant.storage).
+# Setting AWS_STORAGE_BUCKET_NAME keeps them in S3, or in MinIO or another
+# S3-compatible service at AWS_S3_ENDPOINT_URL.
+AWS_STORAGE_BUCKET_NAME = os.environ.get('AWS_STORAGE_BUCKET_NAME', '')
+if AWS_STORAGE_BUCKET_NAME:
+    AWS_S3_ENDPOINT_URL = os.environ.get('AWS_S3_ENDPOINT_URL') or None
+    AWS_S3_CUSTOM_DOMAIN = os.environ.get('AWS_S3_CUSTOM_DOMAIN') or None
+    AWS_S3_REGION_NAME = os.environ.get('AWS_S3_REGION_NAME') or None
+    AWS_QUERYSTRING_AUTH = False  # plain URLs that clients and CDNs can cache
+    MEDIA_STORAGE_BACKEND = 'therestaurant.storage.ContentAddressedS3Storage'
+else:
+    MEDIA_STORAGE_BACKEND = 'therestaurant.storage.ContentAddressedFileSystemStorage'
+
+STORAGES = {
+    'default': {'BACKEND': MEDIA_STORAGE_BACKEND},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
 
 ### Email Configuration
 if DEBUG:
@@ -403,6 +432,37 @@ else:
         },
     }
 
+### Cache Configuration
+# Catalog responses and other shared caches (restaurants.cache) live in Redis
+# when REDIS_URL is set; without it each process keeps a local-memory cache,
+# so a fresh checkout runs without Redis. Tests always use local memory
+# (therestaurant.test_runner).
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'therestaurant',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'therestaurant',
+        },
+    }
+
+TEST_RUNNER = 'therestaurant.test_runner.TestRunner'
+
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', 300))
+
+# Rebuild menu snapshots on a background thread (restaurants.snapshots)
+MENU_SNAPSHOT_ASYNC = True
+
+# Resize uploaded images on a background thread (therestaurant.images)
+IMAGE_DERIVATIVES_ASYNC = True
+
 ### Logging Configuration
 LOGGING = {
     'version': 1,
@@ -0,0 +1,99 @@
+"""
+Content-addressed media storage.
+
+Uploads are stored under the SHA-256 of their bytes, in the directory their
+field's ``upload_to`` gives them: ``profiles/ama.JPG`` is saved as
+``profiles/<64 hex digits>.jpg``. A name therefore always holds the same
+content, which means
+
+- identical uploads share one file: saving bytes that are already stored
+  writes nothing and returns the existing name;
+- media can be cached forever. ``CACHE_CONTROL`` is stored with S3 objects
+  and added by ``serve_media`` for local files, and a replaced image gets a
+  new URL, so none need a cache-busting query string.
+
+Image derivatives (therestaurant.images) are named after their
+content-addressed source, so they are written under the name they are
+given and cached the same way. Files are never overwritten or deleted here;
+a shared file outlives any one row using it.
+
+``ContentAddressedFileSystemStorage`` and ``ContentAddressedS3Storage``
+(with django-storages installed) are the two backends; settings pick the S3
+one when ``AWS_STORAGE_BUCKET_NAME`` is set.
+"""
+import hashlib
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.views import static
+
+from .images import DERIVATIVES_ROOT
+
+try:
+    from storages.backends.s3 import S3Storage
+except ImportError:  # pragma: no cover - optional dependency
+    S3Storage = None
+
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+_HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{64}(\.[0-9a-z]+)?$')
+
+
+def content_name(name, content):
+    """``name`` with its file name replaced by the SHA-256 of ``content``"""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, digest.hexdigest() + posixpath.splitext(filename)[1].lower())
+
+
+def is_immutable(name):
+    """Whether the file ``name`` can never change: a content hash, or derived from one"""
+    return bool(_HASHED_NAME.search(name)) or name.startswith(f'{DERIVATIVES_ROOT}/')
+
+
+class ContentAddressedStorageMixin:
+    """Storage mixin naming saved files by content hash; see the module docstring"""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        if name.startswith(f'{DERIVATIVES_ROOT}/'):
+            return super().save(name, content, max_length=max_length)
+
+        name = content_name(name, content)
+        if self.exists(name):
+            return name
+        saved = super().save(name, content, max_length=max_length)
+        if saved != name:
+            # Stored concurrently by another upload of the same bytes
+            self.delete(saved)
+        return name
+
+
+class ContentAddressedFileSystemStorage(ContentAddressedStorageMixin, FileSystemStorage):
+    pass
+
+
+if S3Storage is not None:
+    class ContentAddressedS3Storage(ContentAddressedStorageMixin, S3Storage):
+        def get_object_parameters(self, name):
+            parameters = super().get_object_parameters(name)
+            if is_immutable(name):
+                parameters.setdefault('CacheControl', CACHE_CONTROL)
+            return parameters
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """``django.views.static.serve``, with ``CACHE_CONTROL`` on content-addressed files"""
+    response = static.serve(request, path, document_root=document_root, show_indexes=show_indexes)
+    if is_immutable(path):
+        response['Cache-Control'] = CACHE_CONTROL
+    return response
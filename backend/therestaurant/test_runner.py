@@ -0,0 +1,29 @@
+"""
+Test runner (``TEST_RUNNER``) running the suite on a per-process
+local-memory cache, whether or not ``REDIS_URL`` is set, and doing work
+that normally goes to background threads inline so tests can assert on it.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_SETTINGS = {
+    'CACHES': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'therestaurant-tests',
+        },
+    },
+    'MENU_SNAPSHOT_ASYNC': False,
+    'IMAGE_DERIVATIVES_ASYNC': False,
+}
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(**TEST_SETTINGS)
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -1,8 +1,9 @@
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.views.generic import RedirectView
 from django.conf import settings
-from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 from rest_framework import permissions
@@ -10,7 +11,8 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from test_views import test_api
-from restaurants.views import RestaurantViewSet, MenuCategoryViewSet, MenuItemViewSet, RestaurantReviewViewSet
+from therestaurant.storage import serve_media
+from restaurants.views import RestaurantViewSet, MenuCategoryViewSet, MenuItemViewSet, RestaurantReviewViewSet, search_suggest
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -61,6 +63,11 @@ urlpatterns = [
         test_api, 
         name='api-test'
     ),
+
+    path('api/search/suggest',
+        search_suggest,
+        name='search-suggest'
+    ),
     
     
     path('api/auth/', include('djoser.urls')),
@@ -75,6 +82,11 @@ urlpatterns = [
     path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
 ]
 
-# Serve media files during development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Serve media files during development (or with SERVE_MEDIA)
+if settings.SERVE_MEDIA:
+    urlpatterns += [
+        re_path(
+            r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')),
+            serve_media, {'document_root': settings.MEDIA_ROOT},
+        ),
+    ]